@@ -1,6 +1,9 @@
 import os
 import sys
-import winreg
+try:
+    import winreg
+except ImportError:
+    winreg = None
 from pathlib import Path
 
 APP_NAME = "PCUsageMonitor"
@@ -0,0 +1,345 @@
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, List, Dict
+
+from config import PROCESS_CACHE_SIZE
+
+WindowInfo = Tuple[str, str, str, int]
+
+
+def app_name_from_exe(exe_name: str) -> str:
+    return exe_name.replace('.exe', '').replace('.EXE', '').title()
+
+
+class ProcessNameCache:
+    def __init__(self, max_size: int = PROCESS_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._last_window: Optional[Tuple[int, int]] = None
+        self.hits = 0
+        self.misses = 0
+    
+    def lookup(self, hwnd: int, pid: int, backend: "TrackerBackend") -> Optional[Tuple[str, str]]:
+        entry = self._entries.get(pid)
+        if entry and self._last_window == (hwnd, pid):
+            self.hits += 1
+            return entry[1]
+        
+        start_time = backend.get_process_start_time(pid)
+        if entry and start_time is not None and entry[0] == start_time:
+            self.hits += 1
+            self._entries.move_to_end(pid)
+            self._last_window = (hwnd, pid)
+            return entry[1]
+        
+        self.misses += 1
+        exe_name = backend.get_process_exe_name(pid)
+        if not exe_name:
+            self._entries.pop(pid, None)
+            return None
+        names = (app_name_from_exe(exe_name), exe_name)
+        self._entries[pid] = (start_time, names)
+        self._entries.move_to_end(pid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._last_window = (hwnd, pid)
+        return names
+    
+    def clear(self):
+        self._entries.clear()
+        self._last_window = None
+
+
+class TrackerBackend:
+    def __init__(self):
+        self.process_cache = ProcessNameCache()
+    
+    def time(self) -> float:
+        return time.time()
+    
+    def sleep(self, seconds: float, wake: Optional[threading.Event] = None):
+        if wake:
+            wake.wait(seconds)
+        else:
+            time.sleep(seconds)
+    
+    def get_idle_duration(self) -> float:
+        raise NotImplementedError
+    
+    def get_foreground_window(self) -> Optional[Tuple[int, str, int]]:
+        raise NotImplementedError
+    
+    def get_process_start_time(self, pid: int) -> Optional[float]:
+        return None
+    
+    def get_process_exe_name(self, pid: int) -> Optional[str]:
+        raise NotImplementedError
+    
+    def get_foreground_window_info(self) -> Optional[WindowInfo]:
+        window = self.get_foreground_window()
+        if not window:
+            return None
+        hwnd, window_title, pid = window
+        names = self.process_cache.lookup(hwnd, pid, self)
+        if not names:
+            return None
+        app_name, exe_name = names
+        return (app_name, exe_name, window_title, hwnd)
+
+
+class Win32Backend(TrackerBackend):
+    PROCESS_QUERY_INFORMATION = 0x0400
+    PROCESS_VM_READ = 0x0010
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    
+    def __init__(self):
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+        
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [('cbSize', wintypes.UINT), ('dwTime', wintypes.DWORD)]
+        
+        self._ctypes = ctypes
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+        self._psapi = ctypes.windll.psapi
+        self._lii = LASTINPUTINFO()
+        self._lii.cbSize = ctypes.sizeof(LASTINPUTINFO)
+        self._pid = wintypes.DWORD()
+        self._title_buf = ctypes.create_unicode_buffer(256)
+        self._exe_buf = ctypes.create_unicode_buffer(512)
+        self._times = [wintypes.FILETIME() for _ in range(4)]
+    
+    def get_idle_duration(self) -> float:
+        if self._user32.GetLastInputInfo(self._ctypes.byref(self._lii)):
+            millis = self._kernel32.GetTickCount() - self._lii.dwTime
+            return millis / 1000.0
+        return 0.0
+    
+    def get_foreground_window(self) -> Optional[Tuple[int, str, int]]:
+        ctypes = self._ctypes
+        user32 = self._user32
+        
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+        
+        length = user32.GetWindowTextLengthW(hwnd)
+        if length == 0:
+            return None
+        
+        if length + 1 > len(self._title_buf):
+            self._title_buf = ctypes.create_unicode_buffer(length + 1)
+        user32.GetWindowTextW(hwnd, self._title_buf, length + 1)
+        window_title = self._title_buf.value
+        
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(self._pid))
+        return (hwnd, window_title, self._pid.value)
+    
+    def get_process_start_time(self, pid: int) -> Optional[float]:
+        h_process = self._kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not h_process:
+            return None
+        try:
+            byref = self._ctypes.byref
+            if not self._kernel32.GetProcessTimes(h_process, *(byref(t) for t in self._times)):
+                return None
+            created = self._times[0]
+            return (created.dwHighDateTime << 32) | created.dwLowDateTime
+        finally:
+            self._kernel32.CloseHandle(h_process)
+    
+    def get_process_exe_name(self, pid: int) -> Optional[str]:
+        h_process = self._kernel32.OpenProcess(self.PROCESS_QUERY_INFORMATION | self.PROCESS_VM_READ, False, pid)
+        if not h_process:
+            return None
+        try:
+            length = self._psapi.GetModuleBaseNameW(h_process, None, self._exe_buf, len(self._exe_buf))
+            if not length:
+                return None
+            return self._exe_buf.value[:length]
+        finally:
+            self._kernel32.CloseHandle(h_process)
+
+
+class VirtualClockBackend(TrackerBackend):
+    def __init__(self, speed: float = 1.0, start_time: Optional[float] = None):
+        super().__init__()
+        self.speed = speed
+        self._now = start_time if start_time is not None else time.time()
+    
+    def time(self) -> float:
+        return self._now
+    
+    def sleep(self, seconds: float, wake: Optional[threading.Event] = None):
+        if self.speed > 0:
+            super().sleep(seconds / self.speed, wake)
+        self._now += seconds
+
+
+SYNTHETIC_APPS = [
+    ("Code.exe", ["main.py - project - Visual Studio Code", "README.md - project - Visual Studio Code"]),
+    ("chrome.exe", ["YouTube - Google Chrome", "Stack Overflow - Google Chrome", "Gmail - Google Chrome"]),
+    ("Telegram.exe", ["Telegram"]),
+    ("firefox.exe", ["Новая вкладка — Mozilla Firefox", "GitHub - Mozilla Firefox"]),
+    ("WINWORD.EXE", ["Отчёт.docx - Word"]),
+    ("explorer.exe", ["Проводник", "Загрузки"]),
+    ("Spotify.exe", ["Spotify Premium"]),
+    ("steam.exe", ["Steam"]),
+    ("WindowsTerminal.exe", ["Windows PowerShell"]),
+    ("Obsidian.exe", ["Заметки - Obsidian"]),
+]
+
+
+class SyntheticBackend(VirtualClockBackend):
+    def __init__(self, speed: float = 1.0, seed: int = 0, start_time: Optional[float] = None,
+                 mean_focus_sec: float = 90.0, break_chance: float = 0.05, mean_break_sec: float = 600.0,
+                 restart_chance: float = 0.01, apps: List[Tuple[str, List[str]]] = SYNTHETIC_APPS):
+        super().__init__(speed, start_time)
+        self._random = random.Random(seed)
+        self._apps = apps
+        self.mean_focus_sec = mean_focus_sec
+        self.break_chance = break_chance
+        self.mean_break_sec = mean_break_sec
+        self.restart_chance = restart_chance
+        self.exe_lookups = 0
+        self._processes: Dict[int, Tuple[float, str]] = {}
+        self._app_pids: Dict[str, int] = {}
+        self._free_pids: List[int] = []
+        self._next_pid = 1000
+        self._window: Optional[Tuple[int, str, int]] = None
+        self._segment_end = self._now
+        self._last_input = self._now
+        self._break_end: Optional[float] = None
+        self._next_hwnd = 0x10000
+        self._advance()
+    
+    def _spawn(self, exe_name: str, started: float) -> int:
+        old_pid = self._app_pids.get(exe_name)
+        if old_pid is not None:
+            del self._processes[old_pid]
+            self._free_pids.append(old_pid)
+        if self._free_pids and self._random.random() < 0.5:
+            pid = self._free_pids.pop(0)
+        else:
+            self._next_pid += 4
+            pid = self._next_pid
+        self._processes[pid] = (started, exe_name)
+        self._app_pids[exe_name] = pid
+        return pid
+    
+    def _advance(self):
+        while self._now >= self._segment_end:
+            start = self._segment_end
+            if self._break_end is None and self._random.random() < self.break_chance:
+                self._last_input = start
+                self._break_end = start + self._random.expovariate(1 / self.mean_break_sec)
+                self._segment_end = self._break_end
+                continue
+            self._break_end = None
+            exe_name, titles = self._random.choice(self._apps)
+            pid = self._app_pids.get(exe_name)
+            if pid is None or self._random.random() < self.restart_chance:
+                pid = self._spawn(exe_name, start)
+            self._next_hwnd += 4
+            self._window = (self._next_hwnd, self._random.choice(titles), pid)
+            self._segment_end = start + max(1.0, self._random.expovariate(1 / self.mean_focus_sec))
+    
+    def get_idle_duration(self) -> float:
+        self._advance()
+        if self._break_end is not None:
+            return self._now - self._last_input
+        return 0.0
+    
+    def get_foreground_window(self) -> Optional[Tuple[int, str, int]]:
+        self._advance()
+        return self._window
+    
+    def get_process_start_time(self, pid: int) -> Optional[float]:
+        process = self._processes.get(pid)
+        return process[0] if process else None
+    
+    def get_process_exe_name(self, pid: int) -> Optional[str]:
+        self.exe_lookups += 1
+        process = self._processes.get(pid)
+        return process[1] if process else None
+
+
+class ReplayBackend(VirtualClockBackend):
+    def __init__(self, path: str, speed: float = 1.0, start_time: Optional[float] = None):
+        with open(path, encoding="utf-8") as f:
+            self._samples: List[Dict] = [json.loads(line) for line in f if line.strip()]
+        super().__init__(speed, start_time)
+        self._origin = self._now
+        self._pos = 0
+    
+    def _sample(self) -> Optional[Dict]:
+        offset = self._now - self._origin
+        while self._pos + 1 < len(self._samples) and self._samples[self._pos + 1]["t"] <= offset:
+            self._pos += 1
+        if not self._samples or self._samples[self._pos]["t"] > offset:
+            return None
+        return self._samples[self._pos]
+    
+    @property
+    def finished(self) -> bool:
+        return not self._samples or self._now - self._origin >= self._samples[-1]["t"]
+    
+    def get_idle_duration(self) -> float:
+        sample = self._sample()
+        if not sample:
+            return 0.0
+        return sample["idle"] + (self._now - self._origin - sample["t"])
+    
+    def get_foreground_window_info(self) -> Optional[WindowInfo]:
+        sample = self._sample()
+        if not sample or not sample["window"]:
+            return None
+        return tuple(sample["window"])
+
+
+class RecordingBackend(TrackerBackend):
+    def __init__(self, inner: TrackerBackend, path: str):
+        super().__init__()
+        self.inner = inner
+        self._file = open(path, "w", encoding="utf-8")
+        self._origin = inner.time()
+        self._idle = 0.0
+        self._last: Optional[Dict] = None
+    
+    def time(self) -> float:
+        return self.inner.time()
+    
+    def sleep(self, seconds: float, wake: Optional[threading.Event] = None):
+        self.inner.sleep(seconds, wake)
+    
+    def get_idle_duration(self) -> float:
+        self._idle = self.inner.get_idle_duration()
+        return self._idle
+    
+    def get_foreground_window_info(self) -> Optional[WindowInfo]:
+        window = self.inner.get_foreground_window_info()
+        offset = self.inner.time() - self._origin
+        last = self._last
+        if (last is None or window != last["window"]
+                or abs(last["idle"] + offset - last["t"] - self._idle) > 1.0):
+            self._last = {"t": round(offset, 3), "idle": round(self._idle, 3), "window": window}
+            self._file.write(json.dumps(self._last, ensure_ascii=False) + "\n")
+        return window
+    
+    def close(self):
+        self._file.close()
+
+
+def create_backend(name: str, **options) -> TrackerBackend:
+    if name == "win32":
+        return Win32Backend()
+    elif name == "synthetic":
+        return SyntheticBackend(**options)
+    elif name == "replay":
+        return ReplayBackend(**options)
+    raise ValueError(f"Unknown tracker backend: {name}")
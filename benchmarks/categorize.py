@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def nested_loop_categorize(categories, app_name, exe_name, window_title):
+    check_text = f"{app_name} {exe_name} {window_title}".lower()
+    for cat_id, cat_info in categories.items():
+        for keyword in cat_info["keywords"]:
+            if keyword in check_text:
+                return cat_id
+    return "other"
+
+
+def title_stream(count, distinct, hot_share, seed):
+    from backends import SYNTHETIC_APPS, app_name_from_exe
+    
+    rng = random.Random(seed)
+    windows = []
+    for index in range(distinct):
+        exe_name, titles = rng.choice(SYNTHETIC_APPS)
+        windows.append((app_name_from_exe(exe_name), exe_name, f"{rng.choice(titles)} {index}"))
+    hot = windows[:max(1, distinct // 20)]
+    return [rng.choice(hot) if rng.random() < hot_share else rng.choice(windows) for _ in range(count)]
+
+
+def timed(func, stream, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for window in stream:
+            func(*window)
+        best = min(best, time.perf_counter() - started)
+    return best / len(stream) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the nested-loop and compiled window categorizers")
+    parser.add_argument("--count", type=int, default=100_000, help="window switches in the stream")
+    parser.add_argument("--distinct", type=int, default=5000, help="distinct windows in the stream")
+    parser.add_argument("--hot-share", type=float, default=0.8, help="share of switches to the 5%% hottest windows")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    from config import APP_CATEGORIES
+    from tracker import CategoryMatcher
+    
+    stream = title_stream(args.count, args.distinct, args.hot_share, args.seed)
+    matcher = CategoryMatcher(APP_CATEGORIES)
+    mismatches = sum(nested_loop_categorize(APP_CATEGORIES, *window) != matcher.categorize(*window)
+                     for window in stream)
+    keywords = sum(len(info["keywords"]) for info in APP_CATEGORIES.values())
+    print(f"{len(stream)} switches, {len(set(stream))} distinct windows, {keywords} keywords, "
+          f"{mismatches} mismatches")
+    
+    results = {
+        "nested loop": timed(lambda *window: nested_loop_categorize(APP_CATEGORIES, *window), stream, args.rounds),
+        "compiled, no cache": timed(lambda app, exe, title: matcher._match(f"{app} {exe} {title}".lower()),
+                                    stream, args.rounds),
+        "compiled, lru cache": timed(matcher.categorize, stream, args.rounds),
+    }
+    baseline = results["nested loop"]
+    for name, value in results.items():
+        print(f"{name:<22} {value:>8.2f} us/switch  {baseline / value:>6.1f}x")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
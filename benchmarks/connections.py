@@ -0,0 +1,135 @@
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_call_connections(db):
+    def connect():
+        conn = sqlite3.connect(db.db_path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    @contextmanager
+    def reader():
+        conn = connect()
+        try:
+            yield conn
+        finally:
+            db._attached.pop(conn, None)
+            conn.close()
+    
+    @contextmanager
+    def writer():
+        conn = connect()
+        try:
+            yield conn
+            conn.commit()
+            db._bump_generation()
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            db._attached.pop(conn, None)
+            conn.close()
+    
+    db._get_reader = reader
+    db._get_connection = writer
+
+
+def background_writer(db, stop, interval):
+    today_str = date.today().strftime("%Y-%m-%d")
+    session_id = db.create_session().result()
+    usage_id = db.log_app_start(session_id, "Chrome", "chrome.exe", "GitHub - Google Chrome", "browsers").result()
+    writes = 0
+    while not stop.is_set():
+        writes += 1
+        db.flush_usage({(today_str, datetime.now().hour): 1}, (usage_id, writes, True),
+                       (today_str, 3600, 3000, 600, 5), (session_id, 3600, 3000, 600)).result()
+        stop.wait(interval)
+    return writes
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    
+    def pick(share):
+        return timings[min(len(timings) - 1, int(len(timings) * share))] * 1000
+    
+    return (f"p50 {pick(0.5):7.3f} ms  p95 {pick(0.95):7.3f} ms  p99 {pick(0.99):7.3f} ms  "
+            f"mean {statistics.mean(timings) * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call latency of get_top_apps and update_app_usage with a "
+                                                 "concurrent writer, per-call connections vs the pool")
+    parser.add_argument("--mode", choices=["per-call", "pooled"], help="run one mode (both in turn by default)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--writer-interval", type=float, default=0.001, help="pause between background writes, s")
+    parser.add_argument("--db", help="database file (a temporary one by default)")
+    args = parser.parse_args()
+    
+    if not args.mode:
+        import subprocess
+        
+        db_path = args.db or os.path.join(tempfile.mkdtemp(), "connections.db")
+        for mode in ("per-call", "pooled"):
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--db", db_path,
+                            "--days", str(args.days), "--seed", str(args.seed), "--calls", str(args.calls),
+                            "--writer-interval", str(args.writer_interval)], check=True)
+        return
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "connections.db")
+    
+    from database import db
+    from datagen import generate
+    
+    if not db.get_partitions():
+        started = time.perf_counter()
+        generate(db.db_path, args.days, args.seed)
+        db.migrate_partitions()
+        db.rebuild_rollups()
+        print(f"generated {args.days} days in {time.perf_counter() - started:.1f}s")
+    if args.mode == "per-call":
+        per_call_connections(db)
+    
+    today_str = date.today().strftime("%Y-%m-%d")
+    session_id = db.create_session().result()
+    usage_id = db.log_app_start(session_id, "Code", "Code.exe", "main.py - Visual Studio Code", "development").result()
+    calls = {
+        "get_top_apps.today": lambda index: db.get_top_apps(today_str, 10),
+        "get_top_apps.all": lambda index: db.get_top_apps(limit=20),
+        "update_app_usage": lambda index: db.update_app_usage(usage_id, index).result(),
+    }
+    
+    stop = threading.Event()
+    writes = []
+    writer = threading.Thread(target=lambda: writes.append(background_writer(db, stop, args.writer_interval)))
+    writer.start()
+    try:
+        for name, call in calls.items():
+            timings = []
+            for index in range(args.calls):
+                started = time.perf_counter()
+                call(index)
+                timings.append(time.perf_counter() - started)
+            print(f"{args.mode:<9} {name:<20} {percentiles(timings)}")
+    finally:
+        stop.set()
+        writer.join()
+    print(f"{args.mode:<9} background writes: {writes[0]}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def credit_hours(hourly, start, seconds):
+    while seconds > 0:
+        hour_end = start.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        part = min(seconds, (hour_end - start).total_seconds())
+        key = (start.strftime("%Y-%m-%d"), start.hour)
+        hourly[key] = hourly.get(key, 0) + part
+        start += timedelta(seconds=part)
+        seconds -= part
+
+
+class Dimensions:
+    def __init__(self, conn):
+        self.conn = conn
+        self.apps = {}
+        self.titles = {}
+    
+    def app(self, app_name, exe_name, category):
+        key = (app_name, exe_name, category)
+        if key not in self.apps:
+            row = self.conn.execute("SELECT id FROM apps WHERE app_name = ? AND exe_name IS ? AND category IS ?",
+                                    key).fetchone()
+            self.apps[key] = row[0] if row else self.conn.execute(
+                "INSERT INTO apps (app_name, exe_name, category) VALUES (?, ?, ?)", key).lastrowid
+        return self.apps[key]
+    
+    def title(self, title):
+        from database import title_hash
+        
+        if title not in self.titles:
+            digest = title_hash(title)
+            row = self.conn.execute("SELECT id FROM titles WHERE hash = ? AND title = ?", (digest, title)).fetchone()
+            self.titles[title] = row[0] if row else self.conn.execute(
+                "INSERT INTO titles (hash, title) VALUES (?, ?)", (digest, title)).lastrowid
+        return self.titles[title]
+
+
+def generate_day(conn, rng, day, mean_switches, apps, dimensions):
+    from backends import app_name_from_exe
+    from tracker import categorize_app
+    
+    weekend = day.weekday() >= 5
+    switches = max(0, int(rng.gauss(mean_switches * (0.4 if weekend else 1.0), mean_switches * 0.2)))
+    if not switches:
+        return
+    sessions = rng.randint(1, 3)
+    moment = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.uniform(7.5, 10.5))
+    date_str = day.strftime("%Y-%m-%d")
+    usage, launches, hourly = [], [], {}
+    total = active = idle = 0
+    used = set()
+    for index in range(sessions):
+        session_start = moment
+        cur = conn.execute("INSERT INTO sessions (start_time) VALUES (?)", (session_start,))
+        session_id = cur.lastrowid
+        session_total = session_active = session_idle = 0
+        for _ in range(switches // sessions):
+            exe_name, titles = rng.choice(apps)
+            app_name = app_name_from_exe(exe_name)
+            title = f"{rng.choice(titles)} {rng.randrange(1000)}"
+            duration = max(1, int(rng.expovariate(1 / 90)))
+            app_id = dimensions.app(app_name, exe_name, categorize_app(app_name, exe_name, title))
+            usage.append((session_id, app_id, dimensions.title(title), moment, moment + timedelta(seconds=duration),
+                          duration, 0, date_str))
+            launches.append((app_id, moment, date_str))
+            used.add(app_name)
+            credit_hours(hourly, moment, duration)
+            session_active += duration
+            moment += timedelta(seconds=duration)
+            if rng.random() < 0.05:
+                pause = int(rng.expovariate(1 / 600))
+                session_idle += pause
+                moment += timedelta(seconds=pause)
+        session_total = session_active + session_idle
+        conn.execute("""
+            UPDATE sessions SET end_time = ?, total_seconds = ?, active_seconds = ?, idle_seconds = ? WHERE id = ?
+        """, (moment, session_total, session_active, session_idle, session_id))
+        total += session_total
+        active += session_active
+        idle += session_idle
+        if index + 1 < sessions:
+            moment += timedelta(minutes=rng.uniform(20, 120))
+        if moment.date() != day:
+            break
+    
+    conn.executemany("""
+        INSERT INTO app_usage (session_id, app_id, title_id, start_time, end_time, duration_seconds, is_active,
+                               date_str)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, usage)
+    conn.executemany("INSERT INTO app_launches (app_id, launch_time, date_str) VALUES (?, ?, ?)", launches)
+    conn.executemany("""
+        INSERT INTO hourly_stats (date_str, hour, active_seconds) VALUES (?, ?, ?)
+        ON CONFLICT(date_str, hour) DO UPDATE SET active_seconds = active_seconds + excluded.active_seconds
+    """, [(key[0], key[1], int(seconds)) for key, seconds in hourly.items()])
+    conn.execute("""
+        INSERT OR REPLACE INTO daily_stats (date_str, total_seconds, active_seconds, idle_seconds, apps_used)
+        VALUES (?, ?, ?, ?, ?)
+    """, (date_str, total, active, idle, len(used)))
+
+
+def generate(path, days, seed=0, mean_switches=400, end=None):
+    from backends import SYNTHETIC_APPS
+    
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    dimensions = Dimensions(conn)
+    end = end or date.today()
+    day = end - timedelta(days=days - 1)
+    while day <= end:
+        generate_day(conn, rng, day, mean_switches, SYNTHETIC_APPS, dimensions)
+        day += timedelta(days=1)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic sessions, app switches and launches")
+    parser.add_argument("--days", type=int, default=365 * 3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--switches", type=int, default=400, help="mean app switches per working day")
+    parser.add_argument("--db", help="database file (a temporary one by default)")
+    args = parser.parse_args()
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "generated.db")
+    
+    from database import db
+    
+    started = time.perf_counter()
+    generate(db.db_path, args.days, args.seed, args.switches)
+    db.migrate_partitions()
+    db.rebuild_rollups()
+    print(f"{db.db_path}: {args.days} days in {time.perf_counter() - started:.1f}s, "
+          f"{db.get_size_info()['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingSink:
+    def __init__(self):
+        self.bytes = 0
+    
+    def write(self, data):
+        self.bytes += len(data)
+
+
+def generate(db, rows):
+    with db._lock:
+        with db._get_connection() as conn:
+            conn.execute("""
+                WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < 49)
+                INSERT OR IGNORE INTO apps (app_name, exe_name, category)
+                SELECT 'App' || i, 'app' || i || '.exe', 'development' FROM n
+            """)
+            first_title = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM titles").fetchone()[0]
+            conn.execute("""
+                WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?)
+                INSERT INTO titles (id, hash, title)
+                SELECT ? + i, title_hash(title), title FROM (
+                    SELECT i, 'Окно ' || i || ' - документ с длинным заголовком' AS title FROM n
+                )
+            """, (rows, first_title))
+            conn.execute("""
+                WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?)
+                INSERT INTO app_usage (session_id, app_id, title_id, start_time, end_time, duration_seconds,
+                                       is_active, date_str)
+                SELECT 1, (SELECT id FROM apps WHERE exe_name = 'app' || (i % 50) || '.exe'), ? + i,
+                       datetime(1600000000 + i * 60, 'unixepoch'), datetime(1600000000 + i * 60 + 45, 'unixepoch'),
+                       45, 0, date(1600000000 + i * 60, 'unixepoch')
+                FROM n
+            """, (rows, first_title))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a large synthetic table under a memory ceiling")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--max-memory-mb", type=float, default=16.0, help="ceiling for Python heap growth")
+    parser.add_argument("--db", help="database file (a temporary one by default)")
+    args = parser.parse_args()
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "export.db")
+    
+    from database import db
+    from export import GzipWriter, export_table
+    
+    with db._get_reader() as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM app_usage").fetchone()[0]
+    if existing < args.rows:
+        started = time.perf_counter()
+        generate(db, args.rows - existing)
+        print(f"generated {args.rows - existing} rows in {time.perf_counter() - started:.1f}s")
+    
+    sink = CountingSink()
+    out = GzipWriter(sink) if args.gzip else sink
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = export_table(out, "app_usage", args.format)
+    if args.gzip:
+        out.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    peak_mb = peak / 1024 / 1024
+    print(f"exported {count} rows, {sink.bytes / 1e6:.1f} MB in {elapsed:.1f}s ({count / elapsed:,.0f} rows/s)")
+    print(f"python heap peak: {peak_mb:.2f} MB (ceiling {args.max_memory_mb} MB)")
+    print(f"max RSS growth: {(rss_after - rss_before) / 1024:.1f} MB")
+    if peak_mb > args.max_memory_mb:
+        print("FAIL: memory ceiling exceeded")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEAVY_PATHS = [
+    "/api/apps?period=all&limit=20",
+    "/api/categories?period=all",
+    "/api/hourly",
+    "/api/trend",
+    "/api/week-comparison",
+    "/api/stats/week",
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def fetch(conn, path):
+    for attempt in range(2):
+        try:
+            conn.request("GET", path)
+            return conn.getresponse().read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            conn.close()
+            if attempt:
+                raise
+
+
+def fill_database(db, rows):
+    session_id = db.create_session()
+    apps = [f"App{i}" for i in range(40)]
+    categories = ["work", "browsers", "communication", "entertainment", "other"]
+    for i in range(rows):
+        usage_id = db.log_app_start(session_id, random.choice(apps), "app.exe", f"Window {i % 500}",
+                                    random.choice(categories))
+        db.close_app_usage(usage_id, random.randint(1, 600))
+    db.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /api/status latency while heavy endpoints are hit")
+    parser.add_argument("--rows", type=int, default=20000, help="app_usage rows to generate")
+    parser.add_argument("--clients", type=int, default=6, help="concurrent clients hitting heavy endpoints")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--workers", type=int, help="server worker pool size (default: HTTP_MAX_WORKERS)")
+    parser.add_argument("--idle", type=int, default=0, help="keep-alive clients polling /api/status once a second")
+    parser.add_argument("--streams", type=int, default=0, help="open /api/stream subscribers")
+    parser.add_argument("--single", action="store_true", help="use a single-threaded HTTPServer")
+    args = parser.parse_args()
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = os.path.join(tempfile.mkdtemp(), "http_load.db")
+    
+    from http.server import HTTPServer
+    from config import HTTP_MAX_WORKERS
+    from database import db
+    from server import APIHandler, PooledHTTPServer
+    
+    fill_database(db, args.rows)
+    
+    if args.single:
+        class LegacyHandler(APIHandler):
+            protocol_version = "HTTP/1.0"
+        
+        httpd = HTTPServer(("127.0.0.1", 0), LegacyHandler)
+    else:
+        httpd = PooledHTTPServer(("127.0.0.1", 0), APIHandler, args.workers or HTTP_MAX_WORKERS)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    
+    stop = threading.Event()
+    heavy_requests = 0
+    
+    def heavy_client():
+        nonlocal heavy_requests
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while not stop.is_set():
+            fetch(conn, random.choice(HEAVY_PATHS))
+            heavy_requests += 1
+        conn.close()
+    
+    def idle_client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while not stop.is_set():
+            fetch(conn, "/api/status")
+            stop.wait(1.0)
+        conn.close()
+    
+    parked = []
+    for _ in range(args.streams):
+        stream = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        stream.request("GET", "/api/stream")
+        stream.getresponse()
+        parked.append(stream)
+    
+    clients = [threading.Thread(target=heavy_client, daemon=True) for _ in range(args.clients)]
+    clients += [threading.Thread(target=idle_client, daemon=True) for _ in range(args.idle)]
+    for client in clients:
+        client.start()
+    
+    latencies = []
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fetch(conn, "/api/status")
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.05)
+    stop.set()
+    for client in clients:
+        client.join()
+    conn.close()
+    for parked_conn in parked:
+        parked_conn.close()
+    httpd.shutdown()
+    httpd.server_close()
+    
+    mode = "single-threaded" if args.single else f"pooled ({args.workers or HTTP_MAX_WORKERS} workers)"
+    print(f"server: {mode}, heavy clients: {args.clients}, idle clients: {args.idle}, streams: {args.streams}, "
+          f"heavy requests: {heavy_requests}")
+    print(f"/api/status: n={len(latencies)} p50={percentile(latencies, 50):.1f} ms "
+          f"p99={percentile(latencies, 99):.1f} ms max={max(latencies):.1f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import gzip
+import http.client
+import json
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+APPS = [
+    ("Code", "Code.exe", "work", "main.py - project - Visual Studio Code"),
+    ("Chrome", "chrome.exe", "browsers", "Stack Overflow - Google Chrome"),
+    ("Telegram", "Telegram.exe", "communication", "Telegram"),
+    ("Spotify", "Spotify.exe", "entertainment", "Spotify Premium"),
+    ("Winword", "WINWORD.EXE", "work", "Отчёт.docx - Word"),
+    ("Explorer", "explorer.exe", "system", "Загрузки"),
+]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def agent_batches(agent, batches, segments, rng):
+    moment = datetime.now().replace(microsecond=0) - timedelta(days=2)
+    bodies = []
+    for batch in range(batches):
+        lines = []
+        for index in range(segments):
+            app, exe, category, title = rng.choice(APPS)
+            duration = rng.randint(5, 900)
+            lines.append(json.dumps({
+                "id": f"{batch * segments + index}",
+                "start": moment.isoformat(),
+                "duration": duration,
+                "idle": rng.randint(0, duration // 4),
+                "app": app,
+                "exe": exe,
+                "title": f"{title} {index % 50}",
+                "category": category,
+            }, ensure_ascii=False))
+            moment += timedelta(seconds=duration)
+        bodies.append(gzip.compress(("\n".join(lines) + "\n").encode("utf-8"), 6))
+    return bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many agents uploading to /api/ingest")
+    parser.add_argument("--agents", type=int, default=200, help="simulated hosts")
+    parser.add_argument("--batches", type=int, default=5, help="uploads per agent")
+    parser.add_argument("--segments", type=int, default=500, help="segments per upload")
+    parser.add_argument("--resend", type=float, default=0.05, help="share of uploads sent twice")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel client connections")
+    parser.add_argument("--workers", type=int, help="server worker pool size (default: HTTP_MAX_WORKERS)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = os.path.join(tempfile.mkdtemp(), "ingest_load.db")
+    os.environ["PC_USAGE_MONITOR_INGEST"] = "1"
+    os.environ.pop("PC_USAGE_MONITOR_INGEST_TOKEN", None)
+    
+    from config import HTTP_MAX_WORKERS
+    from database import db
+    from server import APIHandler, PooledHTTPServer
+    
+    rng = random.Random(args.seed)
+    jobs = []
+    for agent in range(args.agents):
+        host = f"ws-{agent:04d}"
+        for body in agent_batches(agent, args.batches, args.segments, rng):
+            jobs.append((host, body))
+            if rng.random() < args.resend:
+                jobs.append((host, body))
+    payload = sum(len(body) for _, body in jobs)
+    print(f"prepared {len(jobs)} uploads, {payload / 1024 / 1024:.1f} MB gzip")
+    
+    httpd = PooledHTTPServer(("127.0.0.1", 0), APIHandler, args.workers or HTTP_MAX_WORKERS)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    
+    pending = queue.Queue()
+    for job in jobs:
+        pending.put(job)
+    latencies = []
+    totals = {"inserted": 0, "duplicates": 0, "rejected": 0}
+    totals_lock = threading.Lock()
+    
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while True:
+            try:
+                host, body = pending.get_nowait()
+            except queue.Empty:
+                break
+            started = time.perf_counter()
+            conn.request("POST", f"/api/ingest?host={host}", body,
+                         {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"})
+            response = conn.getresponse()
+            result = json.loads(response.read())
+            elapsed = time.perf_counter() - started
+            with totals_lock:
+                latencies.append(elapsed * 1000)
+                for key in totals:
+                    totals[key] += result[key]
+        conn.close()
+    
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    httpd.shutdown()
+    httpd.server_close()
+    
+    with db._get_reader() as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM fleet_usage").fetchone()[0]
+        hosts = conn.execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+    received = totals["inserted"] + totals["duplicates"]
+    print(f"agents: {hosts}, uploads: {len(jobs)}, concurrency: {args.concurrency}")
+    print(f"segments: {received} received, {totals['inserted']} inserted, {totals['duplicates']} duplicates, "
+          f"{totals['rejected']} rejected, {stored} stored")
+    print(f"throughput: {received / elapsed:.0f} segments/s, {totals['inserted'] / elapsed:.0f} rows/s "
+          f"in {elapsed:.2f} s")
+    print(f"upload latency: p50={percentile(latencies, 50):.1f} ms p99={percentile(latencies, 99):.1f} ms "
+          f"max={max(latencies):.1f} ms")
+    print(f"writer: {db._writer.commands} commands in {db._writer.batches} transactions")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def child_track(args):
+    from backends import SyntheticBackend
+    from tracker import tracker
+    from collector import collector
+    from journal import journal
+    
+    journal.max_bytes = args.journal_bytes
+    tracker.set_backend(SyntheticBackend(speed=args.speed, seed=args.seed))
+    handle_tick = collector._handle_tick
+    
+    def reporting_tick(delta, is_idle):
+        handle_tick(delta, is_idle)
+        sys.stdout.write(f"{collector._total_time:.3f} {collector._active_time:.3f}\n")
+        sys.stdout.flush()
+    
+    tracker.on_tick = reporting_tick
+    collector.start_session()
+    while True:
+        time.sleep(1)
+
+
+def child_inspect(args):
+    from database import db
+    
+    with db._get_reader() as conn:
+        session = conn.execute("SELECT id, total_seconds, active_seconds FROM sessions ORDER BY id LIMIT 1").fetchone()
+        hourly = conn.execute("SELECT COALESCE(SUM(active_seconds), 0) FROM hourly_stats").fetchone()[0]
+        daily = conn.execute("SELECT COALESCE(SUM(total_seconds), 0) FROM daily_stats").fetchone()[0]
+        with db._raw_source(conn, "app_usage") as source:
+            open_rows = conn.execute(f"SELECT COUNT(*) FROM {source} WHERE is_active = 1").fetchone()[0]
+            usage = conn.execute(f"SELECT COALESCE(SUM(duration_seconds), 0) FROM {source}").fetchone()[0]
+        rollup = conn.execute("SELECT COALESCE(SUM(seconds), 0) FROM daily_app_stats").fetchone()[0]
+    print(json.dumps({
+        "session": session["id"] if session else None,
+        "total": session["total_seconds"] if session else 0,
+        "active": session["active_seconds"] if session else 0,
+        "hourly": hourly,
+        "daily": daily,
+        "open_rows": open_rows,
+        "usage": usage,
+        "rollup": rollup,
+    }))
+
+
+def child_recover(args):
+    from collector import collector
+    
+    collector._recover()
+    child_inspect(args)
+
+
+def last_reported(lines):
+    for line in reversed(lines):
+        try:
+            total, _ = map(float, line.split())
+        except ValueError:
+            continue
+        return total
+    return 0.0
+
+
+def spawn(mode, args, db_path, **kwargs):
+    env = dict(os.environ, PC_USAGE_MONITOR_DB=db_path)
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--speed", str(args.speed),
+               "--journal-bytes", str(args.journal_bytes), "--seed", str(kwargs.pop("seed", 0))]
+    return subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, **kwargs)
+
+
+def run_json(mode, args, db_path):
+    output = spawn(mode, args, db_path).communicate()[0]
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kill the collector at random points and check journal recovery")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--speed", type=float, default=300.0, help="simulation speed of the killed tracker")
+    parser.add_argument("--min-life", type=float, default=0.5, help="shortest lifetime before the kill, seconds")
+    parser.add_argument("--max-life", type=float, default=4.0, help="longest lifetime before the kill, seconds")
+    parser.add_argument("--kill-recovery", type=float, default=0.3, help="share of runs that also kill the replay")
+    parser.add_argument("--journal-bytes", type=int, default=1024 * 1024, help="journal size that triggers rotation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", choices=["track", "inspect", "recover"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        {"track": child_track, "inspect": child_inspect, "recover": child_recover}[args.child](args)
+        return
+    
+    rng = random.Random(args.seed)
+    failures = 0
+    lost_before, lost_after = [], []
+    for run in range(args.runs):
+        db_path = os.path.join(tempfile.mkdtemp(), "crash.db")
+        process = spawn("track", args, db_path, seed=run)
+        time.sleep(rng.uniform(args.min_life, args.max_life))
+        process.kill()
+        total = last_reported(process.communicate()[0].splitlines())
+        
+        saved = run_json("inspect", args, db_path)
+        killed_replay = rng.random() < args.kill_recovery
+        if killed_replay:
+            replay = spawn("recover", args, db_path)
+            time.sleep(rng.uniform(0.05, 0.4))
+            replay.kill()
+            replay.communicate()
+        recovered = run_json("recover", args, db_path)
+        again = run_json("recover", args, db_path)
+        
+        problems = []
+        if saved["session"] is not None:
+            if recovered["total"] < int(total) - 1:
+                problems.append("total behind the last reported tick")
+            if recovered["daily"] != recovered["total"]:
+                problems.append("daily_stats differs from the session")
+            if abs(recovered["hourly"] - recovered["active"]) > 2 + recovered["active"] // 3600:
+                problems.append("hourly_stats does not add up to active time")
+            if recovered["rollup"] != recovered["usage"]:
+                problems.append("daily_app_stats differs from app_usage")
+            if recovered["open_rows"]:
+                problems.append("app_usage rows left open")
+            if again != recovered:
+                problems.append("second replay changed the database")
+            lost_before.append(total - saved["total"])
+            lost_after.append(total - recovered["total"])
+        failures += bool(problems)
+        print(f"run {run:>3}: reported {total:>8.0f} s, saved {saved['total']:>6} s, recovered {recovered['total']:>6} s, "
+              f"hourly {recovered['hourly']:>6} s{' (replay killed)' if killed_replay else ''}"
+              f"{'  FAIL: ' + '; '.join(problems) if problems else ''}")
+    
+    if lost_before:
+        print(f"tracked seconds missing without replay: max {max(lost_before):.0f}, "
+              f"mean {sum(lost_before) / len(lost_before):.1f}")
+        print(f"tracked seconds missing after replay: max {max(lost_after):.0f}, "
+              f"mean {sum(lost_after) / len(lost_after):.1f}")
+    print(f"{args.runs - failures}/{args.runs} runs recovered consistently")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
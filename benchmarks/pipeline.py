@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run tracker -> collector -> database on a simulated clock")
+    parser.add_argument("--hours", type=float, default=8.0, help="simulated hours to run")
+    parser.add_argument("--speed", type=float, default=1000.0, help="simulation speed, 0 = as fast as possible")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mean-focus", type=float, default=90.0, help="mean seconds before an app switch")
+    parser.add_argument("--break-chance", type=float, default=0.05, help="chance that a switch is an idle break")
+    parser.add_argument("--mean-break", type=float, default=600.0, help="mean idle break length in seconds")
+    parser.add_argument("--fixed-interval", action="store_true", help="disable adaptive polling")
+    parser.add_argument("--replay", help="replay a recorded event log instead of synthetic activity")
+    parser.add_argument("--record", help="record the generated activity to an event log")
+    parser.add_argument("--db", help="database file (a temporary one by default)")
+    args = parser.parse_args()
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "pipeline.db")
+    
+    from backends import SyntheticBackend, ReplayBackend, RecordingBackend
+    import tracker as tracker_module
+    from tracker import tracker
+    from collector import collector
+    from database import db
+    
+    if args.replay:
+        backend = ReplayBackend(args.replay, speed=args.speed)
+    else:
+        backend = SyntheticBackend(speed=args.speed, seed=args.seed, mean_focus_sec=args.mean_focus,
+                                   break_chance=args.break_chance, mean_break_sec=args.mean_break)
+    if args.record:
+        backend = RecordingBackend(backend, args.record)
+    tracker.set_backend(backend)
+    if args.fixed_interval:
+        tracker_module.POLL_BACKOFF_FACTOR = 1.0
+    
+    polls = 0
+    poll = tracker._poll
+    
+    def counting_poll():
+        nonlocal polls
+        polls += 1
+        poll()
+    
+    tracker._poll = counting_poll
+    
+    target = backend.time() + args.hours * 3600
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    collector.start_session()
+    while backend.time() < target and not getattr(backend, "finished", False):
+        time.sleep(0.05)
+    collector.stop_session()
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    if args.record:
+        backend.close()
+    
+    with db._get_reader() as conn, db._raw_source(conn, "app_usage") as source:
+        rows = conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+    hours = (backend.time() - target) / 3600 + args.hours
+    print(f"simulated: {hours:.1f} h in {elapsed:.2f} s ({hours * 3600 / elapsed:.0f}x real time)")
+    print(f"polls: {polls} ({polls / hours:.0f} per simulated hour, {polls / elapsed:.0f}/s)")
+    print(f"cpu: {cpu:.2f} s ({cpu / hours * 1000:.0f} ms per simulated hour)")
+    print(f"active: {tracker.total_active_time / 3600:.2f} h, idle: {tracker.total_idle_time / 3600:.2f} h")
+    print(f"app_usage rows: {rows}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
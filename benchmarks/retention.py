@@ -0,0 +1,115 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(db, runs):
+    today = date.today()
+    week_start = (today - timedelta(days=6)).strftime("%Y-%m-%d")
+    today_str = today.strftime("%Y-%m-%d")
+    old_day = (today - timedelta(days=180)).strftime("%Y-%m-%d")
+    
+    def raw_today():
+        with db._get_reader() as conn, db._raw_source(conn, "app_usage", today_str, today_str) as source:
+            return conn.execute(f"""
+                SELECT a.app_name, SUM(u.duration_seconds) FROM {source} u JOIN apps a ON a.id = u.app_id
+                WHERE u.date_str = ? GROUP BY a.app_name
+            """, (today_str,)).fetchall()
+    
+    def history_scan():
+        with db._get_reader() as conn, db._raw_source(conn, "app_usage") as source:
+            return conn.execute(f"SELECT COUNT(*), SUM(duration_seconds) FROM {source}").fetchall()
+    
+    def hourly_old_day():
+        with db._get_reader() as conn:
+            return conn.execute("""
+                SELECT hour, app_name, seconds FROM hourly_app_stats WHERE date_str = ?
+            """, (old_day,)).fetchall()
+    
+    queries = {
+        "top_apps_all": lambda: db.get_top_apps(limit=20),
+        "categories_all": lambda: db.get_category_stats(),
+        "week_stats": lambda: db.get_stats_for_period(week_start, today_str),
+        "launches_all": lambda: db.get_app_launches_count(),
+        "raw_today": raw_today,
+        "history_scan": history_scan,
+        "hourly_180d_ago": hourly_old_day,
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def file_size(db):
+    with db._lock:
+        db._pool.writer.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return os.path.getsize(db.db_path) + db.get_size_info()["partition_bytes"]
+
+
+def count_raw_rows(db):
+    with db._get_reader() as conn, db._raw_source(conn, "app_usage") as source:
+        return conn.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a multi-year history and measure the retention job")
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--switches-per-day", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--runs", type=int, default=5, help="runs per query, the median is reported")
+    parser.add_argument("--db", help="database file (a temporary one by default)")
+    args = parser.parse_args()
+    
+    os.environ["PC_USAGE_MONITOR_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "retention.db")
+    
+    from database import db
+    from retention import RetentionJob
+    from datagen import generate
+    
+    started = time.perf_counter()
+    generate(db.db_path, int(args.years * 365), args.seed, args.switches_per_day)
+    db.migrate_partitions()
+    db.rebuild_rollups()
+    print(f"generated in {time.perf_counter() - started:.1f}s")
+    
+    raw_rows = count_raw_rows(db)
+    size_before = file_size(db)
+    before = measure(db, args.runs)
+    top_before = db.get_top_apps(limit=20)
+    
+    started = time.perf_counter()
+    result = RetentionJob().run_once()
+    elapsed = time.perf_counter() - started
+    
+    raw_after = count_raw_rows(db)
+    with db._get_reader() as conn:
+        hourly_after = conn.execute("SELECT COUNT(*) FROM hourly_app_stats").fetchone()[0]
+    size_after = file_size(db)
+    after = measure(db, args.runs)
+    
+    print(f"retention run: {elapsed:.1f}s {result}")
+    print(f"app_usage rows: {raw_rows} -> {raw_after}, hourly_app_stats rows: {hourly_after}")
+    print(f"db size: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    print(f"{'query':<18}{'before ms':>12}{'after ms':>12}")
+    for name in before:
+        print(f"{name:<18}{before[name]:>12.2f}{after[name]:>12.2f}")
+    print(f"all-time top apps unchanged: {db.get_top_apps(limit=20) == top_before}")
+    
+    db.rebuild_rollups()
+    print(f"top apps unchanged after rebuild-rollups: {db.get_top_apps(limit=20) == top_before}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def drop_caches():
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def poll_status(port, started, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/status")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status == 200:
+                return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.002)
+    return None
+
+
+def launch(db_path, marker, cold):
+    port = free_port()
+    env = dict(os.environ, PC_USAGE_MONITOR_DB=db_path, PC_USAGE_MONITOR_PORT=str(port),
+               PC_USAGE_MONITOR_BACKEND="synthetic", BROWSER=f"{sys.executable} -c \"open(r'{marker}', 'w')\" %s")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    if os.path.exists(marker):
+        os.remove(marker)
+    if cold:
+        drop_caches()
+    started = time.perf_counter()
+    wall_started = time.time()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "main.py")], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    status = poll_status(port, started, started + 30)
+    deadline = time.perf_counter() + 10
+    while not os.path.exists(marker) and time.perf_counter() < deadline:
+        time.sleep(0.002)
+    browser = os.path.getmtime(marker) - wall_started if os.path.exists(marker) else None
+    process.terminate()
+    process.wait(timeout=30)
+    return status, browser
+
+
+def summary(label, values):
+    values = sorted(value * 1000 for value in values if value is not None)
+    if not values:
+        return f"{label}: no response"
+    return f"{label}: min {values[0]:.0f} ms, median {values[len(values) // 2]:.0f} ms, max {values[-1]:.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the time from launching main.py to the first /api/status")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--db", help="existing database to start against (copied; an empty one by default)")
+    parser.add_argument("--cold", action="store_true", help="drop the OS page cache before each launch (Linux, root)")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "startup.db")
+    marker = os.path.join(workdir, "browser-opened")
+    if args.db:
+        shutil.copy(args.db, db_path)
+        partitions = os.path.splitext(args.db)[0] + "_partitions"
+        if os.path.isdir(partitions):
+            shutil.copytree(partitions, os.path.join(workdir, "startup_partitions"))
+    
+    first_status, first_browser = launch(db_path, marker, args.cold)
+    print(f"first launch{' (new database)' if not args.db else ''}: status {first_status * 1000:.0f} ms, "
+          f"browser {first_browser * 1000:.0f} ms" if first_status and first_browser else "first launch failed")
+    
+    statuses, browsers = [], []
+    for _ in range(args.runs):
+        status, browser = launch(db_path, marker, args.cold)
+        statuses.append(status)
+        browsers.append(browser)
+    print(summary("first /api/status", statuses))
+    print(summary("browser opened", browsers))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingSink:
+    def __init__(self):
+        self.bytes = 0
+    
+    def write(self, data):
+        self.bytes += len(data)
+
+
+def database_files(db_path):
+    path = Path(db_path)
+    partitions = path.parent / f"{path.stem}_partitions"
+    return [path] + sorted(partitions.glob("usage_*.db"))
+
+
+def table_bytes(db_path):
+    tables, used = {}, 0
+    for path in database_files(db_path):
+        conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            used += (pages - free) * page_size
+            for name, size in conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"):
+                tables[name] = tables.get(name, 0) + size
+        finally:
+            conn.close()
+    return used, tables
+
+
+def measure(db, runs):
+    from export import export_table
+    
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    month_ago = today - timedelta(days=30)
+    today_str = today.strftime("%Y-%m-%d")
+    
+    def export_usage():
+        export_table(CountingSink(), "app_usage", "csv", month_ago.strftime("%Y-%m-%d"))
+    
+    queries = {
+        "launches_today": lambda: db.get_app_launches_count(today_str),
+        "launches_all": lambda: db.get_app_launches_count(),
+        "range_30d_by_app": lambda: list(db.iter_range(month_ago, today, 3600, month_ago, "app", "raw")),
+        "range_30d_by_category": lambda: list(db.iter_range(month_ago, today, 3600, month_ago, "category", "raw")),
+        "range_30d_total": lambda: list(db.iter_range(month_ago, today, 3600, month_ago, None, "raw")),
+        "closed_usage_5000": lambda: db.get_closed_usage(0, 5000),
+        "export_30d_csv": export_usage,
+        "rebuild_rollups": db.rebuild_rollups,
+    }
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(runs if name != "rebuild_rollups" else 1):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report database size and raw-table query times")
+    parser.add_argument("--days", type=int, default=365, help="days of history to generate")
+    parser.add_argument("--db", help="existing database to measure (copied with its partitions)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "storage.db")
+    os.environ["PC_USAGE_MONITOR_DB"] = db_path
+    if args.db:
+        shutil.copy(args.db, db_path)
+        partitions = os.path.splitext(args.db)[0] + "_partitions"
+        if os.path.isdir(partitions):
+            shutil.copytree(partitions, os.path.join(workdir, "storage_partitions"))
+    
+    started = time.perf_counter()
+    from database import db
+    print(f"opened in {time.perf_counter() - started:.2f} s")
+    if not args.db:
+        from datagen import generate
+        started = time.perf_counter()
+        generate(db.db_path, args.days, args.seed)
+        db.migrate_partitions()
+        db.rebuild_rollups()
+        print(f"generated {args.days} days in {time.perf_counter() - started:.1f} s")
+    
+    for name, value in measure(db, args.runs).items():
+        print(f"{name:<24} {value:>10.1f} ms")
+    db.close()
+    used, tables = table_bytes(db_path)
+    print(f"{'used bytes':<24} {used / 1e6:>10.2f} MB")
+    for name, size in sorted(tables.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<32} {size / 1e6:>8.2f} MB")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
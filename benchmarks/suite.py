@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure(fn, min_time, rounds):
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    timings = [elapsed / number]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        "median_us": statistics.median(timings) * 1e6,
+        "min_us": min(timings) * 1e6,
+        "number": number,
+        "rounds": rounds,
+    }
+
+
+class Cycle:
+    def __init__(self, items):
+        self.items = items
+        self.index = 0
+    
+    def next(self):
+        self.index = (self.index + 1) % len(self.items)
+        return self.items[self.index]
+
+
+def read_cases(db):
+    today = date.today()
+    today_str = today.strftime("%Y-%m-%d")
+    week_start = (today - timedelta(days=6)).strftime("%Y-%m-%d")
+    midnight = datetime.combine(today, datetime.min.time())
+    
+    def iter_range(start, end, bucket_sec, group_by):
+        return lambda: list(db.iter_range(start, end, bucket_sec, start, group_by))
+    
+    return {
+        "db.get_today_stats": db.get_today_stats,
+        "db.get_stats_for_period.week": lambda: db.get_stats_for_period(week_start, today_str),
+        "db.get_hourly_stats": lambda: db.get_hourly_stats(today_str),
+        "db.get_top_apps.today": lambda: db.get_top_apps(today_str, 10),
+        "db.get_top_apps.all": lambda: db.get_top_apps(limit=20),
+        "db.get_category_stats.today": lambda: db.get_category_stats(today_str),
+        "db.get_category_stats.all": db.get_category_stats,
+        "db.get_app_launches_count.today": lambda: db.get_app_launches_count(today_str),
+        "db.get_week_comparison": db.get_week_comparison,
+        "db.get_generation.range": lambda: db.get_generation(week_start, today_str),
+        "db.iter_range.90d_by_week": iter_range(midnight - timedelta(days=90), midnight, 7 * 86400, "app"),
+        "db.iter_range.7d_by_hour": iter_range(midnight - timedelta(days=7), midnight, 3600, "category"),
+        "db.iter_range.4h_by_15m": iter_range(midnight - timedelta(days=1, hours=-9),
+                                              midnight - timedelta(days=1, hours=-13), 900, "app"),
+    }
+
+
+def write_cases(db):
+    today_str = date.today().strftime("%Y-%m-%d")
+    session_id = db.create_session().result()
+    usage_id = db.log_app_start(session_id, "Code", "Code.exe", "main.py - Visual Studio Code", "development").result()
+    durations = Cycle(list(range(1, 1000)))
+    
+    def log_app_start():
+        new_id = db.log_app_start(session_id, "Chrome", "chrome.exe", "GitHub - Google Chrome", "browsers")
+        db.close_app_usage(new_id, 30).result()
+    
+    def flush_usage():
+        hour = datetime.now().hour
+        return db.flush_usage({(today_str, hour): 1}, (usage_id, durations.next(), True),
+                              (today_str, 3600, 3000, 600, 5), (session_id, 3600, 3000, 600))
+    
+    def flush_burst():
+        for _ in range(63):
+            flush_usage()
+        flush_usage().result()
+    
+    return {
+        "db.create_session": lambda: db.create_session().result(),
+        "db.log_app_start+close": log_app_start,
+        "db.update_app_usage": lambda: db.update_app_usage(usage_id, durations.next()).result(),
+        "db.flush_usage": lambda: flush_usage().result(),
+        "db.flush_usage.burst64": flush_burst,
+    }
+
+
+def tracker_cases():
+    from backends import SYNTHETIC_APPS, app_name_from_exe
+    from tracker import category_matcher, categorize_app, privacy_filter
+    
+    windows = [(app_name_from_exe(exe), exe, f"{title} {i}")
+               for i in range(200) for exe, titles in SYNTHETIC_APPS for title in titles]
+    cold = Cycle(windows)
+    warm = Cycle(windows[:50])
+    titles = Cycle([f"{title} user{i}@example.com +7999123{i:04d}" for _, _, title in windows[:500]
+                    for i in range(2)])
+    
+    def categorize_cold():
+        app_name, exe_name, title = cold.next()
+        return category_matcher._match(f"{app_name} {exe_name} {title}".lower())
+    
+    return {
+        "tracker.categorize.uncached": categorize_cold,
+        "tracker.categorize.cached": lambda: categorize_app(*warm.next()),
+        "tracker.mask": lambda: privacy_filter.mask(titles.next()),
+        "tracker.should_skip": lambda: privacy_filter.should_skip(titles.next()),
+        "tracker.process_title.cached": lambda: privacy_filter.process(warm.next()[2], "Chrome"),
+    }
+
+
+def api_cases(db):
+    from server import APIHandler, PANELS, build_status
+    
+    handler = APIHandler.__new__(APIHandler)
+    
+    def build(panel, **params):
+        qs = {key: [value] for key, value in params.items()}
+        return lambda: json.dumps(handler.build_panel(panel, qs, {}), ensure_ascii=False)
+    
+    def dashboard():
+        shared = {}
+        with db.read_snapshot():
+            result = {panel: handler.build_panel(panel, {}, shared) for panel in PANELS}
+        return json.dumps(result, ensure_ascii=False)
+    
+    return {
+        "api.status": lambda: json.dumps(build_status(), ensure_ascii=False),
+        "api.today": build("today"),
+        "api.week": build("week"),
+        "api.apps.today": build("apps", limit="5"),
+        "api.apps.all": build("apps", period="all", limit="20"),
+        "api.hourly": build("hourly"),
+        "api.categories.all": build("categories", period="all"),
+        "api.week_comparison": build("week_comparison"),
+        "api.trend": build("trend"),
+        "api.dashboard.all_panels": dashboard,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    os.environ["PC_USAGE_MONITOR_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "suite.db")
+    
+    from database import db
+    from datagen import generate
+    
+    if not db.get_partitions():
+        started = time.perf_counter()
+        generate(db.db_path, args.days, args.seed, args.switches)
+        db.migrate_partitions()
+        db.rebuild_rollups()
+        print(f"generated {args.days} days in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    
+    groups = [read_cases(db), tracker_cases(), api_cases(db), write_cases(db)]
+    results = {}
+    for cases in groups:
+        for name, fn in cases.items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(fn, args.min_time, args.rounds)
+            print(f"{name:<36}{results[name]['median_us']:>12.1f} us", file=sys.stderr)
+    
+    report = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "days": args.days,
+            "seed": args.seed,
+            "switches": args.switches,
+        },
+        "cases": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+
+def compare(args):
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    
+    print(f"base: {base['meta'].get('revision')} {base['meta']['created']}")
+    print(f"new:  {new['meta'].get('revision')} {new['meta']['created']}")
+    print(f"{'case':<36}{'base us':>12}{'new us':>12}{'change':>10}")
+    regressions = 0
+    for name in sorted(set(base["cases"]) | set(new["cases"])):
+        old_case, new_case = base["cases"].get(name), new["cases"].get(name)
+        if not old_case or not new_case:
+            old_text = f"{old_case['median_us']:.1f}" if old_case else "-"
+            new_text = f"{new_case['median_us']:.1f}" if new_case else "-"
+            print(f"{name:<36}{old_text:>12}{new_text:>12}")
+            continue
+        change = (new_case["median_us"] / old_case["median_us"] - 1) * 100
+        mark = ""
+        if change > args.threshold:
+            mark = "  slower"
+            regressions += 1
+        elif change < -args.threshold:
+            mark = "  faster"
+        print(f"{name:<36}{old_case['median_us']:>12.1f}{new_case['median_us']:>12.1f}{change:>+9.1f}%{mark}")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the database, tracker and API layers")
+    commands = parser.add_subparsers(dest="command")
+    
+    run_parser = commands.add_parser("run", help="run the suite and write results as JSON")
+    run_parser.add_argument("--days", type=int, default=365, help="days of generated history")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--switches", type=int, default=400, help="mean app switches per working day")
+    run_parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per round")
+    run_parser.add_argument("--rounds", type=int, default=5)
+    run_parser.add_argument("--filter", help="only run cases whose name contains this text")
+    run_parser.add_argument("--db", help="reuse a database file instead of generating a temporary one")
+    run_parser.add_argument("-o", "--output", default="bench-results.json")
+    
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent change to flag")
+    compare_parser.add_argument("--fail-on-regression", action="store_true")
+    
+    args = parser.parse_args()
+    if args.command == "compare":
+        compare(args)
+    elif args.command == "run":
+        run(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
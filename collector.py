@@ -1,23 +1,30 @@
-import time
-from datetime import datetime, date
-from typing import Dict, Optional
+from concurrent.futures import Future
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 import threading
 
 from database import db
+from journal import journal, STATE, TICK, APP, USAGE
 from tracker import tracker
-from config import SAVE_INTERVAL_SEC
+from config import SAVE_INTERVAL_SEC, MAX_UNSAVED_SEC
 
 
 class UsageCollector:
     def __init__(self):
         self.session_id: Optional[int] = None
-        self._current_usage_id: Optional[int] = None
+        self._current_usage_id: Optional[Future] = None
         self._current_app_start: float = 0
         self._current_app_name: str = ""
         self._session_start: float = 0
         self._total_time: float = 0
         self._active_time: float = 0
         self._idle_time: float = 0
+        self._pending_hourly: Dict[Tuple[str, int], float] = {}
+        self._current_hour: Optional[Tuple[str, int]] = None
+        self._tick_end: Optional[float] = None
+        self._last_flush: float = 0
+        self._lock = threading.RLock()
         self._save_timer: Optional[threading.Timer] = None
         self._apps_used_today: set = set()
         self._running = False
@@ -27,9 +34,13 @@ class UsageCollector:
     def start_session(self):
         if self._running:
             return
+        self._recover()
         self._running = True
-        self._session_start = time.time()
-        self.session_id = db.create_session()
+        self._session_start = tracker.now()
+        self._last_flush = self._session_start
+        self._tick_end = None
+        self.session_id = db.create_session().result()
+        journal.open(self._journal_state())
         tracker.start()
         self._schedule_save()
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Session #{self.session_id} started")
@@ -41,33 +52,157 @@ class UsageCollector:
         tracker.stop()
         if self._save_timer:
             self._save_timer.cancel()
-        if self._current_usage_id:
-            duration = int(time.time() - self._current_app_start)
-            db.close_app_usage(self._current_usage_id, duration)
-        self._save_stats()
-        if self.session_id:
-            db.close_session(self.session_id, int(self._total_time), int(self._active_time), int(self._idle_time))
+        with self._lock:
+            closing = tracker.now() - self._current_app_start if self._current_usage_id else None
+            saved = self._flush(closing_duration=closing)
+        saved.result()
+        journal.close(discard=True)
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Session stopped")
     
     def _handle_app_change(self, old_app, old_duration, new_app, exe_name, title, category):
-        if self._current_usage_id and old_duration > 0:
-            db.close_app_usage(self._current_usage_id, int(old_duration))
-        self._current_app_name = new_app
-        self._current_app_start = time.time()
-        self._apps_used_today.add(new_app)
-        self._current_usage_id = db.log_app_start(self.session_id, new_app, exe_name, title, category)
+        with self._lock:
+            now = tracker.now()
+            journal.app_change(now, new_app not in self._apps_used_today)
+            closing = old_duration if self._current_usage_id and old_duration > 0 else None
+            self._flush(closing_duration=closing)
+            self._current_app_name = new_app
+            self._current_app_start = now
+            self._apps_used_today.add(new_app)
+            self._current_usage_id = db.log_app_start(self.session_id, new_app, exe_name, title, category)
+            self._current_usage_id.add_done_callback(partial(self._journal_usage, now))
+    
+    def _journal_usage(self, start: float, future: Future):
+        if future.exception() is None:
+            journal.usage(start, future.result())
     
     def _handle_tick(self, delta: float, is_idle: bool):
-        self._total_time += delta
-        if is_idle:
-            self._idle_time += delta
-        else:
-            self._active_time += delta
-            now = datetime.now()
-            db.update_hourly_stats(now.strftime("%Y-%m-%d"), now.hour, int(delta))
-        if self._current_usage_id:
-            duration = int(time.time() - self._current_app_start)
-            db.update_app_usage(self._current_usage_id, duration)
+        with self._lock:
+            start = self._tick_end if self._tick_end is not None else tracker.now() - delta
+            end = start + delta
+            self._tick_end = end
+            moment = datetime.fromtimestamp(end)
+            hour_key = (moment.strftime("%Y-%m-%d"), moment.hour)
+            rollover = self._current_hour is not None and hour_key != self._current_hour
+            self._current_hour = hour_key
+            
+            self._total_time += delta
+            if is_idle:
+                self._idle_time += delta
+            else:
+                self._active_time += delta
+                self._credit_hourly(start, end)
+            journal.tick(end, delta, is_idle)
+            
+            if rollover or tracker.now() - self._last_flush >= MAX_UNSAVED_SEC:
+                self._flush()
+    
+    def _credit_hourly(self, start: float, end: float):
+        while start < end:
+            moment = datetime.fromtimestamp(start)
+            hour_start = moment.replace(minute=0, second=0, microsecond=0).timestamp()
+            part_end = min(end, hour_start + 3600)
+            hour_key = (moment.strftime("%Y-%m-%d"), moment.hour)
+            self._pending_hourly[hour_key] = self._pending_hourly.get(hour_key, 0) + part_end - start
+            start = part_end
+    
+    def _flush(self, closing_duration: Optional[float] = None) -> Future:
+        with self._lock:
+            hourly = {}
+            for hour_key, seconds in list(self._pending_hourly.items()):
+                if hour_key == self._current_hour:
+                    hourly[hour_key] = int(seconds)
+                    self._pending_hourly[hour_key] = seconds - int(seconds)
+                else:
+                    hourly[hour_key] = round(seconds)
+                    del self._pending_hourly[hour_key]
+            
+            usage = None
+            if self._current_usage_id:
+                if closing_duration is not None:
+                    usage = (self._current_usage_id, int(closing_duration), False)
+                else:
+                    usage = (self._current_usage_id, int(tracker.now() - self._current_app_start), True)
+            if closing_duration is not None:
+                self._current_usage_id = None
+            
+            today = datetime.fromtimestamp(tracker.now()).strftime("%Y-%m-%d")
+            daily = (today, int(self._total_time), int(self._active_time), int(self._idle_time), len(self._apps_used_today))
+            session = None
+            if self.session_id:
+                session = (self.session_id, int(self._total_time), int(self._active_time), int(self._idle_time))
+            
+            saved = db.flush_usage(hourly, usage, daily, session, journal.checkpoint(self._journal_state()))
+            self._last_flush = tracker.now()
+            return saved
+    
+    def _journal_state(self) -> tuple:
+        usage = self._current_usage_id
+        usage_id = usage.result() if usage and usage.done() and usage.exception() is None else 0
+        return (self.session_id or 0, usage_id, self._current_app_start, self._total_time, self._active_time,
+                self._idle_time, len(self._apps_used_today))
+    
+    def _recover(self):
+        files = journal.pending()
+        if not files:
+            return
+        generation, position = db.get_journal_position()
+        first = next((index for index, (file_generation, _) in enumerate(files) if file_generation == generation),
+                     None)
+        state, last = None, None
+        usage_ids: Dict[float, int] = {}
+        switches: List[Tuple[float, bool]] = []
+        for index, (_, records) in enumerate(files):
+            replayed = first is None or index >= first
+            for offset, kind, fields in records:
+                unapplied = first is None or index > first or (index == first and offset >= position)
+                if kind == USAGE:
+                    usage_ids[fields[0]] = fields[1]
+                elif kind == APP:
+                    switches.append((fields[0], unapplied))
+                    if state is not None:
+                        state[6] += fields[1]
+                        last = max(last or fields[0], fields[0])
+                elif not replayed:
+                    continue
+                elif kind == STATE:
+                    state = list(fields)
+                    last = last or fields[2]
+                    if fields[1]:
+                        usage_ids[fields[2]] = fields[1]
+                elif kind == TICK and state is not None:
+                    end, delta, is_idle = fields
+                    state[3] += delta
+                    if is_idle:
+                        state[5] += delta
+                    else:
+                        state[4] += delta
+                        if unapplied:
+                            self._credit_hourly(end - delta, end)
+                    last = end
+        if state is None:
+            journal.discard()
+            return
+        
+        saved = []
+        for start, usage_id in usage_ids.items():
+            closing = next(((moment, unapplied) for moment, unapplied in switches if moment > start), (last, True))
+            if closing[1]:
+                saved.append(db.update_app_usage(usage_id, int(closing[0] - start), is_active=False))
+        hourly = {hour_key: round(seconds) for hour_key, seconds in self._pending_hourly.items()}
+        self._pending_hourly.clear()
+        session_id, _, _, total, active, idle, apps = state
+        ended = datetime.fromtimestamp(last)
+        daily = (ended.strftime("%Y-%m-%d"), int(total), int(active), int(idle), apps)
+        session = (session_id, int(total), int(active), int(idle), ended) if session_id else None
+        applied = (files[-1][0], max((offset for offset, _, _ in files[-1][1]), default=0) + 1)
+        saved.append(db.flush_usage(hourly, None, daily, session, applied))
+        for future in saved:
+            future.result()
+        since = datetime.fromtimestamp(min([moment for moment, _ in switches] + list(usage_ids) + [last]))
+        db.rebuild_rollups(since.strftime("%Y-%m-%d"), daily[0])
+        journal.discard()
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Recovered session #{session_id} from the journal: "
+              f"{int(total)} s total, {sum(hourly.values())} s of unsaved activity")
     
     def _schedule_save(self):
         if not self._running:
@@ -78,15 +213,9 @@ class UsageCollector:
     
     def _periodic_save(self):
         if self._running:
-            self._save_stats()
+            self._flush()
             self._schedule_save()
     
-    def _save_stats(self):
-        today = date.today().strftime("%Y-%m-%d")
-        db.update_daily_stats(today, int(self._total_time), int(self._active_time), int(self._idle_time), len(self._apps_used_today))
-        if self.session_id:
-            db.update_session(self.session_id, int(self._total_time), int(self._active_time), int(self._idle_time))
-    
     def get_current_stats(self) -> Dict:
         return {
             "session_id": self.session_id,
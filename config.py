@@ -1,18 +1,76 @@
 import os
+import socket
 from pathlib import Path
 
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 LOGS_DIR = BASE_DIR / "logs"
 
-DATA_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
+DB_PATH = Path(os.environ.get("PC_USAGE_MONITOR_DB", DATA_DIR / "usage_monitor.db"))
+DB_CACHE_SIZE_KB = 8192
+DB_MMAP_SIZE = 64 * 1024 * 1024
+DB_READER_POOL_SIZE = 4
+DB_STATEMENT_CACHE_SIZE = 128
+DB_TITLE_CACHE_SIZE = 4096
+DB_WRITE_QUEUE_SIZE = 10000
+DB_WRITE_BATCH_SIZE = 256
+PARTITION_DIR = DB_PATH.parent / f"{DB_PATH.stem}_partitions"
+PARTITION_MAX_ATTACHED = 8
+PARTITION_CLOSE_GRACE_SEC = 3600
 
-DB_PATH = DATA_DIR / "usage_monitor.db"
+RETENTION_RAW_DAYS = 30
+RETENTION_HOURLY_DAYS = 365
+RETENTION_CHUNK_ROWS = 2000
+RETENTION_CHUNK_PAUSE_SEC = 0.05
+RETENTION_VACUUM_PAGES = 512
+RETENTION_START_DELAY_SEC = 300
+RETENTION_INTERVAL_SEC = 6 * 3600
 
 IDLE_THRESHOLD_SEC = 180
 POLL_INTERVAL_SEC = 1
+POLL_MAX_INTERVAL_SEC = 5
+POLL_IDLE_MAX_INTERVAL_SEC = 30
+POLL_BACKOFF_FACTOR = 1.5
+TRACKER_BACKEND = os.environ.get("PC_USAGE_MONITOR_BACKEND", "win32")
+TRACKER_BACKEND_OPTIONS = {}
 SAVE_INTERVAL_SEC = 30
+MAX_UNSAVED_SEC = 60
+JOURNAL_PATH = DB_PATH.parent / f"{DB_PATH.stem}.journal"
+JOURNAL_SYNC_SEC = 1.0
+JOURNAL_MAX_BYTES = 1024 * 1024
+CATEGORY_CACHE_SIZE = 2048
+TITLE_CACHE_SIZE = 2048
+PROCESS_CACHE_SIZE = 256
+
+HTTP_BIND_ADDRESS = os.environ.get("PC_USAGE_MONITOR_BIND", "127.0.0.1")
+HTTP_PORT = int(os.environ.get("PC_USAGE_MONITOR_PORT", "52847"))
+HTTP_MAX_WORKERS = 8
+HTTP_KEEPALIVE_TIMEOUT_SEC = 2
+HTTP_IDLE_POLL_SEC = 0.1
+STREAM_INTERVAL_SEC = 1
+STREAM_HEARTBEAT_SEC = 15
+STREAM_SEND_TIMEOUT_SEC = 2
+RESPONSE_CACHE_MAX_BYTES = 4 * 1024 * 1024
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+STATIC_MAX_AGE_SEC = 300
+RANGE_MAX_BUCKETS = 5000
+RANGE_FETCH_ROWS = 500
+CHUNK_SIZE_BYTES = 16384
+EXPORT_FETCH_ROWS = 1000
+
+METRICS_ENABLED = os.environ.get("PC_USAGE_MONITOR_METRICS", "1") != "0"
+
+INGEST_ENABLED = os.environ.get("PC_USAGE_MONITOR_INGEST", "0") == "1"
+INGEST_TOKEN = os.environ.get("PC_USAGE_MONITOR_INGEST_TOKEN", "")
+INGEST_MAX_BYTES = 8 * 1024 * 1024
+INGEST_MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+INGEST_MAX_SEGMENT_SEC = 24 * 3600
+FLEET_HOST_NAME = os.environ.get("PC_USAGE_MONITOR_HOST", socket.gethostname())
+FLEET_UPLOAD_URL = os.environ.get("PC_USAGE_MONITOR_UPLOAD_URL", "")
+FLEET_UPLOAD_INTERVAL_SEC = 300
+FLEET_UPLOAD_BATCH_ROWS = 5000
+FLEET_UPLOAD_TIMEOUT_SEC = 30
 
 PRIVACY_MODE = "full"
 BLACKLIST_WINDOWS = ["Пароль", "Password", "Личное", "Private", "Банк", "Bank"]
@@ -1,35 +1,655 @@
+import gzip
+import hashlib
+import os
+import shutil
+import stat
+import sys
 import sqlite3
+from collections import OrderedDict
 from datetime import datetime, date, timedelta
-from contextlib import contextmanager
-from typing import List, Dict
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, List, Dict, Iterator, Optional, Tuple
 import threading
+import queue
+import time
 
-from config import DB_PATH
+from metrics import (metrics, TimedLock, db_lock_wait, db_query_duration, db_commit_duration, db_rows_written_total,
+                     db_write_batch_size, db_write_queue_wait)
+from config import (DB_PATH, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_READER_POOL_SIZE, DB_STATEMENT_CACHE_SIZE,
+                    DB_WRITE_QUEUE_SIZE, DB_WRITE_BATCH_SIZE, DB_TITLE_CACHE_SIZE, PARTITION_DIR,
+                    PARTITION_MAX_ATTACHED, PARTITION_CLOSE_GRACE_SEC, RETENTION_CHUNK_ROWS, RETENTION_VACUUM_PAGES,
+                    RANGE_FETCH_ROWS)
+
+EXPORT_TABLES = {
+    "app_usage": "date_str",
+    "app_launches": "date_str",
+    "sessions": "substr(start_time, 1, 10)",
+    "daily_stats": "date_str",
+    "hourly_stats": "date_str",
+    "daily_app_stats": "date_str",
+    "daily_category_stats": "date_str",
+    "hourly_app_stats": "date_str",
+    "fleet_usage": "date_str",
+    "fleet_daily_stats": "date_str",
+    "fleet_daily_app_stats": "date_str",
+    "fleet_hourly_stats": "date_str",
+}
+
+SCHEMA_VERSION = 3
+
+PARTITIONED_TABLES = ("app_usage", "app_launches")
+
+USAGE_COLUMNS = "session_id, app_id, title_id, start_time, end_time, duration_seconds, is_active, date_str"
+LAUNCH_COLUMNS = "app_id, launch_time, date_str"
+
+DECODED_COLUMNS = {
+    "app_usage": ("u.id, u.session_id, a.app_name, a.exe_name, t.title AS window_title, a.category, u.start_time, "
+                  "u.end_time, u.duration_seconds, u.is_active, u.date_str"),
+    "app_launches": "u.id, a.app_name, a.exe_name, u.launch_time, u.date_str",
+}
+
+PARTITION_ID_SPAN = 10 ** 8
+PARTITION_LIVE_ID_START = 10 ** 7
+
+PARTITION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.app_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER,
+        app_id INTEGER NOT NULL,
+        title_id INTEGER,
+        start_time TIMESTAMP NOT NULL,
+        end_time TIMESTAMP,
+        duration_seconds INTEGER DEFAULT 0,
+        is_active INTEGER DEFAULT 1,
+        date_str TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.app_launches (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_id INTEGER NOT NULL,
+        launch_time TIMESTAMP NOT NULL,
+        date_str TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_app_usage_time ON app_usage(start_time)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_app_usage_date_app ON app_usage(date_str, app_id)",
+    "CREATE INDEX IF NOT EXISTS {schema}.idx_app_launches_date ON app_launches(date_str, app_id)",
+]
+
+
+def title_hash(title: str) -> int:
+    return int.from_bytes(hashlib.blake2b(title.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def decoded_source(table: str, source: str) -> str:
+    titles = " LEFT JOIN main.titles t ON t.id = u.title_id" if table == "app_usage" else ""
+    return f"SELECT {DECODED_COLUMNS[table]} FROM {source} u JOIN main.apps a ON a.id = u.app_id{titles}"
+
+
+def partition_alias(month: str) -> str:
+    return "p" + month.replace("-", "_")
+
+
+def partition_base(month: str) -> int:
+    return int(month.replace("-", "")) * PARTITION_ID_SPAN
+
+
+def partition_of_id(row_id: int) -> Optional[str]:
+    base = row_id // PARTITION_ID_SPAN
+    if not base:
+        return None
+    return f"{base // 100:04d}-{base % 100:02d}"
+
+
+def next_month(month: str) -> str:
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+class PartitionCursor:
+    def __init__(self, conn: sqlite3.Connection, queries: Iterator[Tuple[str, tuple]]):
+        self._conn = conn
+        self._queries = queries
+        self._cur: Optional[sqlite3.Cursor] = None
+        self.description = None
+        self._advance()
+    
+    def _advance(self):
+        if self._cur is not None:
+            self._cur.close()
+            self._cur = None
+        query = next(self._queries, None)
+        if query is not None:
+            self._cur = self._conn.cursor()
+            self._cur.row_factory = None
+            self._cur.execute(*query)
+            self.description = self.description or self._cur.description
+    
+    def fetchmany(self, size: int) -> list:
+        while self._cur is not None:
+            rows = self._cur.fetchmany(size)
+            if rows:
+                return rows
+            self._advance()
+        return []
+    
+    def close(self):
+        if self._cur is not None:
+            self._cur.close()
+            self._cur = None
+        self._queries.close()
+
+
+class ConnectionPool:
+    def __init__(self, db_path: str, max_readers: int = DB_READER_POOL_SIZE):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: List[sqlite3.Connection] = []
+        self._idle_readers: queue.LifoQueue = queue.LifoQueue()
+        self._pool_lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False,
+                               cached_statements=DB_STATEMENT_CACHE_SIZE, uri=True)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("title_hash", 1, title_hash, deterministic=True)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    @property
+    def writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            with self._pool_lock:
+                if self._writer is None:
+                    self._writer = self._connect()
+        return self._writer
+    
+    def acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if len(self._readers) < self.max_readers:
+                conn = self._connect()
+                self._readers.append(conn)
+                return conn
+        return self._idle_readers.get()
+    
+    def release_reader(self, conn: sqlite3.Connection):
+        self._idle_readers.put(conn)
+    
+    def idle_readers(self) -> List[sqlite3.Connection]:
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle_readers.get_nowait())
+            except queue.Empty:
+                return idle
+    
+    def close(self):
+        with self._pool_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self._idle_readers = queue.LifoQueue()
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+def _resolve(value: Any, applied: Dict[Future, Tuple[Any, Optional[BaseException]]]) -> Any:
+    if isinstance(value, Future):
+        if value in applied:
+            result, error = applied[value]
+            if error is not None:
+                raise error
+            return result
+        return value.result()
+    if isinstance(value, tuple):
+        return tuple(_resolve(item, applied) for item in value)
+    return value
+
+
+class DatabaseWriter:
+    def __init__(self, manager: "DatabaseManager", max_queue: int = DB_WRITE_QUEUE_SIZE,
+                 max_batch: int = DB_WRITE_BATCH_SIZE):
+        self._manager = manager
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self.batches = 0
+        self.commands = 0
+    
+    def submit(self, func: Callable, *args, partitions: Tuple[str, ...] = ()) -> Future:
+        future = Future()
+        if threading.current_thread() is self._thread:
+            future.set_exception(RuntimeError("Write submitted from the writer thread"))
+            return future
+        self._ensure_started()
+        self._queue.put((func, args, partitions, future, time.perf_counter()))
+        return future
+    
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+    
+    def flush(self, timeout: Optional[float] = None):
+        self.submit(lambda cur: None).result(timeout)
+    
+    def close(self):
+        with self._thread_lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._queue.put(None)
+            thread.join()
+            self._thread = None
+    
+    def _run(self):
+        empty = object()
+        pending = self._queue.get()
+        while pending is not None:
+            batch, partitions = [pending], set(pending[2])
+            pending = empty
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None or len(partitions.union(item[2])) > self._manager.write_partition_limit:
+                    pending = item
+                    break
+                batch.append(item)
+                partitions.update(item[2])
+            self._apply(batch, partitions)
+            if pending is empty:
+                pending = self._queue.get()
+    
+    def _apply(self, batch: list, partitions: set):
+        applied: Dict[Future, Tuple[Any, Optional[BaseException]]] = {}
+        started = time.perf_counter()
+        try:
+            with self._manager._lock:
+                with self._manager._get_connection() as conn:
+                    self._manager._prepare_writer(conn, partitions)
+                    cur = conn.cursor()
+                    cur.execute("BEGIN")
+                    for func, args, _, future, queued in batch:
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        metrics.observe(db_write_queue_wait, started - queued)
+                        with metrics.timer(db_query_duration, func.__name__.lstrip("_")):
+                            cur.execute("SAVEPOINT command")
+                            try:
+                                applied[future] = (func(cur, *_resolve(args, applied)), None)
+                                cur.execute("RELEASE command")
+                            except Exception as e:
+                                cur.execute("ROLLBACK TO command")
+                                cur.execute("RELEASE command")
+                                self._manager._forget_dimensions()
+                                applied[future] = (None, e)
+        except Exception as e:
+            self._manager._forget_dimensions()
+            for _, _, _, future, _ in batch:
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.commands += len(batch)
+        metrics.observe(db_write_batch_size, len(batch))
+        for future, (result, error) in applied.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
 
 
 class DatabaseManager:
-    _lock = threading.Lock()
+    _lock = TimedLock(db_lock_wait)
     
     def __init__(self):
         self.db_path = str(DB_PATH)
-        self._init_database()
+        self._pool = ConnectionPool(self.db_path)
+        self._generation = 0
+        self._base_generation = 0
+        self._date_generations: Dict[str, int] = {}
+        self._touched_dates: set = set()
+        self._snapshot = threading.local()
+        self._host_ids: Dict[str, int] = {}
+        self._app_ids: Dict[Tuple[str, Optional[str], Optional[str]], int] = {}
+        self._title_ids: OrderedDict = OrderedDict()
+        self._partitions: Dict[str, Dict] = {}
+        self._partition_epoch = 0
+        self._attached: Dict[sqlite3.Connection, OrderedDict] = {}
+        self.write_partition_limit = PARTITION_MAX_ATTACHED - 3
+        self._writer = DatabaseWriter(self)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        outdated = self._init_database()
+        self._load_partitions()
+        if outdated:
+            self._upgrade_partitions()
+        if self._has_legacy_rows():
+            self.migrate_partitions()
     
     @contextmanager
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=10)
-        conn.row_factory = sqlite3.Row
+        conn = self._pool.writer
+        self._touched_dates = set()
+        changes = conn.total_changes
         try:
             yield conn
-            conn.commit()
+            with metrics.timer(db_commit_duration):
+                conn.commit()
+            metrics.inc(db_rows_written_total, conn.total_changes - changes)
+            self._bump_generation()
         except Exception as e:
             conn.rollback()
             raise e
+    
+    def _touch(self, date_str: Optional[str] = None):
+        self._touched_dates.add(date_str)
+    
+    def _bump_generation(self):
+        self._generation += 1
+        if None in self._touched_dates:
+            self._base_generation = self._generation
+        for date_str in self._touched_dates:
+            if date_str is not None:
+                self._date_generations[date_str] = self._generation
+        self._touched_dates = set()
+    
+    def get_generation(self, start_date: str = None, end_date: str = None) -> int:
+        if start_date is None:
+            return self._generation
+        end_date = end_date or start_date
+        generation = self._base_generation
+        for date_str, date_generation in list(self._date_generations.items()):
+            if start_date <= date_str <= end_date and date_generation > generation:
+                generation = date_generation
+        return generation
+    
+    @contextmanager
+    def _get_reader(self):
+        conn = getattr(self._snapshot, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._pool.acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._pool.release_reader(conn)
+    
+    @contextmanager
+    def read_snapshot(self):
+        if getattr(self._snapshot, "conn", None) is not None:
+            yield
+            return
+        conn = self._pool.acquire_reader()
+        try:
+            self._attach(conn, self._partition_months(*self._recent_months()))
+            conn.execute("BEGIN")
+            self._snapshot.conn = conn
+            yield
+        finally:
+            self._snapshot.conn = None
+            conn.rollback()
+            self._pool.release_reader(conn)
+    
+    def flush(self, timeout: Optional[float] = None):
+        self._writer.flush(timeout)
+    
+    def close(self):
+        self._writer.close()
+        with self._lock:
+            self._pool.close()
+            self._attached.clear()
+    
+    def _partition_path(self, month: str) -> Path:
+        return PARTITION_DIR / f"usage_{month.replace('-', '_')}.db"
+    
+    def _partition_uri(self, month: str, mode: str) -> str:
+        return f"{self._partition_path(month).resolve().as_uri()}?mode={mode}"
+    
+    def _next_epoch(self) -> int:
+        self._partition_epoch += 1
+        return self._partition_epoch
+    
+    def _recent_months(self, now: Optional[datetime] = None) -> Tuple[str, str]:
+        now = now or datetime.now()
+        previous = now.replace(day=1) - timedelta(days=1)
+        upcoming = now + timedelta(seconds=PARTITION_CLOSE_GRACE_SEC)
+        return previous.strftime("%Y-%m-%d"), upcoming.strftime("%Y-%m-%d")
+    
+    def _partition_months(self, first_date: Optional[str] = None, last_date: Optional[str] = None) -> List[str]:
+        return [
+            month for month, info in sorted(list(self._partitions.items()))
+            if info["state"] != "archived" and (not first_date or month >= first_date[:7])
+            and (not last_date or month <= last_date[:7])
+        ]
+    
+    def _load_partitions(self):
+        with self._lock:
+            conn = self._pool.writer
+            for row in conn.execute("SELECT month, state, archive_path FROM partitions ORDER BY month").fetchall():
+                if row["state"] != "archived" and not self._partition_path(row["month"]).exists():
+                    print(f"Partition file for {row['month']} is missing: {self._partition_path(row['month'])}")
+                    continue
+                self._partitions[row["month"]] = {"state": row["state"], "archive_path": row["archive_path"],
+                                                  "epoch": self._next_epoch()}
+    
+    def _has_legacy_rows(self) -> bool:
+        with self._get_reader() as conn:
+            return any(conn.execute(f"SELECT 1 FROM main.{table} WHERE date_str IS NOT NULL LIMIT 1").fetchone()
+                       for table in PARTITIONED_TABLES)
+    
+    def _create_partition(self, conn: sqlite3.Connection, month: str):
+        path = self._partition_path(month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part = sqlite3.connect(str(path))
+        try:
+            part.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            part.execute("PRAGMA journal_mode=WAL")
+            for statement in PARTITION_SCHEMA:
+                part.execute(statement.format(schema="main"))
+            part.execute("""
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT name, ? FROM (SELECT 'app_usage' AS name UNION ALL SELECT 'app_launches')
+                WHERE name NOT IN (SELECT name FROM sqlite_sequence)
+            """, (partition_base(month) + PARTITION_LIVE_ID_START - 1,))
+            part.commit()
         finally:
-            conn.close()
+            part.close()
+        conn.execute("INSERT OR IGNORE INTO partitions (month, state, created_at) VALUES (?, 'active', ?)",
+                     (month, datetime.now()))
+        conn.commit()
+        self._partitions[month] = {"state": "active", "archive_path": None, "epoch": self._next_epoch()}
+    
+    def _attach(self, conn: sqlite3.Connection, months: List[str]) -> bool:
+        attached = self._attached.setdefault(conn, OrderedDict())
+        for month, epoch in list(attached.items()):
+            info = self._partitions.get(month)
+            if info is None or info["epoch"] != epoch or info["state"] == "archived":
+                if conn.in_transaction:
+                    return False
+                conn.execute(f"DETACH DATABASE {partition_alias(month)}")
+                del attached[month]
+        missing = [month for month in months if month not in attached]
+        if missing and (conn.in_transaction or len(months) > PARTITION_MAX_ATTACHED):
+            return False
+        for month in list(attached):
+            if len(attached) + len(missing) <= PARTITION_MAX_ATTACHED:
+                break
+            if month not in months:
+                conn.execute(f"DETACH DATABASE {partition_alias(month)}")
+                del attached[month]
+        for month in missing:
+            info = self._partitions[month]
+            mode = "rw" if info["state"] == "active" else "ro"
+            alias = partition_alias(month)
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (self._partition_uri(month, mode),))
+            conn.execute(f"PRAGMA {alias}.synchronous=NORMAL")
+            attached[month] = info["epoch"]
+        for month in months:
+            attached.move_to_end(month)
+        return True
+    
+    def _schema(self, conn: sqlite3.Connection, month: str) -> str:
+        if not self._attach(conn, [month]):
+            raise sqlite3.OperationalError(f"cannot attach partition {month} inside a transaction")
+        return partition_alias(month)
     
-    def _init_database(self):
+    def _detach_everywhere(self, month: str):
+        readers = self._pool.idle_readers()
+        try:
+            for conn in readers + [self._pool.writer]:
+                attached = self._attached.get(conn)
+                if attached and month in attached:
+                    conn.execute(f"DETACH DATABASE {partition_alias(month)}")
+                    del attached[month]
+        finally:
+            for conn in readers:
+                self._pool.release_reader(conn)
+    
+    def _prepare_writer(self, conn: sqlite3.Connection, partitions: set):
+        now = datetime.now()
+        for month in {now.strftime("%Y-%m"), self._recent_months(now)[1][:7]}:
+            if month not in self._partitions:
+                self._create_partition(conn, month)
+        months = set(self._partition_months(*self._recent_months(now)))
+        months.update(month for month in partitions if month in self._partitions)
+        self._attach(conn, sorted(months))
+    
+    def _usage_schema(self, usage_id: int) -> str:
+        month = partition_of_id(usage_id)
+        return partition_alias(month) if month else "main"
+    
+    def _usage_partitions(self, usage_id: Any) -> Tuple[str, ...]:
+        if isinstance(usage_id, Future):
+            if not usage_id.done() or usage_id.exception() is not None:
+                return ()
+            usage_id = usage_id.result()
+        month = partition_of_id(usage_id)
+        return (month,) if month else ()
+    
+    @contextmanager
+    def _raw_source(self, conn: sqlite3.Connection, table: str, first_date: Optional[str] = None,
+                    last_date: Optional[str] = None):
+        months = self._partition_months(first_date, last_date)
+        if self._attach(conn, months):
+            arms = [f"SELECT * FROM main.{table}"]
+            arms.extend(f"SELECT * FROM {partition_alias(month)}.{table}" for month in months)
+            yield f"({' UNION ALL '.join(arms)})"
+            return
+        staged = f"{table}_partitions"
+        in_transaction = conn.in_transaction
+        conn.execute(f"DROP TABLE IF EXISTS temp.{staged}")
+        conn.execute(f"CREATE TEMP TABLE {staged} AS SELECT * FROM main.{table} WHERE 0")
+        try:
+            for month in months:
+                if in_transaction:
+                    self._stage_partition(conn, staged, table, month, first_date, last_date)
+                    continue
+                conn.execute(f"""
+                    INSERT INTO temp.{staged} SELECT * FROM {self._schema(conn, month)}.{table}
+                    WHERE date_str BETWEEN ? AND ?
+                """, (first_date or "", last_date or "9999"))
+                conn.commit()
+            yield f"(SELECT * FROM main.{table} UNION ALL SELECT * FROM temp.{staged})"
+        finally:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{staged}")
+            if not in_transaction:
+                conn.commit()
+    
+    def _stage_partition(self, conn: sqlite3.Connection, staged: str, table: str, month: str,
+                         first_date: Optional[str], last_date: Optional[str]):
+        part = sqlite3.connect(self._partition_uri(month, "ro"), uri=True)
+        try:
+            cur = part.execute(f"SELECT * FROM {table} WHERE date_str BETWEEN ? AND ?",
+                               (first_date or "", last_date or "9999"))
+            placeholders = ", ".join("?" * len(cur.description))
+            while True:
+                rows = cur.fetchmany(RANGE_FETCH_ROWS)
+                if not rows:
+                    break
+                conn.executemany(f"INSERT INTO temp.{staged} VALUES ({placeholders})", rows)
+        finally:
+            part.close()
+    
+    def migrate_partitions(self) -> int:
+        moved = 0
+        with self._lock:
+            conn = self._pool.writer
+            months = [row[0] for row in conn.execute("""
+                SELECT DISTINCT substr(date_str, 1, 7) FROM (
+                    SELECT date_str FROM main.app_usage UNION SELECT date_str FROM main.app_launches
+                ) WHERE date_str IS NOT NULL ORDER BY 1
+            """).fetchall()]
+            for month in months:
+                if month not in self._partitions:
+                    self._create_partition(conn, month)
+                schema = self._schema(conn, month)
+                base = partition_base(month)
+                bounds = (month, next_month(month))
+                conn.execute("BEGIN")
+                try:
+                    conn.execute(f"""
+                        INSERT OR IGNORE INTO {schema}.app_usage (id, {USAGE_COLUMNS})
+                        SELECT id + ?, {USAGE_COLUMNS} FROM main.app_usage WHERE date_str >= ? AND date_str < ?
+                    """, (base,) + bounds)
+                    conn.execute("DELETE FROM main.app_usage WHERE date_str >= ? AND date_str < ?", bounds)
+                    moved += conn.execute("SELECT changes()").fetchone()[0]
+                    conn.execute(f"""
+                        INSERT OR IGNORE INTO {schema}.app_launches (id, {LAUNCH_COLUMNS})
+                        SELECT id + ?, {LAUNCH_COLUMNS} FROM main.app_launches WHERE date_str >= ? AND date_str < ?
+                    """, (base,) + bounds)
+                    conn.execute("DELETE FROM main.app_launches WHERE date_str >= ? AND date_str < ?", bounds)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    raise e
+            self._remap_upload_cursors(conn)
+        return moved
+    
+    def _remap_upload_cursors(self, conn: sqlite3.Connection):
+        if conn.execute("SELECT 1 FROM main.app_usage LIMIT 1").fetchone():
+            return
+        cursors = conn.execute("SELECT target, last_id FROM upload_state WHERE last_id > 0 AND last_id < ?",
+                               (PARTITION_ID_SPAN,)).fetchall()
+        for target, last_id in cursors:
+            mapped = 0
+            for month in self._partition_months():
+                base = partition_base(month)
+                found = conn.execute(f"""
+                    SELECT MAX(id) FROM {self._schema(conn, month)}.app_usage WHERE id <= ? AND id < ?
+                """, (base + last_id, base + PARTITION_LIVE_ID_START)).fetchone()[0]
+                mapped = found or mapped
+            conn.execute("UPDATE upload_state SET last_id = ? WHERE target = ?", (mapped, target))
+        conn.commit()
+    
+    def _init_database(self) -> bool:
         with self._get_connection() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return False
             cur = conn.cursor()
+            cur.execute("BEGIN")
+            legacy = self._rename_legacy(cur, "main")
             
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS sessions (
@@ -46,14 +666,13 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS app_usage (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     session_id INTEGER,
-                    app_name TEXT NOT NULL,
-                    exe_name TEXT,
-                    window_title TEXT,
-                    category TEXT DEFAULT 'other',
+                    app_id INTEGER NOT NULL,
+                    title_id INTEGER,
                     start_time TIMESTAMP NOT NULL,
                     end_time TIMESTAMP,
                     duration_seconds INTEGER DEFAULT 0,
                     is_active INTEGER DEFAULT 1,
+                    date_str TEXT,
                     FOREIGN KEY (session_id) REFERENCES sessions(id)
                 )
             """)
@@ -61,13 +680,30 @@ class DatabaseManager:
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS app_launches (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    app_name TEXT NOT NULL,
-                    exe_name TEXT,
+                    app_id INTEGER NOT NULL,
                     launch_time TIMESTAMP NOT NULL,
                     date_str TEXT NOT NULL
                 )
             """)
             
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS apps (
+                    id INTEGER PRIMARY KEY,
+                    app_name TEXT NOT NULL,
+                    exe_name TEXT,
+                    category TEXT DEFAULT 'other',
+                    UNIQUE(app_name, exe_name, category)
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS titles (
+                    id INTEGER PRIMARY KEY,
+                    hash INTEGER NOT NULL,
+                    title TEXT NOT NULL
+                )
+            """)
+            
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS daily_stats (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -90,87 +726,886 @@ class DatabaseManager:
             """)
             
             cur.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_session ON app_usage(session_id)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_name ON app_usage(app_name)")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_time ON app_usage(start_time)")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_daily_date ON daily_stats(date_str)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_date_app ON app_usage(date_str, app_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_app_launches_date ON app_launches(date_str, app_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_titles_hash ON titles(hash)")
+            
+            cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'daily_app_stats'")
+            rollups_missing = cur.fetchone() is None
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS daily_app_stats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date_str TEXT NOT NULL,
+                    app_name TEXT NOT NULL,
+                    category TEXT DEFAULT 'other',
+                    seconds INTEGER DEFAULT 0,
+                    switches INTEGER DEFAULT 0,
+                    UNIQUE(date_str, app_name, category)
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS daily_category_stats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date_str TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    seconds INTEGER DEFAULT 0,
+                    UNIQUE(date_str, category)
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS hourly_app_stats (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    date_str TEXT NOT NULL,
+                    hour INTEGER NOT NULL,
+                    app_name TEXT NOT NULL,
+                    category TEXT DEFAULT 'other',
+                    seconds INTEGER DEFAULT 0,
+                    switches INTEGER DEFAULT 0,
+                    UNIQUE(date_str, hour, app_name, category)
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS hosts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE NOT NULL,
+                    last_seen TIMESTAMP
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS fleet_usage (
+                    host_id INTEGER NOT NULL,
+                    segment_id TEXT NOT NULL,
+                    date_str TEXT NOT NULL,
+                    start_time TIMESTAMP NOT NULL,
+                    duration_seconds INTEGER DEFAULT 0,
+                    idle_seconds INTEGER DEFAULT 0,
+                    app_name TEXT NOT NULL,
+                    exe_name TEXT,
+                    window_title TEXT,
+                    category TEXT DEFAULT 'other',
+                    PRIMARY KEY (host_id, segment_id)
+                ) WITHOUT ROWID
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS fleet_daily_stats (
+                    host_id INTEGER NOT NULL,
+                    date_str TEXT NOT NULL,
+                    total_seconds INTEGER DEFAULT 0,
+                    active_seconds INTEGER DEFAULT 0,
+                    idle_seconds INTEGER DEFAULT 0,
+                    PRIMARY KEY (host_id, date_str)
+                ) WITHOUT ROWID
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS fleet_daily_app_stats (
+                    host_id INTEGER NOT NULL,
+                    date_str TEXT NOT NULL,
+                    app_name TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    seconds INTEGER DEFAULT 0,
+                    switches INTEGER DEFAULT 0,
+                    PRIMARY KEY (host_id, date_str, app_name, category)
+                ) WITHOUT ROWID
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS fleet_hourly_stats (
+                    host_id INTEGER NOT NULL,
+                    date_str TEXT NOT NULL,
+                    hour INTEGER NOT NULL,
+                    active_seconds INTEGER DEFAULT 0,
+                    PRIMARY KEY (host_id, date_str, hour)
+                ) WITHOUT ROWID
+            """)
+            
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_fleet_usage_date ON fleet_usage(date_str)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_fleet_daily_app_date ON fleet_daily_app_stats(date_str)")
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS partitions (
+                    month TEXT PRIMARY KEY,
+                    state TEXT NOT NULL DEFAULT 'active',
+                    archive_path TEXT,
+                    created_at TIMESTAMP
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS archived_titles (
+                    month TEXT NOT NULL,
+                    title_id INTEGER NOT NULL,
+                    PRIMARY KEY (month, title_id)
+                ) WITHOUT ROWID
+            """)
+            cur.execute("""
+                INSERT OR IGNORE INTO archived_titles (month, title_id)
+                SELECT p.month, t.id FROM partitions p, titles t
+                WHERE p.state = 'archived' AND NOT EXISTS (SELECT 1 FROM archived_titles x WHERE x.month = p.month)
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS journal_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    generation INTEGER NOT NULL,
+                    position INTEGER NOT NULL
+                )
+            """)
+            
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS upload_state (
+                    target TEXT PRIMARY KEY,
+                    last_id INTEGER DEFAULT 0
+                )
+            """)
+            
+            self._encode_legacy(cur, "main", legacy)
+            if rollups_missing:
+                self._rebuild_rollups(cur)
+            return True
     
-    def create_session(self) -> int:
-        with self._lock:
-            with self._get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("INSERT INTO sessions (start_time) VALUES (?)", (datetime.now(),))
-                return cur.lastrowid
+    def _migrate_app_usage_date(self, cur):
+        columns = {row["name"] for row in cur.execute("PRAGMA table_info(app_usage)")}
+        if "date_str" in columns:
+            return
+        cur.execute("ALTER TABLE app_usage ADD COLUMN date_str TEXT")
+        cur.execute("UPDATE app_usage SET date_str = DATE(start_time)")
+    
+    def _rename_legacy(self, cur, schema: str) -> List[str]:
+        legacy = []
+        for table in PARTITIONED_TABLES:
+            columns = {row["name"] for row in cur.execute(f"PRAGMA {schema}.table_info({table})").fetchall()}
+            if "app_name" not in columns:
+                continue
+            if schema == "main" and table == "app_usage":
+                self._migrate_app_usage_date(cur)
+            indexes = cur.execute(f"""
+                SELECT name FROM {schema}.sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+            """, (table,)).fetchall()
+            for (index,) in indexes:
+                cur.execute(f"DROP INDEX {schema}.{index}")
+            cur.execute(f"ALTER TABLE {schema}.{table} RENAME TO {table}_legacy")
+            legacy.append(table)
+        return legacy
+    
+    def _encode_legacy(self, cur, schema: str, tables: List[str]):
+        for table in tables:
+            source = f"{schema}.{table}_legacy"
+            usage = table == "app_usage"
+            cur.execute(f"""
+                INSERT INTO main.apps (app_name, exe_name, category)
+                SELECT DISTINCT app_name, exe_name, {"category" if usage else "'other'"} FROM {source} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM main.apps a WHERE a.app_name = s.app_name AND a.exe_name IS s.exe_name
+                    {"AND a.category IS s.category" if usage else ""}
+                )
+            """)
+            if usage:
+                cur.execute(f"""
+                    INSERT INTO main.titles (hash, title)
+                    SELECT title_hash(window_title), window_title
+                    FROM (SELECT DISTINCT window_title FROM {source} WHERE window_title IS NOT NULL) s
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM main.titles t
+                        WHERE t.hash = title_hash(s.window_title) AND t.title = s.window_title
+                    )
+                """)
+                cur.execute(f"""
+                    INSERT INTO {schema}.app_usage (id, {USAGE_COLUMNS})
+                    SELECT s.id, s.session_id,
+                           (SELECT a.id FROM main.apps a WHERE a.app_name = s.app_name AND a.exe_name IS s.exe_name
+                            AND a.category IS s.category),
+                           CASE WHEN s.window_title IS NOT NULL THEN (
+                               SELECT t.id FROM main.titles t
+                               WHERE t.hash = title_hash(s.window_title) AND t.title = s.window_title
+                           ) END,
+                           s.start_time, s.end_time, s.duration_seconds, s.is_active, s.date_str
+                    FROM {source} s
+                """)
+            else:
+                cur.execute(f"""
+                    INSERT INTO {schema}.app_launches (id, {LAUNCH_COLUMNS})
+                    SELECT s.id,
+                           (SELECT MIN(a.id) FROM main.apps a
+                            WHERE a.app_name = s.app_name AND a.exe_name IS s.exe_name),
+                           s.launch_time, s.date_str
+                    FROM {source} s
+                """)
+            cur.execute(f"DELETE FROM {schema}.sqlite_sequence WHERE name = ?", (table,))
+            cur.execute(f"UPDATE {schema}.sqlite_sequence SET name = ? WHERE name = ?", (table, f"{table}_legacy"))
+            cur.execute(f"DROP TABLE {source}")
     
-    def update_session(self, session_id: int, total_sec: int, active_sec: int, idle_sec: int):
+    def _upgrade_partitions(self):
         with self._lock:
-            with self._get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    UPDATE sessions 
-                    SET total_seconds = ?, active_seconds = ?, idle_seconds = ?, end_time = ?
-                    WHERE id = ?
-                """, (total_sec, active_sec, idle_sec, datetime.now(), session_id))
+            conn = self._pool.writer
+            for month, info in sorted(list(self._partitions.items())):
+                if info["state"] == "archived":
+                    continue
+                path = self._partition_path(month)
+                if info["state"] == "closed":
+                    os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+                try:
+                    self._encode_partition(conn, month)
+                finally:
+                    if info["state"] == "closed":
+                        os.chmod(path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+    
+    def _encode_partition(self, conn: sqlite3.Connection, month: str):
+        alias = partition_alias(month)
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (self._partition_uri(month, "rw"),))
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                legacy = self._rename_legacy(cur, alias)
+                for statement in PARTITION_SCHEMA:
+                    cur.execute(statement.format(schema=alias))
+                self._encode_legacy(cur, alias, legacy)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            if legacy:
+                cur.execute(f"PRAGMA {alias}.incremental_vacuum").fetchall()
+        finally:
+            conn.execute(f"DETACH DATABASE {alias}")
+    
+    def create_session(self) -> Future:
+        return self._writer.submit(self._create_session)
+    
+    def _create_session(self, cur) -> int:
+        now = datetime.now()
+        cur.execute("INSERT INTO sessions (start_time) VALUES (?)", (now,))
+        self._touch(now.strftime("%Y-%m-%d"))
+        return cur.lastrowid
+    
+    def update_session(self, session_id: int, total_sec: int, active_sec: int, idle_sec: int) -> Future:
+        return self._writer.submit(self._update_session, session_id, total_sec, active_sec, idle_sec)
+    
+    def _update_session(self, cur, session_id: int, total_sec: int, active_sec: int, idle_sec: int,
+                        ended: Optional[datetime] = None):
+        now = ended or datetime.now()
+        cur.execute("""
+            UPDATE sessions 
+            SET total_seconds = ?, active_seconds = ?, idle_seconds = ?, end_time = ?
+            WHERE id = ?
+        """, (total_sec, active_sec, idle_sec, now, session_id))
+        self._touch(now.strftime("%Y-%m-%d"))
     
-    def close_session(self, session_id: int, total_sec: int, active_sec: int, idle_sec: int):
-        self.update_session(session_id, total_sec, active_sec, idle_sec)
+    def close_session(self, session_id: int, total_sec: int, active_sec: int, idle_sec: int) -> Future:
+        return self.update_session(session_id, total_sec, active_sec, idle_sec)
     
     def log_app_start(self, session_id: int, app_name: str, exe_name: str, 
-                      window_title: str, category: str) -> int:
+                      window_title: str, category: str) -> Future:
+        return self._writer.submit(self._log_app_start, session_id, app_name, exe_name, window_title, category)
+    
+    def _log_app_start(self, cur, session_id: int, app_name: str, exe_name: str,
+                       window_title: str, category: str) -> int:
+        now = datetime.now()
+        date_str = now.strftime("%Y-%m-%d")
+        schema = partition_alias(now.strftime("%Y-%m"))
+        app_id = self._app_id(cur, app_name, exe_name, category)
+        cur.execute(f"""
+            INSERT INTO {schema}.app_usage 
+            (session_id, app_id, title_id, start_time, is_active, date_str)
+            VALUES (?, ?, ?, ?, 1, ?)
+        """, (session_id, app_id, self._title_id(cur, window_title), now, date_str))
+        usage_id = cur.lastrowid
+        
+        cur.execute(f"""
+            INSERT INTO {schema}.app_launches (app_id, launch_time, date_str)
+            VALUES (?, ?, ?)
+        """, (app_id, now, date_str))
+        
+        self._add_to_rollups(cur, date_str, app_name, category, 0, 1)
+        return usage_id
+    
+    def _app_id(self, cur, app_name: str, exe_name: Optional[str], category: Optional[str]) -> int:
+        key = (app_name, exe_name, category)
+        app_id = self._app_ids.get(key)
+        if app_id is not None:
+            return app_id
+        cur.execute("SELECT id FROM main.apps WHERE app_name = ? AND exe_name IS ? AND category IS ?", key)
+        row = cur.fetchone()
+        if row:
+            app_id = row[0]
+        else:
+            cur.execute("INSERT INTO main.apps (app_name, exe_name, category) VALUES (?, ?, ?)", key)
+            app_id = cur.lastrowid
+        self._app_ids[key] = app_id
+        return app_id
+    
+    def _title_id(self, cur, title: Optional[str]) -> Optional[int]:
+        if title is None:
+            return None
+        title_id = self._title_ids.get(title)
+        if title_id is not None:
+            self._title_ids.move_to_end(title)
+            return title_id
+        digest = title_hash(title)
+        cur.execute("SELECT id FROM main.titles WHERE hash = ? AND title = ?", (digest, title))
+        row = cur.fetchone()
+        if row:
+            title_id = row[0]
+        else:
+            cur.execute("INSERT INTO main.titles (hash, title) VALUES (?, ?)", (digest, title))
+            title_id = cur.lastrowid
+        self._title_ids[title] = title_id
+        if len(self._title_ids) > DB_TITLE_CACHE_SIZE:
+            self._title_ids.popitem(last=False)
+        return title_id
+    
+    def _forget_dimensions(self):
+        self._app_ids.clear()
+        self._title_ids.clear()
+    
+    def update_app_usage(self, usage_id: int, duration: int, is_active: bool = True) -> Future:
+        return self._writer.submit(self._update_app_usage, usage_id, duration, is_active,
+                                   partitions=self._usage_partitions(usage_id))
+    
+    def _update_app_usage(self, cur, usage_id: int, duration: int, is_active: bool):
+        schema = self._usage_schema(usage_id)
+        cur.execute(f"""
+            SELECT u.date_str, a.app_name, a.category, u.duration_seconds
+            FROM {schema}.app_usage u JOIN main.apps a ON a.id = u.app_id WHERE u.id = ?
+        """, (usage_id,))
+        row = cur.fetchone()
+        cur.execute(f"""
+            UPDATE {schema}.app_usage 
+            SET duration_seconds = ?, end_time = ?, is_active = ?
+            WHERE id = ?
+        """, (duration, datetime.now(), 1 if is_active else 0, usage_id))
+        self._touch(row["date_str"] if row else None)
+        if row and duration != (row["duration_seconds"] or 0):
+            delta = duration - (row["duration_seconds"] or 0)
+            self._add_to_rollups(cur, row["date_str"], row["app_name"], row["category"], delta, 0)
+    
+    def _add_to_rollups(self, cur, date_str: str, app_name: str, category: str, seconds: int, switches: int):
+        self._touch(date_str)
+        cur.execute("""
+            INSERT INTO daily_app_stats (date_str, app_name, category, seconds, switches)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(date_str, app_name, category) DO UPDATE SET
+                seconds = seconds + ?, switches = switches + ?
+        """, (date_str, app_name, category, seconds, switches, seconds, switches))
+        cur.execute("""
+            INSERT INTO daily_category_stats (date_str, category, seconds)
+            VALUES (?, ?, ?)
+            ON CONFLICT(date_str, category) DO UPDATE SET
+                seconds = seconds + ?
+        """, (date_str, category, seconds, seconds))
+    
+    def rebuild_rollups(self, first_date: Optional[str] = None, last_date: Optional[str] = None):
+        self._writer.submit(self._stage_rebuild, None).result()
+        for month in self._partition_months(first_date, last_date):
+            self._writer.submit(self._stage_rebuild, month, first_date, last_date, partitions=(month,))
+        self._writer.submit(self._rebuild_rollups, True, first_date, last_date).result()
+    
+    def _stage_rebuild(self, cur, month: Optional[str], first_date: Optional[str] = None,
+                       last_date: Optional[str] = None):
+        if month is None:
+            cur.execute("DROP TABLE IF EXISTS temp.rebuild_usage")
+            cur.execute("""
+                CREATE TEMP TABLE rebuild_usage (
+                    date_str TEXT, app_name TEXT, category TEXT, seconds INTEGER, switches INTEGER
+                )
+            """)
+            return
+        cur.execute(f"""
+            INSERT INTO temp.rebuild_usage
+            SELECT u.date_str, a.app_name, a.category, u.seconds, u.switches FROM (
+                SELECT date_str, app_id, SUM(duration_seconds) AS seconds, COUNT(*) AS switches
+                FROM {partition_alias(month)}.app_usage WHERE date_str BETWEEN ? AND ? GROUP BY date_str, app_id
+            ) u JOIN main.apps a ON a.id = u.app_id
+        """, (first_date or "", last_date or "9999"))
+    
+    def _rebuild_rollups(self, cur, staged: bool = False, first_date: Optional[str] = None,
+                         last_date: Optional[str] = None):
+        self._touch()
+        partitions = "UNION ALL SELECT date_str, app_name, category, seconds, switches FROM temp.rebuild_usage"
+        cur.execute("DROP TABLE IF EXISTS temp.rebuild_dates")
+        cur.execute(f"""
+            CREATE TEMP TABLE rebuild_dates AS SELECT date_str FROM (
+                SELECT date_str FROM main.app_usage UNION SELECT date_str FROM hourly_app_stats
+                {"UNION SELECT date_str FROM temp.rebuild_usage" if staged else ""}
+                {"UNION SELECT date_str FROM daily_app_stats" if first_date else ""}
+            ) WHERE date_str BETWEEN ? AND ?
+        """, (first_date or "", last_date or "9999"))
+        cur.execute("DELETE FROM daily_app_stats WHERE date_str IN (SELECT date_str FROM rebuild_dates)")
+        cur.execute("DELETE FROM daily_category_stats WHERE date_str IN (SELECT date_str FROM rebuild_dates)")
+        cur.execute(f"""
+            INSERT INTO daily_app_stats (date_str, app_name, category, seconds, switches)
+            SELECT date_str, app_name, category, SUM(seconds), SUM(switches) FROM (
+                SELECT u.date_str, a.app_name, a.category, u.duration_seconds AS seconds, 1 AS switches
+                FROM main.app_usage u JOIN main.apps a ON a.id = u.app_id
+                UNION ALL
+                SELECT date_str, app_name, category, seconds, switches FROM hourly_app_stats
+                {partitions if staged else ""}
+            ) WHERE date_str IN (SELECT date_str FROM rebuild_dates) GROUP BY date_str, app_name, category
+        """)
+        cur.execute("""
+            INSERT INTO daily_category_stats (date_str, category, seconds)
+            SELECT date_str, category, SUM(seconds)
+            FROM daily_app_stats WHERE date_str IN (SELECT date_str FROM rebuild_dates)
+            GROUP BY date_str, category
+        """)
+        cur.execute("DROP TABLE rebuild_dates")
+        if staged:
+            cur.execute("DROP TABLE temp.rebuild_usage")
+    
+    def compact_raw_usage(self, cutoff: str, chunk_rows: int = RETENTION_CHUNK_ROWS) -> int:
+        return self._writer.submit(self._compact_raw_usage, cutoff, chunk_rows).result()
+    
+    def _compact_raw_usage(self, cur, cutoff: str, chunk_rows: int) -> int:
+        cur.execute("DROP TABLE IF EXISTS temp.compact_ids")
+        cur.execute("""
+            CREATE TEMP TABLE compact_ids AS
+            SELECT id FROM app_usage WHERE date_str < ? ORDER BY id LIMIT ?
+        """, (cutoff, chunk_rows))
+        cur.execute("""
+            INSERT INTO hourly_app_stats (date_str, hour, app_name, category, seconds, switches)
+            SELECT u.date_str, u.hour, a.app_name, a.category, u.seconds, u.switches FROM (
+                SELECT date_str, CAST(strftime('%H', start_time) AS INTEGER) AS hour, app_id,
+                       SUM(duration_seconds) AS seconds, COUNT(*) AS switches
+                FROM app_usage WHERE id IN (SELECT id FROM compact_ids)
+                GROUP BY 1, 2, 3
+            ) u JOIN main.apps a ON a.id = u.app_id WHERE 1
+            ON CONFLICT(date_str, hour, app_name, category) DO UPDATE SET
+                seconds = seconds + excluded.seconds, switches = switches + excluded.switches
+        """)
+        cur.execute("DELETE FROM app_usage WHERE id IN (SELECT id FROM compact_ids)")
+        compacted = cur.rowcount
+        cur.execute("DROP TABLE compact_ids")
+        if compacted:
+            self._touch()
+        return compacted
+    
+    def expire_rows(self, table: str, cutoff: str, chunk_rows: int = RETENTION_CHUNK_ROWS) -> int:
+        return self._writer.submit(self._expire_rows, table, cutoff, chunk_rows).result()
+    
+    def _expire_rows(self, cur, table: str, cutoff: str, chunk_rows: int) -> int:
+        cur.execute(f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM {table} WHERE date_str < ? ORDER BY id LIMIT ?
+            )
+        """, (cutoff, chunk_rows))
+        if cur.rowcount:
+            self._touch()
+        return cur.rowcount
+    
+    def close_partitions(self, now: Optional[datetime] = None) -> List[str]:
+        cutoff = (now or datetime.now()) - timedelta(seconds=PARTITION_CLOSE_GRACE_SEC)
+        current = cutoff.strftime("%Y-%m")
+        closed = []
+        for month in self._partition_months(last_date=current):
+            if month == current or self._partitions[month]["state"] != "active":
+                continue
+            if not self._writer.submit(self._finish_partition, month, cutoff, partitions=(month,)).result():
+                continue
+            with self._lock:
+                path = self._partition_path(month)
+                try:
+                    self._detach_everywhere(month)
+                    part = sqlite3.connect(str(path))
+                    try:
+                        part.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                        part.execute("PRAGMA journal_mode=DELETE")
+                    finally:
+                        part.close()
+                except sqlite3.OperationalError as e:
+                    print(f"Partition {month} is busy, closing later: {e}")
+                    continue
+                os.chmod(path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+                self._set_partition_state(month, "closed")
+            closed.append(month)
+        return closed
+    
+    def _finish_partition(self, cur, month: str, cutoff: datetime) -> bool:
+        schema = partition_alias(month)
+        cur.execute(f"SELECT 1 FROM {schema}.app_usage WHERE is_active = 1 AND end_time >= ? LIMIT 1", (cutoff,))
+        if cur.fetchone():
+            return False
+        cur.execute(f"UPDATE {schema}.app_usage SET is_active = 0 WHERE is_active = 1")
+        if cur.rowcount:
+            self._touch()
+        return True
+    
+    def _set_partition_state(self, month: str, state: str, archive_path: Optional[str] = None):
+        conn = self._pool.writer
+        conn.execute("UPDATE partitions SET state = ?, archive_path = ? WHERE month = ?", (state, archive_path, month))
+        conn.commit()
+        self._partitions[month] = {"state": state, "archive_path": archive_path, "epoch": self._next_epoch()}
+    
+    def compact_partitions(self, cutoff: str) -> int:
+        compacted = 0
+        for month in self._partition_months():
+            if self._partitions[month]["state"] != "closed" or next_month(month) > cutoff[:7]:
+                continue
+            compacted += self._writer.submit(self._compact_partition, month, partitions=(month,)).result()
+            with self._lock:
+                self._detach_everywhere(month)
+                self._partitions.pop(month, None)
+                self._next_epoch()
+                self._unlink_partition(month)
         with self._lock:
-            with self._get_connection() as conn:
-                cur = conn.cursor()
-                now = datetime.now()
-                cur.execute("""
-                    INSERT INTO app_usage 
-                    (session_id, app_name, exe_name, window_title, category, start_time, is_active)
-                    VALUES (?, ?, ?, ?, ?, ?, 1)
-                """, (session_id, app_name, exe_name, window_title, category, now))
-                
-                cur.execute("""
-                    INSERT INTO app_launches (app_name, exe_name, launch_time, date_str)
-                    VALUES (?, ?, ?, ?)
-                """, (app_name, exe_name, now, now.strftime("%Y-%m-%d")))
-                
-                return cur.lastrowid
+            self._remove_orphans()
+        return compacted
+    
+    def _compact_partition(self, cur, month: str) -> int:
+        schema = partition_alias(month)
+        cur.execute(f"""
+            INSERT INTO hourly_app_stats (date_str, hour, app_name, category, seconds, switches)
+            SELECT u.date_str, u.hour, a.app_name, a.category, u.seconds, u.switches FROM (
+                SELECT date_str, CAST(strftime('%H', start_time) AS INTEGER) AS hour, app_id,
+                       SUM(duration_seconds) AS seconds, COUNT(*) AS switches
+                FROM {schema}.app_usage
+                GROUP BY 1, 2, 3
+            ) u JOIN main.apps a ON a.id = u.app_id WHERE 1
+            ON CONFLICT(date_str, hour, app_name, category) DO UPDATE SET
+                seconds = seconds + excluded.seconds, switches = switches + excluded.switches
+        """)
+        cur.execute(f"SELECT COUNT(*) FROM {schema}.app_usage")
+        compacted = cur.fetchone()[0]
+        cur.execute("DELETE FROM partitions WHERE month = ?", (month,))
+        self._touch()
+        return compacted
+    
+    def _unlink_partition(self, month: str):
+        path = self._partition_path(month)
+        for target in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+            try:
+                if target.exists():
+                    os.chmod(target, stat.S_IREAD | stat.S_IWRITE)
+                    target.unlink()
+            except OSError as e:
+                print(f"Could not remove {target}: {e}")
     
-    def update_app_usage(self, usage_id: int, duration: int, is_active: bool = True):
+    def prune_titles(self) -> int:
+        active = {month for month in self._partition_months() if self._partitions[month]["state"] == "active"}
+        last_id = self._writer.submit(self._stage_titles, None).result()
+        for month in self._partition_months():
+            if self._partitions.get(month, {}).get("state") == "closed" and month not in active:
+                self._writer.submit(self._stage_titles, month, partitions=(month,)).result()
+        active.update(month for month in self._partition_months() if self._partitions[month]["state"] == "active")
+        active = tuple(sorted(active))
+        return self._writer.submit(self._prune_titles, last_id, active, partitions=active).result()
+    
+    def _stage_titles(self, cur, month: Optional[str]) -> Optional[int]:
+        if month is None:
+            cur.execute("DROP TABLE IF EXISTS temp.live_titles")
+            cur.execute("CREATE TEMP TABLE live_titles (title_id INTEGER PRIMARY KEY)")
+            cur.execute("""
+                INSERT OR IGNORE INTO temp.live_titles
+                SELECT title_id FROM main.app_usage WHERE title_id IS NOT NULL
+                UNION SELECT title_id FROM archived_titles
+            """)
+            return cur.execute("SELECT COALESCE(MAX(id), 0) FROM main.titles").fetchone()[0]
+        cur.execute(f"""
+            INSERT OR IGNORE INTO temp.live_titles
+            SELECT title_id FROM {partition_alias(month)}.app_usage WHERE title_id IS NOT NULL
+        """)
+    
+    def _prune_titles(self, cur, last_id: int, active: Tuple[str, ...]) -> int:
+        live = "".join(f"""
+            AND id NOT IN (SELECT title_id FROM {partition_alias(month)}.app_usage WHERE title_id IS NOT NULL)
+        """ for month in active)
+        cur.execute(f"""
+            DELETE FROM main.titles WHERE id <= ?
+            AND id NOT IN (SELECT title_id FROM temp.live_titles)
+            AND id NOT IN (SELECT title_id FROM main.app_usage WHERE title_id IS NOT NULL)
+            {live}
+        """, (last_id,))
+        pruned = cur.rowcount
+        cur.execute("DROP TABLE temp.live_titles")
+        self._title_ids.clear()
+        return pruned
+    
+    def _pin_titles(self, cur, month: str):
+        cur.execute(f"""
+            INSERT OR IGNORE INTO archived_titles (month, title_id)
+            SELECT DISTINCT ?, title_id FROM {partition_alias(month)}.app_usage WHERE title_id IS NOT NULL
+        """, (month,))
+    
+    def _remove_orphans(self):
+        if not PARTITION_DIR.exists():
+            return
+        for path in PARTITION_DIR.glob("usage_*.db"):
+            month = path.stem[6:].replace("_", "-")
+            if month not in self._partitions:
+                self._unlink_partition(month)
+    
+    def archive_partitions(self, destination: str, before: Optional[str] = None) -> List[str]:
+        destination = Path(destination)
+        destination.mkdir(parents=True, exist_ok=True)
+        months = [month for month in self._partition_months()
+                  if self._partitions[month]["state"] == "closed" and not (before and month >= before)]
+        for month in months:
+            self._writer.submit(self._pin_titles, month, partitions=(month,)).result()
+        archived = []
         with self._lock:
-            with self._get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    UPDATE app_usage 
-                    SET duration_seconds = ?, end_time = ?, is_active = ?
-                    WHERE id = ?
-                """, (duration, datetime.now(), 1 if is_active else 0, usage_id))
+            for month in months:
+                if self._partitions.get(month, {}).get("state") != "closed":
+                    continue
+                self._detach_everywhere(month)
+                path = self._partition_path(month)
+                target = destination / (path.name + ".gz")
+                with open(path, "rb") as source, gzip.open(target, "wb") as archive:
+                    shutil.copyfileobj(source, archive)
+                self._set_partition_state(month, "archived", str(target.resolve()))
+                self._unlink_partition(month)
+                archived.append(month)
+        return archived
     
-    def close_app_usage(self, usage_id: int, duration: int):
-        self.update_app_usage(usage_id, duration, is_active=False)
+    def restore_partition(self, month: str) -> bool:
+        with self._lock:
+            info = self._partitions.get(month)
+            if info is None or info["state"] != "archived":
+                return False
+            path = self._partition_path(month)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(info["archive_path"], "rb") as archive, open(path, "wb") as target:
+                shutil.copyfileobj(archive, target)
+            self._encode_partition(self._pool.writer, month)
+            os.chmod(path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            self._pool.writer.execute("DELETE FROM archived_titles WHERE month = ?", (month,))
+            self._set_partition_state(month, "closed")
+        return True
     
-    def update_daily_stats(self, date_str: str, total: int, active: int, idle: int, apps: int):
+    def get_partitions(self) -> List[Dict]:
+        partitions = []
+        for month, info in sorted(list(self._partitions.items())):
+            path = Path(info["archive_path"]) if info["state"] == "archived" else self._partition_path(month)
+            partitions.append({"month": month, "state": info["state"], "path": str(path),
+                               "bytes": path.stat().st_size if path.exists() else 0})
+        return partitions
+    
+    @metrics.timed(db_query_duration)
+    def incremental_vacuum(self, pages: int = RETENTION_VACUUM_PAGES) -> int:
         with self._lock:
-            with self._get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO daily_stats (date_str, total_seconds, active_seconds, idle_seconds, apps_used)
-                    VALUES (?, ?, ?, ?, ?)
-                    ON CONFLICT(date_str) DO UPDATE SET
-                        total_seconds = ?, active_seconds = ?, idle_seconds = ?, apps_used = ?
-                """, (date_str, total, active, idle, apps, total, active, idle, apps))
+            conn = self._pool.writer
+            conn.execute("BEGIN")
+            try:
+                for _ in range(pages):
+                    conn.execute("PRAGMA incremental_vacuum(1)")
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                raise e
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
     
-    def update_hourly_stats(self, date_str: str, hour: int, active_seconds: int):
+    def vacuum(self):
         with self._lock:
-            with self._get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    INSERT INTO hourly_stats (date_str, hour, active_seconds)
-                    VALUES (?, ?, ?)
-                    ON CONFLICT(date_str, hour) DO UPDATE SET
-                        active_seconds = active_seconds + ?
-                """, (date_str, hour, active_seconds, active_seconds))
+            conn = self._pool.writer
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+    
+    def get_size_info(self) -> Dict[str, int]:
+        with self._get_reader() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            return {
+                "bytes": page_size * conn.execute("PRAGMA page_count").fetchone()[0],
+                "free_bytes": page_size * conn.execute("PRAGMA freelist_count").fetchone()[0],
+                "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+                "partition_bytes": sum(part["bytes"] for part in self.get_partitions() if part["state"] != "archived"),
+            }
+    
+    def close_app_usage(self, usage_id: int, duration: int) -> Future:
+        return self.update_app_usage(usage_id, duration, is_active=False)
+    
+    def update_daily_stats(self, date_str: str, total: int, active: int, idle: int, apps: int) -> Future:
+        return self._writer.submit(self._update_daily_stats, date_str, total, active, idle, apps)
+    
+    def _update_daily_stats(self, cur, date_str: str, total: int, active: int, idle: int, apps: int):
+        self._touch(date_str)
+        cur.execute("""
+            INSERT INTO daily_stats (date_str, total_seconds, active_seconds, idle_seconds, apps_used)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(date_str) DO UPDATE SET
+                total_seconds = ?, active_seconds = ?, idle_seconds = ?, apps_used = ?
+        """, (date_str, total, active, idle, apps, total, active, idle, apps))
+    
+    def update_hourly_stats(self, date_str: str, hour: int, active_seconds: int) -> Future:
+        return self._writer.submit(self._update_hourly_stats, date_str, hour, active_seconds)
+    
+    def _update_hourly_stats(self, cur, date_str: str, hour: int, active_seconds: int):
+        self._touch(date_str)
+        cur.execute("""
+            INSERT INTO hourly_stats (date_str, hour, active_seconds)
+            VALUES (?, ?, ?)
+            ON CONFLICT(date_str, hour) DO UPDATE SET
+                active_seconds = active_seconds + ?
+        """, (date_str, hour, active_seconds, active_seconds))
+    
+    def flush_usage(self, hourly: Dict[Tuple[str, int], int], usage: Optional[Tuple[int, int, bool]] = None,
+                    daily: Optional[Tuple[str, int, int, int, int]] = None,
+                    session: Optional[tuple] = None, journal: Optional[Tuple[int, int]] = None) -> Future:
+        return self._writer.submit(self._flush_usage, dict(hourly), usage, daily, session, journal,
+                                   partitions=self._usage_partitions(usage[0]) if usage else ())
     
-    def get_today_stats(self) -> Dict:
+    def _flush_usage(self, cur, hourly: Dict[Tuple[str, int], int], usage: Optional[Tuple[int, int, bool]],
+                     daily: Optional[Tuple[str, int, int, int, int]], session: Optional[tuple],
+                     journal: Optional[Tuple[int, int]]):
+        for (date_str, hour), seconds in hourly.items():
+            if seconds > 0:
+                self._update_hourly_stats(cur, date_str, hour, seconds)
+        if usage:
+            self._update_app_usage(cur, *usage)
+        if daily:
+            self._update_daily_stats(cur, *daily)
+        if session:
+            self._update_session(cur, *session)
+        if journal:
+            cur.execute("""
+                INSERT INTO journal_state (id, generation, position) VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET generation = excluded.generation, position = excluded.position
+            """, journal)
+    
+    def ingest_segments(self, host: str, segments: List[tuple], hours: List[tuple]) -> Future:
+        return self._writer.submit(self._ingest_segments, host, segments, hours)
+    
+    def _ingest_segments(self, cur, host: str, segments: List[tuple], hours: List[tuple]) -> int:
+        cur.execute("INSERT INTO hosts (name, last_seen) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET "
+                    "last_seen = excluded.last_seen", (host, datetime.now()))
+        host_id = self._host_id(cur, host)
+        cur.execute("DROP TABLE IF EXISTS temp.ingest_segments")
+        cur.execute("DROP TABLE IF EXISTS temp.ingest_hours")
+        cur.execute("""
+            CREATE TEMP TABLE ingest_segments (
+                segment_id TEXT PRIMARY KEY, date_str TEXT, start_time TIMESTAMP, duration_seconds INTEGER,
+                idle_seconds INTEGER, app_name TEXT, exe_name TEXT, window_title TEXT, category TEXT
+            ) WITHOUT ROWID
+        """)
+        cur.execute("CREATE TEMP TABLE ingest_hours (segment_id TEXT, date_str TEXT, hour INTEGER, seconds INTEGER)")
+        cur.executemany("INSERT OR IGNORE INTO ingest_segments VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", segments)
+        cur.executemany("INSERT INTO ingest_hours VALUES (?, ?, ?, ?)", hours)
+        cur.execute("""
+            DELETE FROM ingest_segments WHERE EXISTS (
+                SELECT 1 FROM fleet_usage f WHERE f.host_id = ? AND f.segment_id = ingest_segments.segment_id
+            )
+        """, (host_id,))
+        cur.execute("""
+            INSERT INTO fleet_usage (host_id, segment_id, date_str, start_time, duration_seconds, idle_seconds,
+                                     app_name, exe_name, window_title, category)
+            SELECT ?, * FROM ingest_segments
+        """, (host_id,))
+        inserted = cur.rowcount
+        cur.execute("""
+            INSERT INTO fleet_daily_app_stats (host_id, date_str, app_name, category, seconds, switches)
+            SELECT ?, date_str, app_name, category, SUM(duration_seconds), COUNT(*)
+            FROM ingest_segments GROUP BY date_str, app_name, category
+            ON CONFLICT(host_id, date_str, app_name, category) DO UPDATE SET
+                seconds = seconds + excluded.seconds, switches = switches + excluded.switches
+        """, (host_id,))
+        cur.execute("""
+            INSERT INTO fleet_daily_stats (host_id, date_str, total_seconds, active_seconds, idle_seconds)
+            SELECT ?, date_str, SUM(duration_seconds), SUM(duration_seconds - idle_seconds), SUM(idle_seconds)
+            FROM ingest_segments GROUP BY date_str
+            ON CONFLICT(host_id, date_str) DO UPDATE SET
+                total_seconds = total_seconds + excluded.total_seconds,
+                active_seconds = active_seconds + excluded.active_seconds,
+                idle_seconds = idle_seconds + excluded.idle_seconds
+        """, (host_id,))
+        cur.execute("""
+            INSERT INTO fleet_hourly_stats (host_id, date_str, hour, active_seconds)
+            SELECT ?, date_str, hour, SUM(seconds) FROM ingest_hours
+            WHERE segment_id IN (SELECT segment_id FROM ingest_segments)
+            GROUP BY date_str, hour
+            ON CONFLICT(host_id, date_str, hour) DO UPDATE SET
+                active_seconds = active_seconds + excluded.active_seconds
+        """, (host_id,))
+        for (date_str,) in cur.execute("SELECT date_str FROM ingest_segments UNION SELECT date_str FROM ingest_hours"):
+            self._touch(date_str)
+        cur.execute("DROP TABLE ingest_segments")
+        cur.execute("DROP TABLE ingest_hours")
+        return inserted
+    
+    def _host_id(self, conn, host: str) -> int:
+        host_id = self._host_ids.get(host)
+        if host_id is None:
+            row = conn.execute("SELECT id FROM hosts WHERE name = ?", (host,)).fetchone()
+            if row is None:
+                return -1
+            host_id = self._host_ids[host] = row[0]
+        return host_id
+    
+    def _host_filter(self, conn, host: str, column: str = "host_id") -> Tuple[str, tuple]:
+        if host == "*":
+            return "1", ()
+        return f"{column} = ?", (self._host_id(conn, host),)
+    
+    @metrics.timed(db_query_duration)
+    def get_hosts(self) -> List[Dict]:
+        with self._get_reader() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT h.name, h.last_seen, COUNT(d.date_str) AS days, SUM(d.active_seconds) AS active_seconds
+                FROM hosts h LEFT JOIN fleet_daily_stats d ON d.host_id = h.id
+                GROUP BY h.id ORDER BY h.name
+            """)
+            return [dict(row) for row in cur.fetchall()]
+    
+    def get_journal_position(self) -> Tuple[int, int]:
+        with self._get_reader() as conn:
+            row = conn.execute("SELECT generation, position FROM journal_state WHERE id = 1").fetchone()
+            return (row[0], row[1]) if row else (0, 0)
+    
+    def get_upload_cursor(self, target: str) -> int:
+        with self._get_reader() as conn:
+            row = conn.execute("SELECT last_id FROM upload_state WHERE target = ?", (target,)).fetchone()
+            return row[0] if row else 0
+    
+    def set_upload_cursor(self, target: str, last_id: int) -> Future:
+        return self._writer.submit(self._set_upload_cursor, target, last_id)
+    
+    def _set_upload_cursor(self, cur, target: str, last_id: int):
+        cur.execute("""
+            INSERT INTO upload_state (target, last_id) VALUES (?, ?)
+            ON CONFLICT(target) DO UPDATE SET last_id = excluded.last_id
+        """, (target, last_id))
+    
+    @metrics.timed(db_query_duration)
+    def get_closed_usage(self, after_id: int, limit: int) -> List[Dict]:
+        months = [month for month in self._partition_months() if partition_base(month) + PARTITION_ID_SPAN > after_id]
+        rows = []
+        with self._get_reader() as conn:
+            sources = [None] + months
+            last_id = 0
+            for month in reversed(sources):
+                schema = self._schema(conn, month) if month else "main"
+                last_id = conn.execute(f"SELECT MAX(id) FROM {schema}.app_usage").fetchone()[0]
+                if last_id is not None:
+                    break
+            for month in sources:
+                cur = conn.execute(f"""
+                    SELECT u.id, a.app_name, a.exe_name, t.title AS window_title, a.category, u.start_time,
+                           u.duration_seconds
+                    FROM {self._schema(conn, month) if month else "main"}.app_usage u
+                    JOIN main.apps a ON a.id = u.app_id LEFT JOIN main.titles t ON t.id = u.title_id
+                    WHERE u.id > ? AND (u.is_active = 0 OR u.id < ?)
+                    ORDER BY u.id LIMIT ?
+                """, (after_id, last_id or 0, limit - len(rows)))
+                rows.extend(dict(row) for row in cur.fetchall())
+                if len(rows) >= limit:
+                    break
+            return rows
+    
+    @metrics.timed(db_query_duration)
+    def get_today_stats(self, host: Optional[str] = None) -> Dict:
         today = date.today().strftime("%Y-%m-%d")
-        with self._get_connection() as conn:
+        if host:
+            stats = self.get_stats_for_period(today, today, host)
+            return stats[0] if stats else {"total_seconds": 0, "active_seconds": 0, "idle_seconds": 0, "apps_used": 0}
+        with self._get_reader() as conn:
             cur = conn.cursor()
             cur.execute("SELECT * FROM daily_stats WHERE date_str = ?", (today,))
             row = cur.fetchone()
@@ -178,73 +1613,126 @@ class DatabaseManager:
                 return dict(row)
             return {"total_seconds": 0, "active_seconds": 0, "idle_seconds": 0, "apps_used": 0}
     
-    def get_stats_for_period(self, start_date: str, end_date: str) -> List[Dict]:
-        with self._get_connection() as conn:
+    @metrics.timed(db_query_duration)
+    def get_stats_for_period(self, start_date: str, end_date: str, host: Optional[str] = None) -> List[Dict]:
+        with self._get_reader() as conn:
             cur = conn.cursor()
-            cur.execute("""
-                SELECT * FROM daily_stats 
-                WHERE date_str BETWEEN ? AND ?
-                ORDER BY date_str
-            """, (start_date, end_date))
+            if host:
+                condition, params = self._host_filter(conn, host)
+                cur.execute(f"""
+                    SELECT date_str, SUM(total_seconds) AS total_seconds, SUM(active_seconds) AS active_seconds,
+                           SUM(idle_seconds) AS idle_seconds,
+                           (SELECT COUNT(DISTINCT app_name) FROM fleet_daily_app_stats a
+                            WHERE a.date_str = d.date_str AND {condition}) AS apps_used
+                    FROM fleet_daily_stats d
+                    WHERE {condition} AND date_str BETWEEN ? AND ?
+                    GROUP BY date_str ORDER BY date_str
+                """, params + params + (start_date, end_date))
+            else:
+                cur.execute("""
+                    SELECT * FROM daily_stats 
+                    WHERE date_str BETWEEN ? AND ?
+                    ORDER BY date_str
+                """, (start_date, end_date))
             return [dict(row) for row in cur.fetchall()]
     
-    def get_hourly_stats(self, date_str: str) -> List[Dict]:
-        with self._get_connection() as conn:
+    @metrics.timed(db_query_duration)
+    def get_hourly_stats(self, date_str: str, host: Optional[str] = None) -> List[Dict]:
+        with self._get_reader() as conn:
             cur = conn.cursor()
-            cur.execute("""
-                SELECT hour, active_seconds FROM hourly_stats
-                WHERE date_str = ? ORDER BY hour
-            """, (date_str,))
+            if host:
+                condition, params = self._host_filter(conn, host)
+                cur.execute(f"""
+                    SELECT hour, SUM(active_seconds) AS active_seconds FROM fleet_hourly_stats
+                    WHERE {condition} AND date_str = ? GROUP BY hour ORDER BY hour
+                """, params + (date_str,))
+            else:
+                cur.execute("""
+                    SELECT hour, active_seconds FROM hourly_stats
+                    WHERE date_str = ? ORDER BY hour
+                """, (date_str,))
             return [dict(row) for row in cur.fetchall()]
     
-    def get_top_apps(self, date_str: str = None, limit: int = 10) -> List[Dict]:
-        with self._get_connection() as conn:
+    def _app_stats_source(self, conn, host: Optional[str], date_str: Optional[str]) -> Tuple[str, str, tuple]:
+        conditions, params = [], ()
+        table = "daily_app_stats"
+        if host:
+            table = "fleet_daily_app_stats"
+            condition, params = self._host_filter(conn, host)
+            conditions.append(condition)
+        if date_str:
+            conditions.append("date_str = ?")
+            params += (date_str,)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return table, where, params
+    
+    @metrics.timed(db_query_duration)
+    def get_top_apps(self, date_str: str = None, limit: int = 10, host: Optional[str] = None) -> List[Dict]:
+        with self._get_reader() as conn:
             cur = conn.cursor()
-            if date_str:
-                cur.execute("""
-                    SELECT app_name, category, SUM(duration_seconds) as total_time, COUNT(*) as usage_count
-                    FROM app_usage WHERE DATE(start_time) = ?
-                    GROUP BY app_name ORDER BY total_time DESC LIMIT ?
-                """, (date_str, limit))
-            else:
-                cur.execute("""
-                    SELECT app_name, category, SUM(duration_seconds) as total_time, COUNT(*) as usage_count
-                    FROM app_usage GROUP BY app_name ORDER BY total_time DESC LIMIT ?
-                """, (limit,))
+            table, where, params = self._app_stats_source(conn, host, date_str)
+            cur.execute(f"""
+                SELECT app_name, category, SUM(seconds) as total_time, SUM(switches) as usage_count
+                FROM {table} {where}
+                GROUP BY app_name ORDER BY total_time DESC LIMIT ?
+            """, params + (limit,))
             return [dict(row) for row in cur.fetchall()]
     
-    def get_category_stats(self, date_str: str = None) -> List[Dict]:
-        with self._get_connection() as conn:
+    @metrics.timed(db_query_duration)
+    def get_category_stats(self, date_str: str = None, host: Optional[str] = None) -> List[Dict]:
+        with self._get_reader() as conn:
             cur = conn.cursor()
-            if date_str:
-                cur.execute("""
-                    SELECT category, SUM(duration_seconds) as total_time
-                    FROM app_usage WHERE DATE(start_time) = ?
-                    GROUP BY category ORDER BY total_time DESC
-                """, (date_str,))
+            if host:
+                table, where, params = self._app_stats_source(conn, host, date_str)
+            elif date_str:
+                table, where, params = "daily_category_stats", "WHERE date_str = ?", (date_str,)
             else:
-                cur.execute("""
-                    SELECT category, SUM(duration_seconds) as total_time
-                    FROM app_usage GROUP BY category ORDER BY total_time DESC
-                """)
+                table, where, params = "daily_category_stats", "", ()
+            cur.execute(f"""
+                SELECT category, SUM(seconds) as total_time
+                FROM {table} {where}
+                GROUP BY category ORDER BY total_time DESC
+            """, params)
             return [dict(row) for row in cur.fetchall()]
     
-    def get_app_launches_count(self, date_str: str = None) -> Dict[str, int]:
-        with self._get_connection() as conn:
+    @metrics.timed(db_query_duration)
+    def get_app_launches_count(self, date_str: str = None, host: Optional[str] = None) -> Dict[str, int]:
+        with self._get_reader() as conn:
             cur = conn.cursor()
-            if date_str:
-                cur.execute("""
-                    SELECT app_name, COUNT(*) as launches FROM app_launches
-                    WHERE date_str = ? GROUP BY app_name
-                """, (date_str,))
+            if host:
+                table, where, params = self._app_stats_source(conn, host, date_str)
+                cur.execute(f"SELECT app_name, SUM(switches) as launches FROM {table} {where} GROUP BY app_name",
+                            params)
+            elif date_str:
+                with self._raw_source(conn, "app_launches", date_str, date_str) as source:
+                    cur.execute(f"""
+                        SELECT a.app_name, SUM(l.launches) as launches FROM (
+                            SELECT app_id, COUNT(*) AS launches FROM {source} WHERE date_str = ? GROUP BY app_id
+                        ) l JOIN main.apps a ON a.id = l.app_id GROUP BY a.app_name
+                    """, (date_str,))
+                    return {row["app_name"]: row["launches"] for row in cur.fetchall()}
             else:
-                cur.execute("SELECT app_name, COUNT(*) as launches FROM app_launches GROUP BY app_name")
+                with self._raw_source(conn, "app_launches") as source:
+                    cur.execute(f"""
+                        SELECT a.app_name, SUM(l.launches) as launches FROM (
+                            SELECT app_id, COUNT(*) AS launches FROM {source} GROUP BY app_id
+                        ) l JOIN main.apps a ON a.id = l.app_id GROUP BY a.app_name
+                    """)
+                    return {row["app_name"]: row["launches"] for row in cur.fetchall()}
             return {row["app_name"]: row["launches"] for row in cur.fetchall()}
     
-    def get_week_comparison(self) -> List[Dict]:
-        with self._get_connection() as conn:
+    @metrics.timed(db_query_duration)
+    def get_week_comparison(self, host: Optional[str] = None) -> List[Dict]:
+        with self._get_reader() as conn:
             cur = conn.cursor()
-            cur.execute("""
+            source, params = "daily_stats", ()
+            if host:
+                condition, params = self._host_filter(conn, host)
+                source = f"""(
+                    SELECT date_str, SUM(active_seconds) AS active_seconds FROM fleet_daily_stats
+                    WHERE {condition} GROUP BY date_str
+                )"""
+            cur.execute(f"""
                 SELECT 
                     CASE CAST(strftime('%w', date_str) AS INTEGER)
                         WHEN 0 THEN 'Вс' WHEN 1 THEN 'Пн' WHEN 2 THEN 'Вт'
@@ -252,9 +1740,172 @@ class DatabaseManager:
                     END as day_name,
                     CAST(strftime('%w', date_str) AS INTEGER) as day_num,
                     AVG(active_seconds) as avg_active
-                FROM daily_stats GROUP BY day_num ORDER BY day_num
-            """)
+                FROM {source} GROUP BY day_num ORDER BY day_num
+            """, params)
             return [dict(row) for row in cur.fetchall()]
+    
+    def choose_range_source(self, start: datetime, end: datetime, bucket_sec: int, host: Optional[str] = None) -> str:
+        def aligned(seconds):
+            return (bucket_sec % seconds == 0 and all(
+                (moment - datetime.combine(moment.date(), datetime.min.time())).total_seconds() % seconds == 0
+                for moment in (start, end)
+            ))
+        if aligned(86400):
+            return "daily"
+        if aligned(3600) and not host:
+            return "hourly"
+        return "raw"
+    
+    def iter_range(self, start: datetime, end: datetime, bucket_sec: int, origin: datetime,
+                   group_by: Optional[str] = None, source: Optional[str] = None,
+                   host: Optional[str] = None) -> Iterator[Tuple[int, Optional[str], int]]:
+        source = source or self.choose_range_source(start, end, bucket_sec, host)
+        key = {"app": "app_name", "category": "category", None: "NULL"}[group_by]
+        origin_sec = (origin - datetime(1970, 1, 1)).total_seconds()
+        start_sec = (start - datetime(1970, 1, 1)).total_seconds()
+        end_sec = (end - datetime(1970, 1, 1)).total_seconds()
+        first_date = start.strftime("%Y-%m-%d")
+        last_date = (end - timedelta(microseconds=1)).strftime("%Y-%m-%d")
+        
+        with self._get_reader() as conn:
+            if host or source == "daily":
+                raw_source = nullcontext("fleet_usage")
+            else:
+                raw_source = self._raw_source(conn, "app_usage", first_date, last_date)
+            with raw_source as raw_table:
+                host_condition, host_params = self._host_filter(conn, host) if host else ("1", ())
+                if host or not group_by:
+                    raw_query = f"""
+                        SELECT CAST((strftime('%s', start_time) - ?) / ? AS INTEGER) AS bucket, {key} AS key,
+                               duration_seconds AS seconds
+                        FROM {raw_table}
+                        WHERE {host_condition} AND date_str BETWEEN ? AND ? AND start_time >= ? AND start_time < ?
+                    """
+                else:
+                    raw_query = f"""
+                        SELECT CAST((strftime('%s', u.start_time) - ?) / ? AS INTEGER) AS bucket, a.{key} AS key,
+                               u.duration_seconds AS seconds
+                        FROM {raw_table} u JOIN main.apps a ON a.id = u.app_id
+                        WHERE {host_condition} AND u.date_str BETWEEN ? AND ? AND u.start_time >= ?
+                              AND u.start_time < ?
+                    """
+                raw_params = (origin_sec, bucket_sec) + host_params + (first_date, last_date, start.isoformat(" "),
+                                                                       end.isoformat(" "))
+                if source == "daily":
+                    if host:
+                        table = "fleet_daily_app_stats"
+                    else:
+                        table = "daily_category_stats" if group_by != "app" else "daily_app_stats"
+                    query = f"""
+                        SELECT CAST((strftime('%s', date_str) - ?) / ? AS INTEGER) AS bucket, {key} AS key,
+                               seconds
+                        FROM {table}
+                        WHERE {host_condition} AND date_str BETWEEN ? AND ?
+                    """
+                    params = (origin_sec, bucket_sec) + host_params + (first_date, last_date)
+                elif source == "hourly":
+                    query = f"""
+                        SELECT CAST((strftime('%s', date_str) + hour * 3600 - ?) / ? AS INTEGER) AS bucket,
+                               {key} AS key, seconds
+                        FROM hourly_app_stats
+                        WHERE date_str BETWEEN ? AND ? AND strftime('%s', date_str) + hour * 3600 BETWEEN ? AND ?
+                        UNION ALL {raw_query}
+                    """
+                    params = (origin_sec, bucket_sec, first_date, last_date, start_sec, end_sec - 1) + raw_params
+                else:
+                    query, params = raw_query, raw_params
+                
+                cur = conn.cursor()
+                cur.execute(f"""
+                    SELECT bucket, key, SUM(seconds) AS seconds FROM ({query})
+                    GROUP BY bucket, key ORDER BY bucket, seconds DESC
+                """, params)
+                while True:
+                    rows = cur.fetchmany(RANGE_FETCH_ROWS)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row["bucket"], row["key"], row["seconds"] or 0
+    
+    @contextmanager
+    def export_cursor(self, table: str, start_date: str = None, end_date: str = None):
+        date_column = EXPORT_TABLES[table]
+        conditions, params = [], []
+        if start_date:
+            conditions.append(f"{date_column} >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append(f"{date_column} <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._get_reader() as conn:
+            if table in PARTITIONED_TABLES:
+                def queries():
+                    yield f"{decoded_source(table, f'main.{table}')} {where}", params
+                    for month in self._partition_months(start_date, end_date):
+                        yield f"{decoded_source(table, f'{self._schema(conn, month)}.{table}')} {where}", params
+                cur = PartitionCursor(conn, queries())
+            else:
+                cur = conn.cursor()
+                cur.row_factory = None
+                cur.execute(f"SELECT * FROM {table} {where}", params)
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+
+class LazyDatabase:
+    def __init__(self, factory: Callable[[], DatabaseManager]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_open_lock", threading.Lock())
+    
+    def _open(self) -> DatabaseManager:
+        instance = self._instance
+        if instance is None:
+            with self._open_lock:
+                if self._instance is None:
+                    object.__setattr__(self, "_instance", self._factory())
+                instance = self._instance
+        return instance
+    
+    def __getattr__(self, name):
+        return getattr(self._open(), name)
+    
+    def __setattr__(self, name, value):
+        setattr(self._open(), name, value)
+    
+    def __delattr__(self, name):
+        delattr(self._open(), name)
+
+
+db = LazyDatabase(DatabaseManager)
 
 
-db = DatabaseManager()
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "rebuild-rollups":
+        db.rebuild_rollups()
+        print("Сводные таблицы пересобраны")
+    elif len(sys.argv) > 1 and sys.argv[1].lower() == "vacuum":
+        db.vacuum()
+        print(f"База сжата: {db.get_size_info()['bytes'] // 1024} КБ")
+    elif len(sys.argv) > 1 and sys.argv[1].lower() == "partitions":
+        states = {"active": "запись", "closed": "только чтение", "archived": "в архиве"}
+        for part in db.get_partitions():
+            print(f"{part['month']}  {states[part['state']]:<14} {part['bytes'] // 1024:>8} КБ  {part['path']}")
+    elif len(sys.argv) > 2 and sys.argv[1].lower() == "archive":
+        archived = db.archive_partitions(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+        print(f"Перенесено в архив разделов: {len(archived)} {', '.join(archived)}")
+    elif len(sys.argv) > 2 and sys.argv[1].lower() == "restore":
+        if db.restore_partition(sys.argv[2]):
+            print(f"Раздел {sys.argv[2]} восстановлен из архива")
+        else:
+            print(f"Раздел {sys.argv[2]} не найден в архиве")
+    else:
+        print("Использование:")
+        print("  python database.py rebuild-rollups        - пересобрать сводные таблицы")
+        print("  python database.py vacuum                 - сжать базу и включить инкрементальную очистку")
+        print("  python database.py partitions             - показать месячные разделы")
+        print("  python database.py archive DIR [YYYY-MM]  - убрать закрытые разделы (до месяца) в архив")
+        print("  python database.py restore YYYY-MM        - вернуть раздел из архива")
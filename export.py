@@ -0,0 +1,82 @@
+import argparse
+import csv
+import json
+import sys
+import zlib
+
+from database import db, EXPORT_TABLES
+from config import EXPORT_FETCH_ROWS, GZIP_LEVEL
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+class GzipWriter:
+    def __init__(self, out, level=GZIP_LEVEL):
+        self.out = out
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    
+    def write(self, data):
+        compressed = self._compressor.compress(data)
+        if compressed:
+            self.out.write(compressed)
+    
+    def close(self):
+        self.out.write(self._compressor.flush())
+
+
+class TextSink:
+    def __init__(self, out):
+        self.out = out
+    
+    def write(self, text):
+        self.out.write(text.encode("utf-8"))
+
+
+def export_table(out, table, fmt="csv", start_date=None, end_date=None):
+    count = 0
+    with db.export_cursor(table, start_date, end_date) as cur:
+        columns = [column[0] for column in cur.description]
+        if fmt == "csv":
+            writer = csv.writer(TextSink(out), lineterminator="\n")
+            writer.writerow(columns)
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_ROWS)
+            if not rows:
+                break
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                out.write("".join(
+                    json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows
+                ).encode("utf-8"))
+            count += len(rows)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка данных из базы")
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--from", dest="start_date", help="первый день, ГГГГ-ММ-ДД")
+    parser.add_argument("--to", dest="end_date", help="последний день, ГГГГ-ММ-ДД")
+    parser.add_argument("--gzip", action="store_true", help="сжать вывод")
+    parser.add_argument("-o", "--output", help="файл (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+    
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        sink = GzipWriter(out) if args.gzip else out
+        count = export_table(sink, args.table, args.format, args.start_date, args.end_date)
+        if args.gzip:
+            sink.close()
+    finally:
+        if args.output:
+            out.close()
+    print(f"Выгружено строк: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
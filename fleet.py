@@ -0,0 +1,181 @@
+import json
+import re
+import sys
+import threading
+import urllib.request
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from database import db
+from metrics import metrics, fleet_uploaded_total
+from config import (INGEST_MAX_DECOMPRESSED_BYTES, INGEST_MAX_SEGMENT_SEC, INGEST_TOKEN, FLEET_HOST_NAME,
+                    FLEET_UPLOAD_URL, FLEET_UPLOAD_INTERVAL_SEC, FLEET_UPLOAD_BATCH_ROWS, FLEET_UPLOAD_TIMEOUT_SEC,
+                    GZIP_LEVEL)
+
+HOST_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+def decompress(body: bytes, limit: int = INGEST_MAX_DECOMPRESSED_BYTES) -> Optional[bytes]:
+    decompressor = zlib.decompressobj(31)
+    data = decompressor.decompress(body, limit)
+    if decompressor.unconsumed_tail:
+        return None
+    if not decompressor.eof:
+        raise zlib.error("truncated gzip stream")
+    return data
+
+
+def _text(record: Dict, field: str, limit: int, default: Optional[str] = None) -> Optional[str]:
+    value = record.get(field, default)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value[:limit]
+
+
+def _seconds(record: Dict, field: str, default: Optional[int] = None) -> int:
+    value = record.get(field, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= INGEST_MAX_SEGMENT_SEC:
+        raise ValueError(f"{field} must be an integer between 0 and {INGEST_MAX_SEGMENT_SEC}")
+    return value
+
+
+def parse_segment(record: Dict) -> Tuple[tuple, List[tuple]]:
+    if not isinstance(record, dict):
+        raise ValueError("segment must be an object")
+    segment_id = record.get("id")
+    if isinstance(segment_id, int) and not isinstance(segment_id, bool):
+        segment_id = str(segment_id)
+    if not isinstance(segment_id, str) or not 0 < len(segment_id) <= 128:
+        raise ValueError("id must be a non-empty string or integer")
+    start = record.get("start")
+    if not isinstance(start, str):
+        raise ValueError("start must be an ISO timestamp")
+    start = datetime.fromisoformat(start).replace(tzinfo=None)
+    duration = _seconds(record, "duration")
+    idle = _seconds(record, "idle", 0)
+    if idle > duration:
+        raise ValueError("idle exceeds duration")
+    app_name = _text(record, "app", 256)
+    if not app_name:
+        raise ValueError("app is required")
+    segment = (segment_id, start.strftime("%Y-%m-%d"), start.isoformat(" "), duration, idle, app_name,
+               _text(record, "exe", 256), _text(record, "title", 1024), _text(record, "category", 64, "other"))
+    
+    hours = []
+    active = duration - idle
+    moment, end = start, start + timedelta(seconds=duration)
+    while active and moment < end:
+        hour_end = min(end, moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+        seconds = round((hour_end - moment).total_seconds() * active / duration)
+        if seconds:
+            hours.append((segment_id, moment.strftime("%Y-%m-%d"), moment.hour, seconds))
+        moment = hour_end
+    return segment, hours
+
+
+def parse_segments(data: bytes) -> Tuple[List[tuple], List[tuple], List[str]]:
+    segments, hours, errors = [], [], []
+    for number, line in enumerate(data.split(b"\n"), 1):
+        if not line.strip():
+            continue
+        try:
+            segment, segment_hours = parse_segment(json.loads(line))
+        except (ValueError, TypeError) as e:
+            errors.append(f"line {number}: {e}")
+            continue
+        segments.append(segment)
+        hours.extend(segment_hours)
+    return segments, hours, errors
+
+
+def usage_segment(row: Dict) -> Dict:
+    start = datetime.fromisoformat(str(row["start_time"]))
+    return {
+        "id": f"{row['id']}-{start.strftime('%Y%m%d%H%M%S')}",
+        "start": start.isoformat(),
+        "duration": min(max(row["duration_seconds"] or 0, 0), INGEST_MAX_SEGMENT_SEC),
+        "app": row["app_name"],
+        "exe": row["exe_name"],
+        "title": row["window_title"],
+        "category": row["category"] or "other",
+    }
+
+
+class FleetUploader:
+    def __init__(self, url: str = FLEET_UPLOAD_URL, host: str = FLEET_HOST_NAME,
+                 interval: float = FLEET_UPLOAD_INTERVAL_SEC, batch_rows: int = FLEET_UPLOAD_BATCH_ROWS,
+                 token: str = INGEST_TOKEN):
+        self.url = url.rstrip("/")
+        self.host = host
+        self.interval = interval
+        self.batch_rows = batch_rows
+        self.token = token
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if not self.url or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=FLEET_UPLOAD_TIMEOUT_SEC)
+    
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.upload_pending()
+            except Exception as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Fleet upload failed: {e}")
+    
+    def upload_pending(self) -> int:
+        total = 0
+        while not self._stop.is_set():
+            sent = self.upload_batch()
+            total += sent
+            if sent < self.batch_rows:
+                break
+        return total
+    
+    def upload_batch(self) -> int:
+        rows = db.get_closed_usage(db.get_upload_cursor(self.url), self.batch_rows)
+        if not rows:
+            return 0
+        body = "".join(json.dumps(usage_segment(row), ensure_ascii=False) + "\n" for row in rows)
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        request = urllib.request.Request(f"{self.url}/api/ingest?host={quote(self.host)}", method="POST",
+                                         data=compressor.compress(body.encode("utf-8")) + compressor.flush(),
+                                         headers=headers)
+        with urllib.request.urlopen(request, timeout=FLEET_UPLOAD_TIMEOUT_SEC) as response:
+            json.load(response)
+        db.set_upload_cursor(self.url, rows[-1]["id"]).result()
+        metrics.inc(fleet_uploaded_total, len(rows))
+        return len(rows)
+
+
+uploader = FleetUploader()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "upload":
+        if len(sys.argv) > 2:
+            uploader.url = sys.argv[2].rstrip("/")
+        if not uploader.url:
+            print("Не задан адрес сервера: укажите его аргументом или в PC_USAGE_MONITOR_UPLOAD_URL")
+            sys.exit(1)
+        print(f"Отправлено записей: {uploader.upload_pending()} ({uploader.host} -> {uploader.url})")
+        db.close()
+    else:
+        print("Использование:")
+        print("  python fleet.py upload [URL]  - отправить накопленные записи на центральный сервер")
@@ -0,0 +1,200 @@
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from config import JOURNAL_PATH, JOURNAL_SYNC_SEC, JOURNAL_MAX_BYTES
+
+HEADER = 1
+STATE = 2
+TICK = 3
+APP = 4
+USAGE = 5
+
+RECORD_FORMATS = {
+    HEADER: struct.Struct("<Q"),
+    STATE: struct.Struct("<qqddddI"),
+    TICK: struct.Struct("<ddB"),
+    APP: struct.Struct("<dB"),
+    USAGE: struct.Struct("<dq"),
+}
+FRAME = struct.Struct("<BH")
+CHECKSUM = struct.Struct("<I")
+
+JournalState = Tuple[int, int, float, float, float, float, int]
+Record = Tuple[int, int, tuple]
+
+
+def encode_record(kind: int, *fields) -> bytes:
+    payload = RECORD_FORMATS[kind].pack(*fields)
+    frame = FRAME.pack(kind, len(payload)) + payload
+    return frame + CHECKSUM.pack(zlib.crc32(frame))
+
+
+def read_records(path: Path) -> List[Record]:
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return []
+    records = []
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        kind, length = FRAME.unpack_from(data, offset)
+        end = offset + FRAME.size + length
+        record_format = RECORD_FORMATS.get(kind)
+        if record_format is None or length != record_format.size or end + CHECKSUM.size > len(data):
+            break
+        if CHECKSUM.unpack_from(data, end)[0] != zlib.crc32(data[offset:end]):
+            break
+        records.append((offset, kind, record_format.unpack_from(data, offset + FRAME.size)))
+        offset = end + CHECKSUM.size
+    return records
+
+
+class ActivityJournal:
+    def __init__(self, path: Path = JOURNAL_PATH, sync_interval: float = JOURNAL_SYNC_SEC,
+                 max_bytes: int = JOURNAL_MAX_BYTES):
+        self.path = Path(path)
+        self.previous_path = self.path.with_name(self.path.name + ".prev")
+        self.sync_interval = sync_interval
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.syncs = 0
+        self._fd: Optional[int] = None
+        self._position = 0
+        self._dirty = False
+        self._pending: Optional[bytes] = None
+        self._pending_generation = 0
+        self._pending_position = 0
+        self._tail = bytearray()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def open(self, state: JournalState):
+        with self._sync_lock, self._lock:
+            self._close_file()
+            self._pending, self._tail = None, bytearray()
+            self._start_file(state)
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+    
+    @staticmethod
+    def _new_generation() -> int:
+        return int.from_bytes(os.urandom(8), "little") >> 1
+    
+    def _open_file(self) -> int:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND | getattr(os, "O_BINARY", 0)
+        return os.open(self.path, flags, 0o644)
+    
+    def _start_file(self, state: JournalState):
+        self.generation = self._new_generation()
+        self._fd = self._open_file()
+        self._position = 0
+        self._write(encode_record(HEADER, self.generation) + encode_record(STATE, *state))
+        os.fsync(self._fd)
+        self._dirty = False
+    
+    def _write(self, record: bytes):
+        os.write(self._fd, record)
+        self._position += len(record)
+        self._dirty = True
+        if self._pending is not None:
+            self._tail += record
+    
+    def append(self, kind: int, *fields):
+        record = encode_record(kind, *fields)
+        with self._lock:
+            if self._fd is not None:
+                self._write(record)
+    
+    def tick(self, end: float, delta: float, is_idle: bool):
+        self.append(TICK, end, delta, is_idle)
+    
+    def app_change(self, moment: float, new_today: bool):
+        self.append(APP, moment, new_today)
+    
+    def usage(self, start: float, usage_id: int):
+        self.append(USAGE, start, usage_id)
+    
+    def checkpoint(self, state: JournalState) -> Tuple[int, int]:
+        with self._lock:
+            if self._fd is None:
+                return 0, 0
+            if self._pending is not None or self._position > self.max_bytes:
+                self._pending_generation = self._new_generation()
+                self._pending = encode_record(HEADER, self._pending_generation) + encode_record(STATE, *state)
+                self._pending_position = self._position
+                self._tail = bytearray()
+            return self.generation, self._position
+    
+    def _rotate(self):
+        with self._lock:
+            fd, rotating = self._fd, self._pending is not None
+        if fd is None or not rotating:
+            return
+        os.fsync(fd)
+        with self._lock:
+            os.ftruncate(self._fd, self._pending_position)
+            self._close_file()
+            os.replace(self.path, self.previous_path)
+            self._fd = self._open_file()
+            self.generation = self._pending_generation
+            self._position = 0
+            records = self._pending + bytes(self._tail)
+            self._pending, self._tail = None, bytearray()
+            self._write(records)
+    
+    def sync(self):
+        with self._sync_lock:
+            self._rotate()
+            with self._lock:
+                fd, dirty = self._fd, self._dirty
+                self._dirty = False
+            if fd is not None and dirty:
+                os.fsync(fd)
+                self.syncs += 1
+    
+    def _loop(self):
+        while not self._stop.wait(self.sync_interval):
+            self.sync()
+    
+    def _close_file(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    
+    def pending(self) -> List[Tuple[int, List[Record]]]:
+        files = []
+        for path in (self.previous_path, self.path):
+            records = read_records(path)
+            if records and records[0][1] == HEADER:
+                files.append((records[0][2][0], records[1:]))
+        return files
+    
+    def close(self, discard: bool = False):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.sync()
+        with self._sync_lock, self._lock:
+            self._close_file()
+        if discard:
+            self.discard()
+    
+    def discard(self):
+        for path in (self.previous_path, self.path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+journal = ActivityJournal()
@@ -7,6 +7,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from server import web_server
 from collector import collector
+from database import db
 
 running = True
 
@@ -22,12 +23,14 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, handle_exit)
     
     web_server.start()
+    web_server.open_browser()
     
-    time.sleep(1)
-    collector.start_session()
+    from retention import retention
+    from fleet import uploader
     
-    time.sleep(0.5)
-    web_server.open_browser()
+    collector.start_session()
+    retention.start()
+    uploader.start()
     
     print("Мониторинг запущен. Ctrl+C для выхода.")
     
@@ -42,5 +45,8 @@ if __name__ == "__main__":
     if collector._running:
         collector.stop_session()
     
+    uploader.stop()
+    retention.stop()
     web_server.stop()
+    db.close()
     print("Завершено.")
@@ -0,0 +1,225 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from config import METRICS_ENABLED
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+    
+    def render(self, name: str, labels: Tuple[Tuple[str, str], ...]) -> list:
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+    
+    def render(self, name: str, labels: Tuple[Tuple[str, str], ...]) -> list:
+        return [f"{name}{_format_labels(labels)} {_format_value(self.value)}"]
+
+
+class MetricFamily:
+    def __init__(self, name: str, kind: str, help_text: str, label: Optional[str] = None,
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._children: Dict[Optional[str], object] = {}
+        self._lock = threading.Lock()
+        if label is None:
+            self.child()
+    
+    def child(self, label_value: Optional[str] = None):
+        child = self._children.get(label_value)
+        if child is None:
+            with self._lock:
+                child = self._children.get(label_value)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == "histogram" else Counter()
+                    self._children[label_value] = child
+        return child
+    
+    def observe(self, value: float, label_value: Optional[str] = None):
+        self.child(label_value).observe(value)
+    
+    def inc(self, amount: int = 1, label_value: Optional[str] = None):
+        self.child(label_value).inc(amount)
+    
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for label_value, child in sorted(self._children.items(), key=lambda item: item[0] or ""):
+            labels = ((self.label, label_value),) if self.label else ()
+            lines.extend(child.render(self.name, labels))
+        return lines
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer:
+    def __init__(self, family: MetricFamily, label_value: Optional[str]):
+        self.family = family
+        self.label_value = label_value
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.family.observe(time.perf_counter() - self.started, self.label_value)
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._families: "OrderedDict[str, MetricFamily]" = OrderedDict()
+    
+    def histogram(self, name: str, help_text: str, label: Optional[str] = None,
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> MetricFamily:
+        return self._families.setdefault(name, MetricFamily(name, "histogram", help_text, label, buckets))
+    
+    def counter(self, name: str, help_text: str, label: Optional[str] = None) -> MetricFamily:
+        return self._families.setdefault(name, MetricFamily(name, "counter", help_text, label))
+    
+    def timer(self, family: MetricFamily, label_value: Optional[str] = None):
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(family, label_value)
+    
+    def timed(self, family: MetricFamily, label_value: Optional[str] = None):
+        def decorator(func):
+            name = label_value or func.__name__
+            
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    family.observe(time.perf_counter() - started, name)
+            return wrapper
+        return decorator
+    
+    def observe(self, family: MetricFamily, value: float, label_value: Optional[str] = None):
+        if self.enabled:
+            family.observe(value, label_value)
+    
+    def inc(self, family: MetricFamily, amount: int = 1, label_value: Optional[str] = None):
+        if self.enabled:
+            family.inc(amount, label_value)
+    
+    def render(self) -> str:
+        lines = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+class TimedLock:
+    def __init__(self, family: MetricFamily):
+        self.family = family
+        self._lock = threading.Lock()
+    
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if not metrics.enabled:
+            return self._lock.acquire(blocking, timeout)
+        started = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        self.family.observe(time.perf_counter() - started)
+        return acquired
+    
+    def release(self):
+        self._lock.release()
+    
+    def locked(self) -> bool:
+        return self._lock.locked()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+metrics = MetricsRegistry()
+
+poll_duration = metrics.histogram("pc_usage_poll_duration_seconds", "Time spent in one tracker poll")
+polls_total = metrics.counter("pc_usage_polls_total", "Tracker polls")
+app_changes_total = metrics.counter("pc_usage_app_changes_total", "Foreground window changes")
+tracker_errors_total = metrics.counter("pc_usage_tracker_errors_total", "Tracker polls that raised")
+db_lock_wait = metrics.histogram("pc_usage_db_lock_wait_seconds", "Time spent waiting for the database write lock")
+db_query_duration = metrics.histogram("pc_usage_db_query_duration_seconds", "DatabaseManager call latency", "query")
+db_commit_duration = metrics.histogram("pc_usage_db_commit_duration_seconds", "Write transaction commit latency")
+db_rows_written_total = metrics.counter("pc_usage_db_rows_written_total", "Rows inserted, updated or deleted")
+db_write_batch_size = metrics.histogram("pc_usage_db_write_batch_size", "Write commands applied per transaction",
+                                        buckets=SIZE_BUCKETS)
+db_write_queue_wait = metrics.histogram("pc_usage_db_write_queue_wait_seconds",
+                                        "Time a write command spent queued before it was applied")
+ingest_segments_total = metrics.counter("pc_usage_ingest_segments_total", "Fleet segments received by /api/ingest",
+                                        "result")
+fleet_uploaded_total = metrics.counter("pc_usage_fleet_uploaded_total", "Usage rows uploaded to the central server")
+http_request_duration = metrics.histogram("pc_usage_http_request_duration_seconds", "HTTP handler latency",
+                                          "endpoint")
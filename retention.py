@@ -0,0 +1,90 @@
+import sys
+import threading
+from datetime import datetime, date, timedelta
+from typing import Dict, Optional
+
+from database import db
+from config import (RETENTION_RAW_DAYS, RETENTION_HOURLY_DAYS, RETENTION_CHUNK_ROWS, RETENTION_CHUNK_PAUSE_SEC,
+                    RETENTION_VACUUM_PAGES, RETENTION_START_DELAY_SEC, RETENTION_INTERVAL_SEC)
+
+
+class RetentionJob:
+    def __init__(self, raw_days: int = RETENTION_RAW_DAYS, hourly_days: int = RETENTION_HOURLY_DAYS,
+                 chunk_rows: int = RETENTION_CHUNK_ROWS, pause: float = RETENTION_CHUNK_PAUSE_SEC):
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.chunk_rows = chunk_rows
+        self.pause = pause
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+    
+    def _loop(self):
+        delay = RETENTION_START_DELAY_SEC
+        while not self._stop.wait(delay):
+            result = self.run_once()
+            if any(result.values()):
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Retention: {result}")
+            delay = RETENTION_INTERVAL_SEC
+    
+    def _cutoff(self, days: int) -> str:
+        return (date.today() - timedelta(days=days)).strftime("%Y-%m-%d")
+    
+    def _drain(self, step) -> int:
+        total = 0
+        while not self._stop.is_set():
+            done = step()
+            total += done
+            if done < self.chunk_rows:
+                break
+            self._stop.wait(self.pause)
+        return total
+    
+    def run_once(self) -> Dict[str, int]:
+        result = {"closed": 0, "compacted": 0, "launches": 0, "hourly": 0, "titles": 0, "vacuumed_bytes": 0}
+        result["closed"] = len(db.close_partitions())
+        if self.raw_days:
+            cutoff = self._cutoff(self.raw_days)
+            result["compacted"] = db.compact_partitions(cutoff)
+            result["compacted"] += self._drain(lambda: db.compact_raw_usage(cutoff, self.chunk_rows))
+            result["launches"] = self._drain(lambda: db.expire_rows("app_launches", cutoff, self.chunk_rows))
+        if self.hourly_days:
+            cutoff = self._cutoff(max(self.hourly_days, self.raw_days))
+            result["hourly"] = self._drain(lambda: db.expire_rows("hourly_app_stats", cutoff, self.chunk_rows))
+        if not self._stop.is_set():
+            result["titles"] = db.prune_titles()
+        
+        size = db.get_size_info()
+        if size["auto_vacuum"] == 2 and size["free_bytes"]:
+            while not self._stop.is_set() and db.incremental_vacuum(RETENTION_VACUUM_PAGES):
+                self._stop.wait(self.pause)
+            result["vacuumed_bytes"] = size["bytes"] - db.get_size_info()["bytes"]
+        return result
+
+
+retention = RetentionJob()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "run":
+        before = db.get_size_info()["bytes"]
+        result = retention.run_once()
+        after = db.get_size_info()["bytes"]
+        print(f"Закрыто месячных разделов: {result['closed']}")
+        print(f"Сжато сырых записей: {result['compacted']}, удалено запусков: {result['launches']}, "
+              f"удалено почасовых записей: {result['hourly']}, удалено заголовков окон: {result['titles']}")
+        print(f"Размер базы: {before // 1024} КБ -> {after // 1024} КБ")
+    else:
+        print("Использование:")
+        print("  python retention.py run  - применить политику хранения сейчас")
@@ -1,17 +1,28 @@
+import gzip
+import hashlib
+import hmac
+import ipaddress
 import json
+import mimetypes
+import select
 import threading
-import webbrowser
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
 from datetime import datetime, date, timedelta
 from pathlib import Path
 
-from database import db
+from database import db, EXPORT_TABLES
 from collector import collector
-from config import APP_CATEGORIES, BASE_DIR
-import autostart
-
-PORT = 52847
+from metrics import metrics, http_request_duration, ingest_segments_total
+from config import (APP_CATEGORIES, BASE_DIR, HTTP_BIND_ADDRESS, HTTP_PORT, HTTP_MAX_WORKERS,
+                    HTTP_KEEPALIVE_TIMEOUT_SEC, HTTP_IDLE_POLL_SEC, STREAM_INTERVAL_SEC, STREAM_HEARTBEAT_SEC,
+                    STREAM_SEND_TIMEOUT_SEC,
+                    RESPONSE_CACHE_MAX_BYTES, GZIP_MIN_BYTES, GZIP_LEVEL, STATIC_MAX_AGE_SEC, RANGE_MAX_BUCKETS,
+                    CHUNK_SIZE_BYTES, INGEST_ENABLED, INGEST_TOKEN, INGEST_MAX_BYTES)
 
 def format_duration(seconds):
     if seconds < 60:
@@ -28,7 +39,328 @@ def get_category_name(cat_id):
         return APP_CATEGORIES[cat_id]["name"]
     return "Прочее"
 
+def build_status():
+    stats = collector.get_current_stats()
+    return {
+        "running": collector._running,
+        "session_id": stats["session_id"],
+        "total_time": stats["total_time"],
+        "active_time": stats["active_time"],
+        "idle_time": stats["idle_time"],
+        "current_app": stats["current_app"],
+        "is_idle": stats["is_idle"],
+        "apps_count": stats["apps_count"],
+        "total_time_fmt": format_duration(stats["total_time"]),
+        "active_time_fmt": format_duration(stats["active_time"]),
+        "idle_time_fmt": format_duration(stats["idle_time"])
+    }
+
+
+class StatusStream:
+    def __init__(self, interval=STREAM_INTERVAL_SEC, heartbeat=STREAM_HEARTBEAT_SEC):
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self._clients = []
+        self._joining = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_status = {}
+        self._last_sent = 0.0
+    
+    @staticmethod
+    def _event(data):
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+    
+    def subscribe(self, sock):
+        sock.settimeout(STREAM_SEND_TIMEOUT_SEC)
+        with self._lock:
+            self._joining.append(sock)
+            if not self._thread or not self._thread.is_alive():
+                self._last_sent = time.monotonic()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake.set()
+    
+    @staticmethod
+    def _send(clients, payload):
+        alive = []
+        for sock in clients:
+            try:
+                sock.sendall(payload)
+                alive.append(sock)
+            except OSError:
+                sock.close()
+        return alive
+    
+    def _broadcast(self, payload):
+        self._clients = self._send(self._clients, payload)
+    
+    def _admit(self):
+        with self._lock:
+            joining, self._joining = self._joining, []
+        if not joining:
+            return
+        if not self._last_status:
+            self._last_status = build_status()
+        with self._lock:
+            self._clients.extend(self._send(joining, self._event(self._last_status)))
+    
+    def _run(self):
+        tick = time.monotonic() + self.interval
+        while True:
+            self._wake.wait(max(0.0, tick - time.monotonic()))
+            self._wake.clear()
+            self._admit()
+            if time.monotonic() < tick:
+                continue
+            tick = time.monotonic() + self.interval
+            status = build_status()
+            with self._lock:
+                if not self._clients and not self._joining:
+                    self._last_status = {}
+                    self._thread = None
+                    return
+                delta = {k: v for k, v in status.items() if self._last_status.get(k) != v}
+                self._last_status = status
+                now = time.monotonic()
+                if delta:
+                    self._broadcast(self._event(delta))
+                    self._last_sent = now
+                elif now - self._last_sent >= self.heartbeat:
+                    self._broadcast(b": ping\n\n")
+                    self._last_sent = now
+    
+    def close(self):
+        with self._lock:
+            for sock in self._clients + self._joining:
+                sock.close()
+            self._clients, self._joining = [], []
+
+
+status_stream = StatusStream()
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def gzip_variant(body):
+    if len(body) < GZIP_MIN_BYTES:
+        return None
+    compressed = gzip.compress(body, GZIP_LEVEL, mtime=0)
+    return compressed if len(compressed) < len(body) else None
+
+
+def gzip_etag(etag):
+    return etag[:-1] + '-gz"'
+
+
+class StaticAssets:
+    COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._assets = {}
+        self.load()
+    
+    def load(self):
+        assets = {}
+        for file in self.directory.rglob("*"):
+            if not file.is_file():
+                continue
+            body = file.read_bytes()
+            content_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            compressed = gzip_variant(body) if content_type.startswith(self.COMPRESSIBLE) else None
+            if file.suffix == ".html":
+                cache_control = "no-cache"
+            else:
+                cache_control = f"public, max-age={STATIC_MAX_AGE_SEC}"
+            path = "/" + file.relative_to(self.directory).as_posix()
+            assets[path] = (content_type, cache_control, make_etag(body), body, compressed)
+        self._assets = assets
+    
+    def get(self, path):
+        return self._assets.get(path)
+
+
+static_assets = StaticAssets(BASE_DIR / "static")
+
+
+class ResponseCache:
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, body):
+        compressed = gzip_variant(body)
+        entry = (make_etag(body), body, compressed)
+        size = len(body) + len(compressed or b"")
+        if size > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._size -= len(old[1]) + len(old[2] or b"")
+            self._entries[key] = entry
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted, evicted_gz) = self._entries.popitem(last=False)
+                self._size -= len(evicted) + len(evicted_gz or b"")
+        return entry
+
+
+response_cache = ResponseCache()
+
+PANELS = {
+    "today": "build_today_stats",
+    "week": "build_week_stats",
+    "apps": "build_apps",
+    "hourly": "build_hourly",
+    "categories": "build_categories",
+    "week_comparison": "build_week_comparison",
+    "trend": "build_trend",
+}
+
+PANEL_ROUTES = {
+    "/api/stats/today": "today",
+    "/api/stats/week": "week",
+    "/api/apps": "apps",
+    "/api/hourly": "hourly",
+    "/api/categories": "categories",
+    "/api/week-comparison": "week_comparison",
+    "/api/trend": "trend",
+}
+
+API_ENDPOINTS = set(PANEL_ROUTES) | {
+    "/api/status", "/api/stream", "/api/dashboard", "/api/range", "/api/export", "/api/metrics", "/api/hosts",
+    "/api/ingest",
+    "/api/autostart", "/api/start", "/api/stop", "/api/autostart/enable", "/api/autostart/disable",
+}
+
+
+BUCKET_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_bucket(text):
+    count, unit = text[:-1], text[-1:]
+    if unit not in BUCKET_UNITS or not count.isdigit() or int(count) <= 0:
+        raise ValueError(f"bad bucket: {text}")
+    return int(count) * BUCKET_UNITS[unit]
+
+
+def parse_moment(text, end=False):
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo:
+        moment = moment.astimezone().replace(tzinfo=None)
+    if end and len(text) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+
+def align_origin(moment, bucket_sec):
+    midnight = datetime.combine(moment.date(), datetime.min.time())
+    if bucket_sec % BUCKET_UNITS["w"] == 0:
+        return midnight - timedelta(days=midnight.weekday())
+    if bucket_sec % BUCKET_UNITS["d"] == 0:
+        return midnight
+    offset = (moment - midnight).total_seconds()
+    return midnight + timedelta(seconds=offset - offset % bucket_sec)
+
+
+def range_buckets(rows, count, origin, bucket_sec, group_by):
+    rows = iter(rows)
+    row = next(rows, None)
+    for index in range(count):
+        total = 0
+        groups = []
+        while row is not None and row[0] <= index:
+            if row[0] == index:
+                _, key, seconds = row
+                total += seconds
+                if group_by == "category":
+                    groups.append({"id": key, "name": get_category_name(key), "seconds": seconds})
+                elif group_by:
+                    groups.append({"name": key, "seconds": seconds})
+            row = next(rows, None)
+        bucket = {"start": (origin + timedelta(seconds=index * bucket_sec)).isoformat(), "seconds": total}
+        if group_by:
+            bucket["groups"] = groups
+        yield bucket
+
+
+class ChunkedWriter:
+    def __init__(self, wfile, chunk_size=CHUNK_SIZE_BYTES):
+        self.wfile = wfile
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self._size = 0
+    
+    def write(self, data):
+        self._buffer.append(data)
+        self._size += len(data)
+        if self._size >= self.chunk_size:
+            self.flush()
+    
+    def flush(self):
+        if self._size:
+            data = b"".join(self._buffer)
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self._buffer = []
+            self._size = 0
+    
+    def close(self):
+        self.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+
+def is_loopback(address):
+    if address == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+def request_hostname(value):
+    try:
+        return urlparse(f"//{value}").hostname or ""
+    except ValueError:
+        return ""
+
+
+def query_host(qs):
+    return qs.get("host", [None])[0] or None
+
+
+def dashboard_panels(qs):
+    names = [name for name in qs.get("panels", [""])[0].split(",") if name]
+    if not names:
+        return list(PANELS)
+    if any(name not in PANELS for name in names):
+        return None
+    return list(dict.fromkeys(names))
+
+
 class APIHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = HTTP_KEEPALIVE_TIMEOUT_SEC
+    disable_nagle_algorithm = True
     
     def __init__(self, *args, **kwargs):
         self.static_dir = BASE_DIR / "static"
@@ -37,127 +369,474 @@ class APIHandler(SimpleHTTPRequestHandler):
     def log_message(self, format, *args):
         pass
     
+    def handle(self):
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self.await_request():
+            self.handle_one_request()
+    
+    def end_headers(self):
+        if not self.close_connection and self.server.saturated():
+            self.send_header("Connection", "close")
+        super().end_headers()
+    
+    def await_request(self):
+        self.connection.setblocking(False)
+        try:
+            if self.rfile.peek(1):
+                return True
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+        deadline = time.monotonic() + self.timeout
+        while not self.server.saturated():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if select.select([self.connection], [], [], min(remaining, HTTP_IDLE_POLL_SEC))[0]:
+                return True
+        return False
+    
     def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        if self._cache_key and status == 200:
+            etag, body, compressed = response_cache.put(self._cache_key, body)
+            self.send_json_bytes(body, status, etag, compressed)
+        else:
+            self.send_json_bytes(body, status, compressed=gzip_variant(body) if self.accepts_gzip() else None)
+    
+    def send_json_bytes(self, body, status=200, etag=None, compressed=None):
+        self.send_body(body, "application/json; charset=utf-8", status, etag, compressed,
+                       "no-cache" if etag else None, {"Access-Control-Allow-Origin": "*"})
+    
+    def accepts_gzip(self):
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.partition(";")
+            if name.strip().lower() in ("gzip", "*"):
+                return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+        return False
+    
+    def send_body(self, body, content_type, status=200, etag=None, compressed=None, cache_control=None, headers=None):
+        if compressed is not None and self.accepts_gzip():
+            body = compressed
+            etag = gzip_etag(etag) if etag else None
+        else:
+            compressed = None
+        
+        if etag and status == 200:
+            tags = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+            if etag in tags or "*" in tags:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                if cache_control:
+                    self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                return
+        
         self.send_response(status)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
-        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if compressed is not None:
+            self.send_header("Content-Encoding", "gzip")
+        if compressed is not None or etag:
+            self.send_header("Vary", "Accept-Encoding")
+        if etag:
+            self.send_header("ETag", etag)
+        if cache_control:
+            self.send_header("Cache-Control", cache_control)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        if self.command != "HEAD":
+            self.wfile.write(body)
+    
+    def send_static(self, path):
+        asset = static_assets.get(path)
+        if not asset:
+            return False
+        content_type, cache_control, etag, body, compressed = asset
+        self.send_body(body, content_type, 200, etag, compressed, cache_control)
+        return True
+    
+    def panel_generation(self, panel, qs):
+        end = date.today()
+        today = end.strftime("%Y-%m-%d")
+        if panel in ("today", "hourly"):
+            return db.get_generation(today)
+        elif panel in ("apps", "categories"):
+            if qs.get("period", ["today"])[0] == "today":
+                return db.get_generation(today)
+            return db.get_generation()
+        elif panel in ("week", "trend"):
+            return db.get_generation((end - timedelta(days=6)).strftime("%Y-%m-%d"), today)
+        return db.get_generation()
+    
+    def cache_generation(self, path, qs):
+        if path in PANEL_ROUTES:
+            return self.panel_generation(PANEL_ROUTES[path], qs)
+        elif path == "/api/dashboard":
+            panels = dashboard_panels(qs)
+            if panels:
+                return max(self.panel_generation(panel, qs) for panel in panels)
+        return None
+    
+    def authorized(self):
+        if is_loopback(self.server.server_address[0]) or is_loopback(self.client_address[0]):
+            return True
+        return bool(INGEST_TOKEN) and hmac.compare_digest(self.headers.get("Authorization", ""),
+                                                          f"Bearer {INGEST_TOKEN}")
+    
+    def reject_unauthorized(self):
+        if self.authorized():
+            return False
+        self._cache_key = None
+        self.close_connection = True
+        self.send_json({"error": "unauthorized"}, 401)
+        return True
+    
+    def same_origin(self):
+        host = self.headers.get("Host", "")
+        origin = self.headers.get("Origin")
+        if origin is not None and urlparse(origin).netloc != host:
+            return False
+        hostname = request_hostname(host)
+        return hostname in LOOPBACK_HOSTS or hostname == self.connection.getsockname()[0]
+    
+    def endpoint_label(self):
+        path = urlparse(self.path).path
+        if path in API_ENDPOINTS:
+            return path
+        return "other" if path.startswith("/api/") else "static"
     
     def do_GET(self):
+        with metrics.timer(http_request_duration, self.endpoint_label()):
+            if not self.reject_unauthorized():
+                self.route_get()
+    
+    def route_get(self):
         parsed = urlparse(self.path)
         path = parsed.path
+        qs = parse_qs(parsed.query)
+        
+        self._cache_key = None
+        generation = self.cache_generation(path, qs)
+        if generation is not None:
+            self._cache_key = (path, parsed.query, date.today(), generation)
+            cached = response_cache.get(self._cache_key)
+            if cached:
+                etag, body, compressed = cached
+                self.send_json_bytes(body, etag=etag, compressed=compressed)
+                return
         
         if path == "/api/status":
             self.handle_status()
-        elif path == "/api/stats/today":
-            self.handle_today_stats()
-        elif path == "/api/stats/week":
-            self.handle_week_stats()
-        elif path == "/api/apps":
-            self.handle_apps()
-        elif path == "/api/hourly":
-            self.handle_hourly()
-        elif path == "/api/categories":
-            self.handle_categories()
-        elif path == "/api/week-comparison":
-            self.handle_week_comparison()
-        elif path == "/api/trend":
-            self.handle_trend()
+        elif path == "/api/stream":
+            self.handle_stream()
+        elif path == "/api/dashboard":
+            self.handle_dashboard(qs)
+        elif path == "/api/range":
+            self.handle_range(qs)
+        elif path == "/api/export":
+            self.handle_export(qs)
+        elif path in PANEL_ROUTES:
+            self.send_json(self.build_panel(PANEL_ROUTES[path], qs, {}))
         elif path == "/api/autostart":
             self.handle_autostart_status()
+        elif path == "/api/metrics":
+            self.handle_metrics()
+        elif path == "/api/hosts":
+            self.send_json(db.get_hosts())
         else:
             if path == "/":
-                self.path = "/index.html"
-            super().do_GET()
+                path = self.path = "/index.html"
+            if not self.send_static(path):
+                super().do_GET()
+    
+    def do_HEAD(self):
+        if self.reject_unauthorized():
+            return
+        path = urlparse(self.path).path
+        if path == "/":
+            path = self.path = "/index.html"
+        if not self.send_static(path):
+            super().do_HEAD()
     
     def do_POST(self):
+        with metrics.timer(http_request_duration, self.endpoint_label()):
+            if not self.reject_unauthorized():
+                self.route_post()
+    
+    def route_post(self):
+        self._cache_key = None
         parsed = urlparse(self.path)
         path = parsed.path
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > INGEST_MAX_BYTES:
+            self.close_connection = True
+            self.send_json({"error": f"request body exceeds {INGEST_MAX_BYTES} bytes"}, 413)
+            return
+        body = self.rfile.read(length) if length else b""
         
-        if path == "/api/start":
+        if path == "/api/ingest":
+            self.handle_ingest(parse_qs(parsed.query), body)
+        elif path == "/api/start":
             collector.start_session()
             self.send_json({"status": "started"})
         elif path == "/api/stop":
             collector.stop_session()
             self.send_json({"status": "stopped"})
         elif path == "/api/autostart/enable":
+            import autostart
             result = autostart.add_to_startup()
             self.send_json({"enabled": result})
         elif path == "/api/autostart/disable":
+            import autostart
             result = autostart.remove_from_startup()
             self.send_json({"disabled": result})
         else:
             self.send_json({"error": "not found"}, 404)
     
+    def handle_ingest(self, qs, body):
+        from fleet import HOST_PATTERN, decompress, parse_segments
+        
+        if not INGEST_ENABLED:
+            self.send_json({"error": "ingest disabled"}, 404)
+            return
+        if INGEST_TOKEN and not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {INGEST_TOKEN}"):
+            self.send_json({"error": "unauthorized"}, 401)
+            return
+        host = query_host(qs) or self.headers.get("X-Host", "")
+        if not HOST_PATTERN.match(host):
+            self.send_json({"error": "host must match [A-Za-z0-9._-], up to 64 characters"}, 400)
+            return
+        encoding = self.headers.get("Content-Encoding", "identity").strip().lower()
+        if encoding == "gzip":
+            try:
+                body = decompress(body)
+            except zlib.error as e:
+                self.send_json({"error": f"bad gzip body: {e}"}, 400)
+                return
+            if body is None:
+                self.send_json({"error": "decompressed body too large"}, 413)
+                return
+        elif encoding != "identity":
+            self.send_json({"error": f"unsupported Content-Encoding: {encoding}"}, 415)
+            return
+        
+        segments, hours, errors = parse_segments(body)
+        inserted = db.ingest_segments(host, segments, hours).result() if segments else 0
+        metrics.inc(ingest_segments_total, inserted, "inserted")
+        metrics.inc(ingest_segments_total, len(segments) - inserted, "duplicate")
+        metrics.inc(ingest_segments_total, len(errors), "rejected")
+        self.send_json({
+            "host": host,
+            "received": len(segments) + len(errors),
+            "inserted": inserted,
+            "duplicates": len(segments) - inserted,
+            "rejected": len(errors),
+            "errors": errors[:20],
+        }, 200 if segments or not errors else 400)
+    
     def handle_autostart_status(self):
+        import autostart
+        
         enabled = autostart.is_in_startup()
         self.send_json({"enabled": enabled})
     
     def handle_status(self):
-        stats = collector.get_current_stats()
-        self.send_json({
-            "running": collector._running,
-            "session_id": stats["session_id"],
-            "total_time": stats["total_time"],
-            "active_time": stats["active_time"],
-            "idle_time": stats["idle_time"],
-            "current_app": stats["current_app"],
-            "is_idle": stats["is_idle"],
-            "apps_count": stats["apps_count"],
-            "total_time_fmt": format_duration(stats["total_time"]),
-            "active_time_fmt": format_duration(stats["active_time"]),
-            "idle_time_fmt": format_duration(stats["idle_time"])
-        })
-    
-    def handle_today_stats(self):
+        self.send_json(build_status())
+    
+    def handle_metrics(self):
+        if not metrics.enabled:
+            self.send_json({"error": "metrics disabled"}, 404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_body(body, "text/plain; version=0.0.4; charset=utf-8", compressed=gzip_variant(body),
+                       cache_control="no-cache")
+    
+    def handle_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.close_connection = True
+        self.server.detach_request(self.connection)
+        status_stream.subscribe(self.connection)
+    
+    def handle_dashboard(self, qs):
+        panels = dashboard_panels(qs)
+        if panels is None:
+            self.send_json({"error": "unknown panel"}, 400)
+            return
+        
+        shared = {}
+        with db.read_snapshot():
+            result = {panel: self.build_panel(panel, qs, shared) for panel in panels}
+        self.send_json(result)
+    
+    def handle_range(self, qs):
+        try:
+            start = parse_moment(qs["from"][0])
+            if "to" in qs:
+                end = parse_moment(qs["to"][0], end=True)
+            else:
+                end = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+            bucket = qs.get("bucket", ["1d"])[0]
+            bucket_sec = parse_bucket(bucket)
+            group_by = qs.get("group_by", [None])[0]
+            host = query_host(qs)
+            if group_by not in (None, "app", "category"):
+                raise ValueError(f"bad group_by: {group_by}")
+        except KeyError:
+            self.send_json({"error": "from is required"}, 400)
+            return
+        except ValueError as e:
+            self.send_json({"error": str(e)}, 400)
+            return
+        if end <= start:
+            self.send_json({"error": "to must be after from"}, 400)
+            return
+        
+        origin = align_origin(start, bucket_sec)
+        count = -int(-(end - origin).total_seconds() // bucket_sec)
+        if count > RANGE_MAX_BUCKETS:
+            self.send_json({"error": f"too many buckets: {count} > {RANGE_MAX_BUCKETS}"}, 400)
+            return
+        
+        source = db.choose_range_source(start, end, bucket_sec, host)
+        header = {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "bucket": bucket,
+            "group_by": group_by,
+            "source": source,
+            "host": host,
+        }
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        
+        rows = db.iter_range(start, end, bucket_sec, origin, group_by, source, host)
+        out = ChunkedWriter(self.wfile)
+        try:
+            out.write(json.dumps(header, ensure_ascii=False)[:-1].encode("utf-8") + b', "buckets": [')
+            for index, item in enumerate(range_buckets(rows, count, origin, bucket_sec, group_by)):
+                out.write((", " if index else "").encode() + json.dumps(item, ensure_ascii=False).encode("utf-8"))
+            out.write(b"]}")
+            out.close()
+        except Exception:
+            self.close_connection = True
+            raise
+        finally:
+            rows.close()
+    
+    def handle_export(self, qs):
+        from export import EXPORT_FORMATS, GzipWriter, export_table
+        
+        if not self.same_origin():
+            self.send_json({"error": "export is only available to the dashboard origin"}, 403)
+            return
+        table = qs.get("table", ["app_usage"])[0]
+        fmt = qs.get("format", ["csv"])[0]
+        start_date = qs.get("from", [None])[0]
+        end_date = qs.get("to", [None])[0]
+        if table not in EXPORT_TABLES:
+            self.send_json({"error": f"unknown table: {table}"}, 400)
+            return
+        if fmt not in EXPORT_FORMATS:
+            self.send_json({"error": f"unknown format: {fmt}"}, 400)
+            return
+        try:
+            for value in (start_date, end_date):
+                if value:
+                    date.fromisoformat(value)
+        except ValueError as e:
+            self.send_json({"error": str(e)}, 400)
+            return
+        
+        attachment = qs.get("gzip", ["0"])[0] == "1"
+        encoded = not attachment and self.accepts_gzip()
+        filename = f"{table}.{fmt}" + (".gz" if attachment else "")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/gzip" if attachment else EXPORT_FORMATS[fmt])
+        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.send_header("Transfer-Encoding", "chunked")
+        if encoded:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        
+        out = ChunkedWriter(self.wfile)
+        sink = GzipWriter(out) if attachment or encoded else out
+        try:
+            export_table(sink, table, fmt, start_date, end_date)
+            if sink is not out:
+                sink.close()
+            out.close()
+        except Exception:
+            self.close_connection = True
+            raise
+    
+    def build_panel(self, panel, qs, shared):
+        return getattr(self, PANELS[panel])(qs, shared)
+    
+    def week_period(self, qs, shared):
+        if "week" not in shared:
+            end = date.today()
+            start = end - timedelta(days=6)
+            
+            daily_data = db.get_stats_for_period(
+                start.strftime("%Y-%m-%d"),
+                end.strftime("%Y-%m-%d"),
+                query_host(qs)
+            )
+            shared["week"] = (start, end, daily_data)
+        return shared["week"]
+    
+    def build_today_stats(self, qs, shared):
         today = date.today().strftime("%Y-%m-%d")
-        stats = db.get_today_stats()
+        stats = db.get_today_stats(query_host(qs))
         
         total = stats.get("total_seconds", 0) or 1
         active = stats.get("active_seconds", 0)
         productivity = round((active / total) * 100) if total > 0 else 0
         
-        self.send_json({
+        return {
             "date": today,
             "total_seconds": stats.get("total_seconds", 0),
             "active_seconds": stats.get("active_seconds", 0),
             "idle_seconds": stats.get("idle_seconds", 0),
             "apps_used": stats.get("apps_used", 0),
             "productivity": productivity
-        })
+        }
     
-    def handle_week_stats(self):
-        end = date.today()
-        start = end - timedelta(days=6)
-        
-        daily_data = db.get_stats_for_period(
-            start.strftime("%Y-%m-%d"),
-            end.strftime("%Y-%m-%d")
-        )
+    def build_week_stats(self, qs, shared):
+        start, end, daily_data = self.week_period(qs, shared)
         
         total_active = sum(d.get("active_seconds", 0) for d in daily_data)
         total_time = sum(d.get("total_seconds", 0) for d in daily_data)
         
-        self.send_json({
+        return {
             "period": f"{start.strftime('%d.%m')} - {end.strftime('%d.%m.%Y')}",
             "total_seconds": total_time,
             "active_seconds": total_active,
             "avg_daily": total_active // 7 if daily_data else 0,
             "days_count": len(daily_data),
             "daily_data": daily_data
-        })
+        }
     
-    def handle_apps(self):
-        qs = parse_qs(urlparse(self.path).query)
+    def build_apps(self, qs, shared):
         period = qs.get("period", ["today"])[0]
         limit = int(qs.get("limit", ["10"])[0])
         
         if period == "today":
             date_str = date.today().strftime("%Y-%m-%d")
-            apps = db.get_top_apps(date_str, limit)
+            apps = db.get_top_apps(date_str, limit, query_host(qs))
         else:
-            apps = db.get_top_apps(limit=limit)
+            apps = db.get_top_apps(limit=limit, host=query_host(qs))
         
         total = sum(a.get("total_time", 0) for a in apps) or 1
         
@@ -173,27 +852,26 @@ class APIHandler(SimpleHTTPRequestHandler):
                 "percent": round((duration / total) * 100, 1)
             })
         
-        self.send_json(result)
+        return result
     
-    def handle_hourly(self):
+    def build_hourly(self, qs, shared):
         today = date.today().strftime("%Y-%m-%d")
-        hourly = db.get_hourly_stats(today)
+        hourly = db.get_hourly_stats(today, query_host(qs))
         
         hours = {h: 0 for h in range(24)}
         for item in hourly:
             hours[item.get("hour", 0)] = item.get("active_seconds", 0)
         
-        self.send_json([{"hour": h, "seconds": s} for h, s in hours.items()])
+        return [{"hour": h, "seconds": s} for h, s in hours.items()]
     
-    def handle_categories(self):
-        qs = parse_qs(urlparse(self.path).query)
+    def build_categories(self, qs, shared):
         period = qs.get("period", ["today"])[0]
         
         if period == "today":
             date_str = date.today().strftime("%Y-%m-%d")
-            categories = db.get_category_stats(date_str)
+            categories = db.get_category_stats(date_str, query_host(qs))
         else:
-            categories = db.get_category_stats()
+            categories = db.get_category_stats(host=query_host(qs))
         
         result = []
         for cat in categories:
@@ -204,10 +882,10 @@ class APIHandler(SimpleHTTPRequestHandler):
                 "formatted": format_duration(cat.get("total_time", 0))
             })
         
-        self.send_json(result)
+        return result
     
-    def handle_week_comparison(self):
-        data = db.get_week_comparison()
+    def build_week_comparison(self, qs, shared):
+        data = db.get_week_comparison(query_host(qs))
         result = []
         for d in data:
             result.append({
@@ -215,16 +893,10 @@ class APIHandler(SimpleHTTPRequestHandler):
                 "seconds": int(d.get("avg_active", 0)),
                 "hours": round(d.get("avg_active", 0) / 3600, 1)
             })
-        self.send_json(result)
+        return result
     
-    def handle_trend(self):
-        end = date.today()
-        start = end - timedelta(days=6)
-        
-        daily_data = db.get_stats_for_period(
-            start.strftime("%Y-%m-%d"),
-            end.strftime("%Y-%m-%d")
-        )
+    def build_trend(self, qs, shared):
+        start, end, daily_data = self.week_period(qs, shared)
         
         result = []
         for d in daily_data:
@@ -238,26 +910,77 @@ class APIHandler(SimpleHTTPRequestHandler):
                 "active_hours": round(active / 3600, 1)
             })
         
-        self.send_json(result)
+        return result
+
+
+class PooledHTTPServer(HTTPServer):
+    def __init__(self, server_address, handler_class, max_workers=HTTP_MAX_WORKERS):
+        super().__init__(server_address, handler_class)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="http")
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+    
+    def process_request(self, request, client_address):
+        with self._queued_lock:
+            self._queued += 1
+        self._executor.submit(self._process_request_worker, request, client_address)
+    
+    def saturated(self):
+        return self._queued > 0
+    
+    def detach_request(self, request):
+        with self._detached_lock:
+            self._detached.add(request)
+    
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+    
+    def _process_request_worker(self, request, client_address):
+        with self._queued_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False)
 
 
 class WebServer:
-    def __init__(self, port=PORT):
+    def __init__(self, port=HTTP_PORT, max_workers=HTTP_MAX_WORKERS):
         self.port = port
+        self.max_workers = max_workers
         self.server = None
         self.thread = None
     
     def start(self):
-        self.server = HTTPServer(("127.0.0.1", self.port), APIHandler)
+        if not is_loopback(HTTP_BIND_ADDRESS) and not INGEST_TOKEN:
+            raise RuntimeError(f"refusing to listen on {HTTP_BIND_ADDRESS or 'all interfaces'} without "
+                               "PC_USAGE_MONITOR_INGEST_TOKEN")
+        self.server = PooledHTTPServer((HTTP_BIND_ADDRESS, self.port), APIHandler, self.max_workers)
         self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
         self.thread.start()
         print(f"Сервер запущен: http://127.0.0.1:{self.port}")
     
     def stop(self):
+        status_stream.close()
         if self.server:
             self.server.shutdown()
+            self.server.server_close()
     
     def open_browser(self):
+        import webbrowser
+        
         webbrowser.open(f"http://127.0.0.1:{self.port}")
 
 
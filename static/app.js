@@ -1,5 +1,8 @@
 let isRunning = false;
 let updateInterval = null;
+let statusStream = null;
+let streamRetry = null;
+let statusState = {};
 
 const colors = ['#6366f1', '#22c55e', '#eab308', '#f97316', '#ef4444', '#a855f7', '#06b6d4', '#ec4899'];
 
@@ -46,11 +49,10 @@ async function checkStatus() {
         const data = await res.json();
         
         isRunning = data.running;
-        updateUI(data);
+        statusState = Object.assign(statusState, data);
+        updateUI(statusState);
         
-        if (isRunning && !updateInterval) {
-            updateInterval = setInterval(fetchStatus, 1000);
-        }
+        startStatusStream();
     } catch (e) {
         console.error(e);
     }
@@ -60,12 +62,50 @@ async function fetchStatus() {
     try {
         const res = await fetch('/api/status');
         const data = await res.json();
-        updateUI(data);
+        isRunning = data.running;
+        statusState = Object.assign(statusState, data);
+        updateUI(statusState);
     } catch (e) {
         console.error(e);
     }
 }
 
+function startStatusStream() {
+    if (statusStream) return;
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    statusStream = new EventSource('/api/stream');
+    statusStream.onmessage = (event) => {
+        stopPolling();
+        statusState = Object.assign(statusState, JSON.parse(event.data));
+        isRunning = statusState.running;
+        updateUI(statusState);
+    };
+    statusStream.onerror = () => {
+        statusStream.close();
+        statusStream = null;
+        startPolling();
+        clearTimeout(streamRetry);
+        streamRetry = setTimeout(startStatusStream, 10000);
+    };
+}
+
+function startPolling() {
+    if (!updateInterval) {
+        updateInterval = setInterval(fetchStatus, 1000);
+    }
+}
+
+function stopPolling() {
+    if (updateInterval) {
+        clearInterval(updateInterval);
+        updateInterval = null;
+    }
+}
+
 function updateUI(data) {
     const btn = document.getElementById('toggleBtn');
     const badge = document.getElementById('statusBadge');
@@ -105,13 +145,6 @@ async function toggleMonitoring() {
         await fetch(endpoint, { method: 'POST' });
         isRunning = !isRunning;
         
-        if (isRunning) {
-            updateInterval = setInterval(fetchStatus, 1000);
-        } else {
-            clearInterval(updateInterval);
-            updateInterval = null;
-        }
-        
         checkStatus();
     } catch (e) {
         console.error(e);
@@ -145,16 +178,26 @@ function drawProductivityRing(percent) {
     ctx.stroke();
 }
 
+const fleetHost = new URLSearchParams(location.search).get('host');
+
+async function fetchDashboard(panels, params = '') {
+    const host = fleetHost ? `&host=${encodeURIComponent(fleetHost)}` : '';
+    const res = await fetch(`/api/dashboard?panels=${panels.join(',')}${params}${host}`);
+    return res.json();
+}
+
 async function loadOverviewData() {
-    await loadHourlyChart();
-    await loadTopApps();
+    try {
+        const data = await fetchDashboard(['hourly', 'apps'], '&limit=5');
+        drawHourlyChart(data.hourly);
+        renderTopApps(data.apps);
+    } catch (e) {
+        console.error(e);
+    }
 }
 
-async function loadHourlyChart() {
+function drawHourlyChart(data) {
     try {
-        const res = await fetch('/api/hourly');
-        const data = await res.json();
-        
         const labels = data.map(d => d.hour.toString().padStart(2, '0'));
         const values = data.map(d => Math.round(d.seconds / 60));
         
@@ -196,11 +239,8 @@ async function loadHourlyChart() {
     }
 }
 
-async function loadTopApps() {
+function renderTopApps(data) {
     try {
-        const res = await fetch('/api/apps?limit=5');
-        const data = await res.json();
-        
         const container = document.getElementById('topAppsList');
         container.innerHTML = '';
         
@@ -229,13 +269,9 @@ async function loadAppsData() {
     const period = document.querySelector('input[name="period"]:checked').value;
     
     try {
-        const [appsRes, catsRes] = await Promise.all([
-            fetch(`/api/apps?period=${period}&limit=20`),
-            fetch(`/api/categories?period=${period}`)
-        ]);
-        
-        const apps = await appsRes.json();
-        const categories = await catsRes.json();
+        const data = await fetchDashboard(['apps', 'categories'], `&period=${period}&limit=20`);
+        const apps = data.apps;
+        const categories = data.categories;
         
         const container = document.getElementById('fullAppsList');
         container.innerHTML = '';
@@ -306,18 +342,18 @@ function drawCategoriesChart(categories) {
 }
 
 async function loadStatsData() {
-    await Promise.all([
-        loadWeekComparison(),
-        loadTrendChart(),
-        loadWeekSummary()
-    ]);
+    try {
+        const data = await fetchDashboard(['week_comparison', 'trend', 'week']);
+        drawWeekComparison(data.week_comparison);
+        drawTrendChart(data.trend);
+        renderWeekSummary(data.week);
+    } catch (e) {
+        console.error(e);
+    }
 }
 
-async function loadWeekComparison() {
+function drawWeekComparison(data) {
     try {
-        const res = await fetch('/api/week-comparison');
-        const data = await res.json();
-        
         const ctx = document.getElementById('weekComparisonChart').getContext('2d');
         
         if (window.weekComparisonInstance) {
@@ -351,11 +387,8 @@ async function loadWeekComparison() {
     }
 }
 
-async function loadTrendChart() {
+function drawTrendChart(data) {
     try {
-        const res = await fetch('/api/trend');
-        const data = await res.json();
-        
         const ctx = document.getElementById('trendChart').getContext('2d');
         
         if (window.trendInstance) {
@@ -394,11 +427,8 @@ async function loadTrendChart() {
     }
 }
 
-async function loadWeekSummary() {
+function renderWeekSummary(data) {
     try {
-        const res = await fetch('/api/stats/week');
-        const data = await res.json();
-        
         const formatTime = (sec) => {
             if (sec < 60) return sec + 'с';
             if (sec < 3600) return Math.floor(sec / 60) + 'м';
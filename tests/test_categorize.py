@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from backends import SYNTHETIC_APPS, app_name_from_exe
+from config import APP_CATEGORIES
+from tracker import CategoryMatcher
+
+OVERLAPPING = {
+    "empty": {"keywords": []},
+    "short": {"keywords": ["gi", "a"]},
+    "long": {"keywords": ["git", "github", "github desktop", "aa"]},
+    "also_empty": {"keywords": []},
+    "special": {"keywords": ["c++", "notepad++", "(beta)", "a.b", "[x]", "?", ""]},
+    "unicode": {"keywords": ["телеграм", "тел", "ё"]},
+}
+
+
+def reference_categorize(categories, app_name, exe_name, window_title):
+    check_text = f"{app_name} {exe_name} {window_title}".lower()
+    for cat_id, cat_info in categories.items():
+        for keyword in cat_info["keywords"]:
+            if keyword in check_text:
+                return cat_id
+    return "other"
+
+
+def generated_inputs(categories, count, seed):
+    rng = random.Random(seed)
+    keywords = [keyword for info in categories.values() for keyword in info["keywords"] if keyword]
+    fragments = keywords + [keyword[:rng.randint(1, len(keyword))] for keyword in keywords]
+    fragments += ["", " ", "-", ".exe", "Mozilla Firefox", "Документ", "ЁЖ", "GIT", "Hub"]
+    for exe_name, titles in SYNTHETIC_APPS:
+        yield app_name_from_exe(exe_name), exe_name, titles[0]
+    for _ in range(count):
+        words = [rng.choice(fragments) for _ in range(rng.randint(0, 4))]
+        title = rng.choice(["", " ", "_"]).join(words)
+        if rng.random() < 0.3:
+            title = title.upper()
+        exe_name = rng.choice([exe for exe, _ in SYNTHETIC_APPS] + ["", "app.exe"])
+        yield rng.choice(["", app_name_from_exe(exe_name) if exe_name else "App"]), exe_name, title
+
+
+@pytest.mark.parametrize("categories", [APP_CATEGORIES, OVERLAPPING, {**OVERLAPPING, **APP_CATEGORIES},
+                                        {"empty": {"keywords": []}}, {}],
+                         ids=["config", "overlapping", "combined", "only_empty", "no_categories"])
+def test_matcher_agrees_with_nested_loop(categories):
+    matcher = CategoryMatcher(categories, cache_size=64)
+    for app_name, exe_name, title in generated_inputs(categories, 5000, seed=len(categories)):
+        expected = reference_categorize(categories, app_name, exe_name, title)
+        assert matcher.categorize(app_name, exe_name, title) == expected, (app_name, exe_name, title)
+        assert matcher.categorize(app_name, exe_name, title) == expected
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from backends import SyntheticBackend
+from collector import UsageCollector
+from config import SAVE_INTERVAL_SEC
+from database import db
+from metrics import db_commit_duration
+from tracker import tracker
+
+HOUR = 3600
+
+
+def commit_count():
+    return sum(db_commit_duration.child().counts)
+
+
+def test_commits_per_simulated_hour_stay_within_group_commit_bound(monkeypatch):
+    started = datetime(2024, 1, 15, 9, 0).timestamp()
+    backend = SyntheticBackend(speed=0, seed=1, start_time=started)
+    tracker.__init__()
+    tracker.set_backend(backend)
+    collector = UsageCollector()
+    writes = {"create_session": 0, "log_app_start": 0, "flush_usage": 0}
+    
+    def synchronous(name):
+        submit = getattr(db, name)
+        
+        def call(*args, **kwargs):
+            future = submit(*args, **kwargs)
+            future.result()
+            writes[name] += 1
+            return future
+        
+        monkeypatch.setattr(db, name, call)
+    
+    for name in writes:
+        synchronous(name)
+    switches = 0
+    handle_app_change = tracker.on_app_change
+    
+    def counting_app_change(*args):
+        nonlocal switches
+        switches += 1
+        handle_app_change(*args)
+    
+    tracker.on_app_change = counting_app_change
+    db.flush()
+    commits = commit_count()
+    
+    collector.session_id = db.create_session().result()
+    collector._session_start = collector._last_flush = started
+    tracker._last_poll_time = started
+    next_save = started + SAVE_INTERVAL_SEC
+    while backend.time() < started + HOUR:
+        tracker._interval = tracker._next_interval(tracker._poll())
+        backend.sleep(tracker._interval)
+        if backend.time() >= next_save:
+            collector._flush()
+            next_save += SAVE_INTERVAL_SEC
+    collector._flush(closing_duration=backend.time() - collector._current_app_start)
+    commits = commit_count() - commits
+    
+    assert switches > 0
+    assert commits == sum(writes.values())
+    assert writes["log_app_start"] == switches
+    assert writes["flush_usage"] == switches + HOUR // SAVE_INTERVAL_SEC + 1
+    assert commits == 2 * switches + HOUR // SAVE_INTERVAL_SEC + 2
+    assert commits < HOUR / 10
@@ -0,0 +1,44 @@
+import tracemalloc
+from datetime import date
+
+import pytest
+
+from database import db
+from datagen import generate
+from export import GzipWriter, export_table
+
+MEMORY_CEILING = 2 * 1024 * 1024
+
+
+class CountingSink:
+    def __init__(self):
+        self.bytes = 0
+    
+    def write(self, data):
+        self.bytes += len(data)
+
+
+@pytest.fixture(scope="module")
+def history():
+    generate(db.db_path, 31, seed=11, mean_switches=1000, end=date(2017, 3, 31))
+    return "2017-03-01", "2017-03-31"
+
+
+@pytest.mark.parametrize("fmt", ["csv", "ndjson"])
+@pytest.mark.parametrize("compress", [False, True])
+def test_export_streams_under_a_memory_ceiling(history, fmt, compress):
+    export_table(CountingSink(), "app_usage", fmt, history[0], history[0])
+    sink = CountingSink()
+    out = GzipWriter(sink) if compress else sink
+    tracemalloc.start()
+    try:
+        count = export_table(out, "app_usage", fmt, *history)
+        if compress:
+            out.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    assert count > 10000
+    assert sink.bytes > (MEMORY_CEILING if not compress else 0)
+    assert peak < MEMORY_CEILING
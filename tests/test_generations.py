@@ -0,0 +1,26 @@
+from database import db
+
+OLD_RANGE = ("2020-06-01", "2020-06-30")
+
+
+def test_commits_without_dates_keep_historical_generations():
+    db.flush()
+    old = db.get_generation(*OLD_RANGE)
+    latest = db.get_generation()
+    
+    db.flush()
+    db.set_upload_cursor("https://example.invalid", 1).result()
+    db.flush_usage({}, journal=(1, 10)).result()
+    db.compact_raw_usage("2000-01-01")
+    db.update_daily_stats("2020-07-02", 60, 60, 0, 1).result()
+    
+    assert db.get_generation() > latest
+    assert db.get_generation(*OLD_RANGE) == old
+    assert db.get_generation("2020-07-01", "2020-07-31") > old
+    
+    db.update_daily_stats("2020-06-15", 60, 60, 0, 1).result()
+    touched = db.get_generation(*OLD_RANGE)
+    assert touched > old
+    
+    db.rebuild_rollups()
+    assert db.get_generation(*OLD_RANGE) > touched
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import journal as journal_module
+from journal import ActivityJournal, HEADER, STATE, TICK, read_records
+
+STATE_FIELDS = (1, 0, 100.0, 0.0, 0.0, 0.0, 0)
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "journal_crash.py")
+
+
+def test_rotation_happens_on_the_sync_thread(tmp_path):
+    activity = ActivityJournal(tmp_path / "activity.journal", sync_interval=3600, max_bytes=64)
+    activity.open(STATE_FIELDS)
+    for second in range(5):
+        activity.tick(101.0 + second, 1.0, False)
+    generation, position = activity.checkpoint(STATE_FIELDS)
+    activity.tick(106.0, 1.0, False)
+    
+    assert not activity.previous_path.exists()
+    assert (generation, position) == (activity.generation, position)
+    
+    activity.sync()
+    previous, current = activity.pending()
+    assert previous[0] == generation
+    assert max(offset for offset, _, _ in previous[1]) < position
+    assert current[0] != generation
+    assert [kind for _, kind, _ in current[1]] == [STATE, TICK]
+    assert read_records(activity.path)[0][1] == HEADER
+    activity.close(discard=True)
+
+
+def test_append_does_not_wait_for_fsync(tmp_path, monkeypatch):
+    activity = ActivityJournal(tmp_path / "activity.journal", sync_interval=3600)
+    activity.open(STATE_FIELDS)
+    started, release = threading.Event(), threading.Event()
+    
+    def slow_fsync(fd):
+        started.set()
+        release.wait(5)
+    
+    monkeypatch.setattr(journal_module.os, "fsync", slow_fsync)
+    activity.tick(101.0, 1.0, False)
+    syncing = threading.Thread(target=activity.sync)
+    syncing.start()
+    assert started.wait(5)
+    began = time.monotonic()
+    activity.tick(102.0, 1.0, False)
+    activity.checkpoint(STATE_FIELDS)
+    elapsed = time.monotonic() - began
+    release.set()
+    syncing.join()
+    
+    assert elapsed < 1
+    activity.close(discard=True)
+
+
+def test_recovery_after_random_kills():
+    result = subprocess.run([sys.executable, BENCHMARK, "--runs", "3", "--max-life", "1.5", "--journal-bytes", "4096"],
+                            capture_output=True, text=True, timeout=300)
+    
+    assert result.stdout.strip().splitlines()[-1] == "3/3 runs recovered consistently", result.stdout
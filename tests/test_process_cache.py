@@ -0,0 +1,42 @@
+from backends import ProcessNameCache, SyntheticBackend
+
+
+def fake_backend(processes):
+    backend = SyntheticBackend(seed=0)
+    backend._processes = dict(processes)
+    backend.exe_lookups = 0
+    return backend
+
+
+def test_hit_for_the_same_process():
+    backend = fake_backend({1000: (10.0, "code.exe")})
+    cache = ProcessNameCache()
+    
+    assert cache.lookup(1, 1000, backend) == ("Code", "code.exe")
+    assert cache.lookup(2, 1000, backend) == ("Code", "code.exe")
+    assert cache.lookup(2, 1000, backend) == ("Code", "code.exe")
+    assert backend.exe_lookups == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_reused_pid_with_a_new_start_time_is_looked_up_again():
+    backend = fake_backend({1000: (10.0, "code.exe")})
+    cache = ProcessNameCache()
+    cache.lookup(1, 1000, backend)
+    
+    backend._processes[1000] = (20.0, "chrome.exe")
+    assert cache.lookup(2, 1000, backend) == ("Chrome", "chrome.exe")
+    assert backend.exe_lookups == 2
+
+
+def test_entry_is_evicted_after_the_process_exits():
+    backend = fake_backend({1000: (10.0, "code.exe")})
+    cache = ProcessNameCache()
+    cache.lookup(1, 1000, backend)
+    
+    del backend._processes[1000]
+    assert cache.lookup(2, 1000, backend) is None
+    assert 1000 not in cache._entries
+    
+    backend._processes[1000] = (30.0, "slack.exe")
+    assert cache.lookup(3, 1000, backend) == ("Slack", "slack.exe")
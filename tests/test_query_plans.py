@@ -0,0 +1,62 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import db
+from datagen import generate
+
+SUBQUERY = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (.+)$")
+SCAN = re.compile(r"^SCAN (\S+)")
+
+
+@pytest.fixture(scope="module")
+def history():
+    generate(db.db_path, 60, seed=3, mean_switches=50)
+    db.migrate_partitions()
+    db.rebuild_rollups()
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=2)
+
+
+def traced(call):
+    statements = []
+    db._pool.release_reader(db._pool.acquire_reader())
+    readers = list(db._pool._readers)
+    for conn in readers:
+        conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        for conn in readers:
+            conn.set_trace_callback(None)
+    return [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+
+
+def full_scans(statement):
+    with db._get_reader() as conn:
+        details = [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+    subqueries = {match.group(1) for match in map(SUBQUERY.match, details) if match}
+    return [detail for detail in details if SCAN.match(detail) and not detail.startswith("SCAN (")
+            and SCAN.match(detail).group(1) not in subqueries and detail != "SCAN CONSTANT ROW"]
+
+
+@pytest.mark.parametrize("name", ["top_apps", "category_stats", "launches_for_day", "range_raw_by_app",
+                                  "range_raw_by_category", "range_raw_total"])
+def test_date_filtered_queries_use_indexes(history, name):
+    day = history.strftime("%Y-%m-%d")
+    calls = {
+        "top_apps": lambda: db.get_top_apps(day),
+        "category_stats": lambda: db.get_category_stats(day),
+        "launches_for_day": lambda: db.get_app_launches_count(day),
+        "range_raw_by_app": lambda: list(db.iter_range(history, history + timedelta(days=1), 3600, history,
+                                                       "app", "raw")),
+        "range_raw_by_category": lambda: list(db.iter_range(history, history + timedelta(days=1), 3600, history,
+                                                            "category", "raw")),
+        "range_raw_total": lambda: list(db.iter_range(history, history + timedelta(days=1), 3600, history,
+                                                      None, "raw")),
+    }
+    statements = traced(calls[name])
+    
+    assert statements
+    for statement in statements:
+        assert full_scans(statement) == [], statement
@@ -0,0 +1,42 @@
+from datetime import date, datetime
+
+from database import db
+from datagen import generate
+
+
+def title_ids(where=""):
+    with db._get_reader() as conn:
+        with db._raw_source(conn, "app_usage") as source:
+            return {row[0] for row in conn.execute(
+                f"SELECT DISTINCT title_id FROM {source} WHERE title_id IS NOT NULL {where}")}
+
+
+def stored_titles(ids=None):
+    with db._get_reader() as conn:
+        stored = {row[0] for row in conn.execute("SELECT id FROM titles")}
+    return stored if ids is None else stored & ids
+
+
+def test_prune_titles_keeps_only_referenced_and_archived_titles(tmp_path):
+    generate(db.db_path, 7, seed=7, mean_switches=40, end=date(2019, 1, 3))
+    db.migrate_partitions()
+    assert {"2018-12", "2019-01"} <= set(db.close_partitions(datetime(2019, 3, 1)))
+    
+    archived = title_ids("AND date_str BETWEEN '2018-12-01' AND '2018-12-31'")
+    compacted = title_ids("AND date_str BETWEEN '2019-01-01' AND '2019-01-31'")
+    assert "2018-12" in db.archive_partitions(str(tmp_path), before="2019-01")
+    db.compact_partitions("2019-02-15")
+    
+    assert db.prune_titles() > 0
+    live = title_ids()
+    with db._get_reader() as conn:
+        pinned = {row[0] for row in conn.execute("SELECT title_id FROM archived_titles")}
+    assert stored_titles() == live | pinned
+    assert stored_titles(archived) == archived
+    assert compacted - live - pinned
+    assert not stored_titles(compacted - live - pinned)
+    
+    assert db.restore_partition("2018-12")
+    with db._get_reader() as conn:
+        assert not conn.execute("SELECT 1 FROM archived_titles WHERE month = '2018-12'").fetchall()
+    assert title_ids("AND date_str BETWEEN '2018-12-01' AND '2018-12-31'") == archived
@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from database import db
+
+
+def daily_totals(dates):
+    with db._get_reader() as conn:
+        return {date_str: conn.execute("SELECT COALESCE(SUM(seconds), 0) FROM daily_app_stats WHERE date_str = ?",
+                                       (date_str,)).fetchone()[0] for date_str in dates}
+
+
+def diverge(cur, today, yesterday):
+    cur.execute("UPDATE daily_app_stats SET seconds = 0 WHERE date_str = ?", (today,))
+    cur.execute("INSERT INTO daily_app_stats (date_str, app_name, seconds) VALUES (?, 'ghost', 100)", (today,))
+    cur.execute("INSERT INTO daily_app_stats (date_str, app_name, seconds) VALUES (?, 'ghost', 100)", (yesterday,))
+
+
+def test_rebuild_rollups_for_a_date_range():
+    today = date.today().strftime("%Y-%m-%d")
+    yesterday = (date.today() - timedelta(days=1)).strftime("%Y-%m-%d")
+    session_id = db.create_session().result()
+    for title, seconds in (("notes.txt", 120), ("todo.txt", 45)):
+        usage_id = db.log_app_start(session_id, "Editor", "editor.exe", title, "development").result()
+        db.flush_usage({}, usage=(usage_id, seconds, False)).result()
+    expected = daily_totals([today, yesterday])
+    assert expected[today] >= 165
+    
+    db._writer.submit(diverge, today, yesterday).result()
+    db.rebuild_rollups(today, today)
+    
+    assert daily_totals([today, yesterday]) == {today: expected[today], yesterday: expected[yesterday] + 100}
@@ -0,0 +1,31 @@
+from config import POLL_INTERVAL_SEC
+from tracker import WindowTracker
+
+
+class InputBackend:
+    def __init__(self, idle_durations):
+        self.idle_durations = list(idle_durations)
+        self.now = 0.0
+    
+    def time(self):
+        return self.now
+    
+    def get_idle_duration(self):
+        self.now += 1
+        return self.idle_durations.pop(0)
+    
+    def get_foreground_window_info(self):
+        return "Editor", "editor.exe", "notes.txt", 1
+
+
+def test_input_between_polls_resets_the_poll_interval():
+    window_tracker = WindowTracker()
+    window_tracker.set_backend(InputBackend([0.5, 1.5, 2.5, 4.0, 0.2]))
+    intervals = []
+    for _ in range(5):
+        window_tracker._interval = window_tracker._next_interval(window_tracker._poll())
+        intervals.append(window_tracker._interval)
+    
+    assert intervals[0] == POLL_INTERVAL_SEC
+    assert intervals[1] < intervals[2] < intervals[3]
+    assert intervals[4] == POLL_INTERVAL_SEC
@@ -1,96 +1,136 @@
-import ctypes
-from ctypes import wintypes
-import time
-from typing import Optional, Tuple, Callable
+from typing import Optional, Tuple, Callable, Dict, List
 import threading
 import re
+from functools import lru_cache
 
-from config import IDLE_THRESHOLD_SEC, POLL_INTERVAL_SEC, BLACKLIST_WINDOWS, PRIVACY_MODE, APP_CATEGORIES
+from config import (IDLE_THRESHOLD_SEC, POLL_INTERVAL_SEC, POLL_MAX_INTERVAL_SEC, POLL_IDLE_MAX_INTERVAL_SEC,
+                    POLL_BACKOFF_FACTOR, BLACKLIST_WINDOWS, PRIVACY_MODE, APP_CATEGORIES,
+                    CATEGORY_CACHE_SIZE, TITLE_CACHE_SIZE, TRACKER_BACKEND, TRACKER_BACKEND_OPTIONS)
+from backends import TrackerBackend, create_backend
+from metrics import metrics, poll_duration, polls_total, app_changes_total, tracker_errors_total
 
-user32 = ctypes.windll.user32
-kernel32 = ctypes.windll.kernel32
-psapi = ctypes.windll.psapi
+
+def _keyword_pattern(keywords: List[str]) -> str:
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    
+    def build(node: Dict) -> str:
+        if "" in node:
+            return ""
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+    
+    return build(trie)
+
+
+class CategoryMatcher:
+    def __init__(self, categories: Dict, cache_size: int = CATEGORY_CACHE_SIZE):
+        self._categories = categories
+        self._patterns: Optional[List[Tuple[str, re.Pattern]]] = None
+        self._match_cached = lru_cache(maxsize=cache_size)(self._match)
+    
+    def _compile(self) -> List[Tuple[str, re.Pattern]]:
+        self._patterns = [
+            (cat_id, re.compile(_keyword_pattern(cat_info["keywords"])))
+            for cat_id, cat_info in self._categories.items()
+            if cat_info["keywords"]
+        ]
+        return self._patterns
+    
+    def _match(self, check_text: str) -> str:
+        for cat_id, pattern in self._patterns or self._compile():
+            if pattern.search(check_text):
+                return cat_id
+        return "other"
+    
+    def categorize(self, app_name: str, exe_name: str, window_title: str) -> str:
+        return self._match_cached(f"{app_name} {exe_name} {window_title}".lower())
 
 
-class LASTINPUTINFO(ctypes.Structure):
-    _fields_ = [('cbSize', wintypes.UINT), ('dwTime', wintypes.DWORD)]
+category_matcher = CategoryMatcher(APP_CATEGORIES)
+
+
+def categorize_app(app_name: str, exe_name: str, window_title: str) -> str:
+    return category_matcher.categorize(app_name, exe_name, window_title)
 
 
-def get_idle_duration() -> float:
-    lii = LASTINPUTINFO()
-    lii.cbSize = ctypes.sizeof(LASTINPUTINFO)
-    if user32.GetLastInputInfo(ctypes.byref(lii)):
-        millis = kernel32.GetTickCount() - lii.dwTime
-        return millis / 1000.0
-    return 0.0
+MASK_RULES = [
+    ("email", r'[\w\.-]+@[\w\.-]+\.\w+', '[email]'),
+    ("phone", r'\+?\d{10,12}', '[phone]'),
+    ("card", r'\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}', '[card]'),
+]
 
 
-def get_foreground_window_info() -> Optional[Tuple[str, str, str, int]]:
-    hwnd = user32.GetForegroundWindow()
-    if not hwnd:
-        return None
+class PrivacyFilter:
+    def __init__(self, mode: str, blacklist: List[str], rules: List[Tuple[str, str, str]] = MASK_RULES,
+                 cache_size: int = TITLE_CACHE_SIZE):
+        self.mode = mode
+        self._blacklist = [blocked.casefold() for blocked in blacklist if blocked]
+        self._rules = list(rules)
+        self._cache_size = cache_size
+        self._compile()
     
-    length = user32.GetWindowTextLengthW(hwnd)
-    if length == 0:
-        return None
+    def add_rule(self, name: str, pattern: str, replacement: str):
+        self._rules.append((name, pattern, replacement))
+        self._compile()
     
-    buf = ctypes.create_unicode_buffer(length + 1)
-    user32.GetWindowTextW(hwnd, buf, length + 1)
-    window_title = buf.value
+    def _compile(self):
+        self._replacements = {name: replacement for name, _, replacement in self._rules}
+        self._mask_pattern = None
+        if self._rules:
+            self._mask_pattern = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in self._rules))
+        self._blacklist_pattern = None
+        if self._blacklist:
+            self._blacklist_pattern = re.compile("|".join(re.escape(blocked) for blocked in self._blacklist))
+        self._process_cached = lru_cache(maxsize=self._cache_size)(self._process)
     
-    pid = wintypes.DWORD()
-    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    def mask(self, title: str) -> str:
+        if not self._mask_pattern:
+            return title
+        return self._mask_pattern.sub(lambda m: self._replacements[m.lastgroup], title)
     
-    h_process = kernel32.OpenProcess(0x0400 | 0x0010, False, pid.value)
-    if not h_process:
-        return None
+    def should_skip(self, title: str) -> bool:
+        if not self._blacklist_pattern:
+            return False
+        return self._blacklist_pattern.search(title.casefold()) is not None
     
-    try:
-        exe_buf = ctypes.create_unicode_buffer(512)
-        psapi.GetModuleBaseNameW(h_process, None, exe_buf, 512)
-        exe_name = exe_buf.value
-        app_name = exe_name.replace('.exe', '').replace('.EXE', '').title()
-        return (app_name, exe_name, window_title, hwnd)
-    finally:
-        kernel32.CloseHandle(h_process)
+    def _process(self, title: str, app_name: str) -> str:
+        if self.should_skip(title):
+            return f"[{app_name}]"
+        if self.mode == "anonymous":
+            return app_name
+        elif self.mode == "masked":
+            return self.mask(title)
+        return title
+    
+    def process(self, title: str, app_name: str) -> str:
+        return self._process_cached(title, app_name)
 
 
-def categorize_app(app_name: str, exe_name: str, window_title: str) -> str:
-    check_text = f"{app_name} {exe_name} {window_title}".lower()
-    for cat_id, cat_info in APP_CATEGORIES.items():
-        for keyword in cat_info["keywords"]:
-            if keyword in check_text:
-                return cat_id
-    return "other"
+privacy_filter = PrivacyFilter(PRIVACY_MODE, BLACKLIST_WINDOWS)
 
 
 def mask_sensitive_data(title: str) -> str:
-    title = re.sub(r'[\w\.-]+@[\w\.-]+\.\w+', '[email]', title)
-    title = re.sub(r'\+?\d{10,12}', '[phone]', title)
-    title = re.sub(r'\d{4}[\s-]?\d{4}[\s-]?\d{4}[\s-]?\d{4}', '[card]', title)
-    return title
+    return privacy_filter.mask(title)
 
 
 def should_skip_window(title: str) -> bool:
-    title_lower = title.lower()
-    for blocked in BLACKLIST_WINDOWS:
-        if blocked.lower() in title_lower:
-            return True
-    return False
+    return privacy_filter.should_skip(title)
 
 
 def process_window_title(title: str, app_name: str) -> str:
-    if should_skip_window(title):
-        return f"[{app_name}]"
-    if PRIVACY_MODE == "anonymous":
-        return app_name
-    elif PRIVACY_MODE == "masked":
-        return mask_sensitive_data(title)
-    return title
+    return privacy_filter.process(title, app_name)
 
 
 class WindowTracker:
-    def __init__(self):
+    def __init__(self, backend: Optional[TrackerBackend] = None):
+        self._backend = backend
         self.running = False
         self._thread = None
         self._current_app = None
@@ -100,53 +140,99 @@ class WindowTracker:
         self._total_active = 0.0
         self._is_idle = False
         self._last_poll_time = None
+        self._last_idle_time = None
+        self._interval = POLL_INTERVAL_SEC
+        self._wake = threading.Event()
         self.on_app_change: Optional[Callable] = None
         self.on_idle_change: Optional[Callable] = None
         self.on_tick: Optional[Callable] = None
     
+    @property
+    def backend(self) -> TrackerBackend:
+        if self._backend is None:
+            self._backend = create_backend(TRACKER_BACKEND, **TRACKER_BACKEND_OPTIONS)
+        return self._backend
+    
+    def set_backend(self, backend: TrackerBackend):
+        if self.running:
+            raise RuntimeError("Cannot change backend while tracking")
+        self._backend = backend
+    
+    def now(self) -> float:
+        return self.backend.time()
+    
     def start(self):
         if self.running:
             return
         self.running = True
-        self._last_poll_time = time.time()
+        self._last_poll_time = self.now()
+        self._last_idle_time = None
+        self._interval = POLL_INTERVAL_SEC
+        self._wake.clear()
         self._thread = threading.Thread(target=self._tracking_loop, daemon=True)
         self._thread.start()
     
     def stop(self):
         self.running = False
+        self._wake.set()
         if self._thread:
             self._thread.join(timeout=2)
     
     def _tracking_loop(self):
         while self.running:
+            changed = True
             try:
-                self._poll()
+                with metrics.timer(poll_duration):
+                    changed = self._poll()
             except Exception as e:
+                metrics.inc(tracker_errors_total)
                 print(f"Tracker error: {e}")
-            time.sleep(POLL_INTERVAL_SEC)
+            self._interval = self._next_interval(changed)
+            self.backend.sleep(self._interval, self._wake)
+    
+    def _next_interval(self, changed: bool) -> float:
+        if changed:
+            return POLL_INTERVAL_SEC
+        ceiling = POLL_IDLE_MAX_INTERVAL_SEC if self._is_idle else POLL_MAX_INTERVAL_SEC
+        return min(self._interval * POLL_BACKOFF_FACTOR, max(ceiling, POLL_INTERVAL_SEC))
     
-    def _poll(self):
-        now = time.time()
+    def _split_delta(self, delta: float, idle_time: float, was_idle: bool) -> Tuple[float, float]:
+        if was_idle == self._is_idle:
+            return (delta, 0.0) if self._is_idle else (0.0, delta)
+        if was_idle:
+            active = min(delta, idle_time)
+            return delta - active, active
+        idle = min(delta, idle_time - IDLE_THRESHOLD_SEC)
+        return idle, delta - idle
+    
+    def _poll(self) -> bool:
+        metrics.inc(polls_total)
+        now = self.now()
         delta = now - self._last_poll_time if self._last_poll_time else 0
         self._last_poll_time = now
         
-        idle_time = get_idle_duration()
+        idle_time = self.backend.get_idle_duration()
         was_idle = self._is_idle
         self._is_idle = idle_time >= IDLE_THRESHOLD_SEC
+        changed = was_idle != self._is_idle
         
-        if self._is_idle:
-            self._total_idle += delta
-        else:
-            self._total_active += delta
+        idle_delta, active_delta = self._split_delta(delta, idle_time, was_idle)
+        self._total_idle += idle_delta
+        self._total_active += active_delta
         
-        if was_idle != self._is_idle and self.on_idle_change:
+        if changed and self.on_idle_change:
             self.on_idle_change(self._is_idle)
+        if self._last_idle_time is not None and idle_time < self._last_idle_time:
+            changed = True
+        self._last_idle_time = idle_time
         
-        window_info = get_foreground_window_info()
+        window_info = self.backend.get_foreground_window_info()
         if window_info:
             app_name, exe_name, title, hwnd = window_info
             
             if hwnd != self._current_hwnd:
+                changed = True
+                metrics.inc(app_changes_total)
                 old_app = self._current_app
                 old_duration = 0
                 if self._app_start_time:
@@ -163,7 +249,17 @@ class WindowTracker:
                     self.on_app_change(old_app, old_duration, app_name, exe_name, processed_title, category)
         
         if self.on_tick:
-            self.on_tick(delta, self._is_idle)
+            ticks = [(idle_delta, True), (active_delta, False)]
+            if not was_idle:
+                ticks.reverse()
+            for part, is_idle in ticks:
+                if part > 0:
+                    self.on_tick(part, is_idle)
+        return changed
+    
+    @property
+    def poll_interval(self) -> float:
+        return self._interval
     
     @property
     def total_active_time(self) -> float: